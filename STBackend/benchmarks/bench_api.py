@@ -0,0 +1,211 @@
+"""
+Per-route API latency at fixed concurrency against a seeded synthetic data set.
+
+Loads benchmarks.synthetic.load_dataset() into its own schema of a scratch
+database (never point this at production), then fires --requests requests at
+each route from --concurrency concurrent clients and reports p50/p95/p99.
+The app runs in-process (httpx ASGI transport) on that schema unless --url
+points at a running server, which must itself use the bench schema, e.g.
+DATABASE_URL=postgresql://localhost/bench?search_path=bench_api,public.
+
+Save a run with --out and compare a later one against it with --compare.
+Request targets are drawn from --seed, so two runs issue the same requests.
+
+Usage (from STBackend/):
+    BENCH_DATABASE_URL=postgresql://localhost/bench python -m benchmarks.bench_api \
+        --listings 100000 --renters 100000 --swipes 10000000 --out before.json
+    BENCH_DATABASE_URL=postgresql://localhost/bench python -m benchmarks.bench_api \
+        --skip-load --compare before.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+import asyncpg
+import httpx
+
+from benchmarks import synthetic
+
+SCHEMA = "bench_api"
+
+
+def _routes(listings: int, renters: int, match_ids: int):
+    """
+    route template -> request factory (rng -> (method, url, json body)).
+    Match and recommendation routes draw from the first `match_ids` owners so
+    repeat requests hit built decks, as a returning user would.
+    """
+    listing = lambda rng: rng.randint(1, listings)
+    renter = lambda rng: rng.randint(1, renters)
+    return {
+        "GET /listings/{listing_id}": lambda rng: ("GET", f"/listings/{listing(rng)}", None),
+        "GET /listings?ids=": lambda rng: (
+            "GET", "/listings?ids=" + ",".join(str(listing(rng)) for _ in range(20)), None,
+        ),
+        "GET /renters/{renter_id}": lambda rng: ("GET", f"/renters/{renter(rng)}", None),
+        "GET /renters/{renter_id}/listing_matches": lambda rng: (
+            "GET", f"/renters/{rng.randint(1, match_ids)}/listing_matches", None,
+        ),
+        "GET /listings/{listing_id}/renter_matches": lambda rng: (
+            "GET", f"/listings/{rng.randint(1, match_ids)}/renter_matches", None,
+        ),
+        "GET /listings/recommendations/{current_renter_id}": lambda rng: (
+            "GET", f"/listings/recommendations/{renter(rng)}", None,
+        ),
+        "POST /swipes/renter/{renter_profile_id}": lambda rng: (
+            "POST", f"/swipes/renter/{renter(rng)}",
+            {"target_id": listing(rng), "is_right": rng.random() < 0.3},
+        ),
+        "POST /swipes/listing/{listing_id}": lambda rng: (
+            "POST", f"/swipes/listing/{listing(rng)}",
+            {"target_id": renter(rng), "is_right": rng.random() < 0.3},
+        ),
+        "GET /mutual-matches/renter/{renter_profile_id}": lambda rng: (
+            "GET", f"/mutual-matches/renter/{renter(rng)}", None,
+        ),
+        "GET /amenities": lambda rng: ("GET", "/amenities", None),
+    }
+
+
+async def run_route(client, make_request, requests: int, concurrency: int, seed: int) -> dict:
+    """Issue `requests` requests from `concurrency` workers; latency in ms per request."""
+    rng = random.Random(seed)
+    plan = [make_request(rng) for _ in range(requests)]
+    samples = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < len(plan):
+            method, url, body = plan[next_index]
+            next_index += 1
+            start = time.perf_counter()
+            resp = await client.request(method, url, json=body)
+            samples.append((time.perf_counter() - start) * 1000)
+            if resp.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    ordered = sorted(samples)
+    pct = lambda p: ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "p50": pct(0.50),
+        "p95": pct(0.95),
+        "p99": pct(0.99),
+        "mean": statistics.fmean(ordered),
+        "rps": len(samples) / elapsed,
+    }
+
+
+def report(results: dict, baseline: dict | None):
+    print(f"{'route':<52} {'n':>6} {'err':>5} {'p50':>9} {'p95':>9} {'p99':>9} {'rps':>8}")
+    for route, r in results.items():
+        line = (
+            f"{route:<52} {r['requests']:>6} {r['errors']:>5} "
+            f"{r['p50']:>7.2f}ms {r['p95']:>7.2f}ms {r['p99']:>7.2f}ms {r['rps']:>8.1f}"
+        )
+        before = (baseline or {}).get(route)
+        if before:
+            deltas = "  ".join(
+                f"{p} {100 * (r[p] - before[p]) / before[p]:+.0f}%" for p in ("p50", "p95", "p99") if before[p]
+            )
+            line += f"   vs baseline: {deltas}"
+        print(line)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--listings", type=int, default=100_000)
+    parser.add_argument("--renters", type=int, default=100_000)
+    parser.add_argument("--swipes", type=int, default=10_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-load", action="store_true", help="reuse the data set from a previous run")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--match-ids", type=int, default=200, help="owners the match routes draw from")
+    parser.add_argument("--routes", nargs="+", help="only these route templates")
+    parser.add_argument("--out", help="write the results as JSON")
+    parser.add_argument("--compare", help="JSON results of an earlier run to diff against")
+    args = parser.parse_args()
+
+    if not args.dsn:
+        raise SystemExit("Set BENCH_DATABASE_URL or pass --dsn (use a scratch database)")
+
+    connection = await asyncpg.connect(args.dsn)
+    try:
+        if not args.skip_load:
+            print(f"[bench] loading {args.listings:,} listings, {args.renters:,} renters, "
+                  f"{args.swipes:,} swipes into {SCHEMA}")
+            start = time.perf_counter()
+            await synthetic.load_dataset(
+                connection, SCHEMA, args.listings, args.renters, args.swipes, args.seed
+            )
+            print(f"[bench] loaded in {time.perf_counter() - start:.1f}s")
+        listings = await connection.fetchval(f"SELECT COUNT(*) FROM {SCHEMA}.listings")
+        renters = await connection.fetchval(f"SELECT COUNT(*) FROM {SCHEMA}.renter_profiles")
+    finally:
+        await connection.close()
+
+    routes = _routes(listings, renters, min(args.match_ids, listings, renters))
+    if args.routes:
+        routes = {name: routes[name] for name in args.routes}
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+        lifespan = None
+    else:
+        # the app reads DATABASE_URL at import; asyncpg passes search_path on as a server setting
+        separator = "&" if "?" in args.dsn else "?"
+        os.environ["DATABASE_URL"] = f"{args.dsn}{separator}search_path={SCHEMA},public"
+        os.environ.setdefault("DB_POOL_MAX_SIZE", str(max(10, args.concurrency)))
+        from server import app
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+        lifespan = app.router.lifespan_context(app)
+
+    results = {}
+    try:
+        if lifespan:
+            await lifespan.__aenter__()
+        async with client:
+            for index, (route, make_request) in enumerate(routes.items()):
+                await run_route(client, make_request, min(50, args.requests), args.concurrency, -index)  # warm-up
+                results[route] = await run_route(client, make_request, args.requests, args.concurrency, args.seed + index)
+                print(f"[bench] {route}: p99 {results[route]['p99']:.2f}ms", file=sys.stderr)
+    finally:
+        if lifespan:
+            await lifespan.__aexit__(None, None, None)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    report(results, baseline)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(
+                {"args": {k: v for k, v in vars(args).items() if k not in ("dsn", "out", "compare")},
+                 "results": results},
+                f,
+                indent=2,
+            )
+        print(f"[bench] results written to {args.out}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
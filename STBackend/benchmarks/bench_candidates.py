@@ -0,0 +1,161 @@
+"""
+Latency benchmark for get_listing_candidates at increasing listing counts.
+
+Each size is loaded into its own schema of a scratch database (never point this
+at production), then the candidate function is called for random renters and
+p50/p95/p99 are reported. With --legacy the previous full-scan haversine
+implementation is timed on the same data for comparison.
+
+Usage (from STBackend/):
+    BENCH_DATABASE_URL=postgresql://localhost/bench \
+        python -m benchmarks.bench_candidates --sizes 10000 100000 1000000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+import asyncpg
+
+from benchmarks import synthetic
+
+# The pre-index implementation: haversine for every active listing, filter
+# after. Ordered by distance so it returns the same rows as the indexed path.
+LEGACY_SQL = """
+CREATE OR REPLACE FUNCTION legacy_listing_candidates(renter_id bigint)
+RETURNS SETOF bigint AS $$
+    SELECT base.id FROM (
+        SELECT
+            l.id,
+            6371 * 2 * ASIN(SQRT(
+                POWER(SIN(RADIANS(loc.latitude - loc_ref.latitude) / 2), 2) +
+                COS(RADIANS(loc_ref.latitude)) * COS(RADIANS(loc.latitude)) *
+                POWER(SIN(RADIANS(loc.longitude - loc_ref.longitude) / 2), 2)
+            )) AS distance_km
+        FROM listings l
+        JOIN renter_profiles r ON r.id = renter_id
+        JOIN locations loc_ref ON r.locations_id = loc_ref.id
+        JOIN locations loc ON l.locations_id = loc.id
+        WHERE l.is_active
+          AND l.user_id != r.user_id
+          AND l.num_bedrooms >= r.num_bedrooms
+          AND r.start_date >= l.start_date - 15
+          AND r.end_date <= l.end_date + 15
+          AND (NOT r.has_pet OR l.pet_friendly)
+          AND NOT EXISTS (
+              SELECT 1 FROM renter_on_listing rol
+              WHERE rol.renter_profile_id = renter_id
+                AND rol.listing_id = l.id
+          )
+    ) base
+    WHERE base.distance_km < 50
+    ORDER BY base.distance_km, base.id
+    LIMIT 50;
+$$ LANGUAGE sql;
+"""
+
+
+async def load(connection, schema: str, listings: int, seed: int) -> int:
+    rng = random.Random(seed)
+    owners = max(1, listings // 2)
+    renters = max(1000, listings // 10)
+
+    await synthetic.create_schema(connection, schema)
+    await connection.execute(LEGACY_SQL)
+
+    await connection.copy_records_to_table(
+        "users",
+        records=synthetic.generate_users(owners + renters),
+        columns=synthetic.USER_COLUMNS,
+        schema_name=schema,
+    )
+    await connection.copy_records_to_table(
+        "locations",
+        records=synthetic.generate_locations(rng, listings + renters),
+        columns=synthetic.LOCATION_COLUMNS,
+        schema_name=schema,
+    )
+    await connection.copy_records_to_table(
+        "listings",
+        records=synthetic.generate_listings(rng, listings, owners),
+        columns=synthetic.LISTING_COLUMNS,
+        schema_name=schema,
+    )
+    await connection.copy_records_to_table(
+        "renter_profiles",
+        records=synthetic.generate_renters(
+            rng, renters, user_start_id=owners + 1, location_start_id=listings + 1
+        ),
+        columns=synthetic.RENTER_COLUMNS,
+        schema_name=schema,
+    )
+    await connection.execute("ANALYZE")
+    return renters
+
+
+async def time_calls(connection, queries: dict[str, str], renter_ids: list[int]) -> dict[str, list[float]]:
+    """Time every query for each renter in turn, so no variant gets a warmer cache."""
+    samples = {label: [] for label in queries}
+    for renter_id in renter_ids:
+        for label, query in queries.items():
+            start = time.perf_counter()
+            await connection.fetch(query, renter_id)
+            samples[label].append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(label: str, samples: list[float]):
+    ordered = sorted(samples)
+    pct = lambda p: ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+    print(
+        f"  {label:<8} p50={pct(0.50):8.2f}ms  p95={pct(0.95):8.2f}ms  "
+        f"p99={pct(0.99):8.2f}ms  mean={statistics.fmean(ordered):8.2f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--legacy", action="store_true", help="also time the full-scan query")
+    parser.add_argument("--keep", action="store_true", help="keep the bench schemas afterwards")
+    args = parser.parse_args()
+
+    if not args.dsn:
+        raise SystemExit("Set BENCH_DATABASE_URL or pass --dsn (use a scratch database)")
+
+    connection = await asyncpg.connect(args.dsn)
+    try:
+        for size in args.sizes:
+            schema = f"bench_candidates_{size}"
+            print(f"[bench] loading {size:,} listings into {schema}")
+            start = time.perf_counter()
+            renters = await load(connection, schema, size, args.seed)
+            print(f"[bench] loaded in {time.perf_counter() - start:.1f}s")
+
+            rng = random.Random(args.seed)
+            renter_ids = [rng.randint(1, renters) for _ in range(args.queries)]
+            # the same 50 nearest candidates as the legacy query
+            queries = {
+                "indexed": "SELECT id FROM get_listing_candidates($1) ORDER BY distance_km, id LIMIT 50"
+            }
+            if args.legacy:
+                queries["legacy"] = "SELECT * FROM legacy_listing_candidates($1)"
+
+            await time_calls(connection, queries, renter_ids[:10])  # warm-up
+            for label, samples in (await time_calls(connection, queries, renter_ids)).items():
+                summarize(label, samples)
+
+            if not args.keep:
+                await connection.execute(f"DROP SCHEMA {schema} CASCADE")
+    finally:
+        await connection.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
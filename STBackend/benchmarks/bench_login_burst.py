@@ -0,0 +1,113 @@
+"""
+Swipe latency while a burst of logins is being verified.
+
+Runs the app in-process (httpx ASGI transport, same event loop) against the
+database in DATABASE_URL, which must be a seeded scratch database: the probe
+records left swipes for an existing renter. A steady stream of swipes is
+timed before and during a burst of concurrent /login calls. With --blocking,
+bcrypt runs inline on the event loop as it used to, for comparison.
+
+Usage (from STBackend/):
+    DATABASE_URL=postgresql://localhost/bench python -m benchmarks.bench_login_burst --logins 50
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+import bcrypt
+import httpx
+
+from db import get_pool
+from routes import auth
+from server import app
+from utils import passwords
+
+
+async def blocking_verify_password(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+
+
+async def probe(client, renter_id: int, listing_ids: list[int], interval: float, stop: asyncio.Event, samples: list):
+    rng = random.Random(0)
+    while not stop.is_set():
+        start = time.perf_counter()
+        resp = await client.post(
+            f"/swipes/renter/{renter_id}",
+            json={"target_id": rng.choice(listing_ids), "is_right": False},
+        )
+        resp.raise_for_status()
+        samples.append((start, (time.perf_counter() - start) * 1000))
+        await asyncio.sleep(interval)
+
+
+def summarize(label: str, latencies: list[float]):
+    if not latencies:
+        print(f"  {label:<9} no samples")
+        return
+    ordered = sorted(latencies)
+    pct = lambda p: ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+    print(
+        f"  {label:<9} n={len(ordered):4d}  p50={pct(0.50):7.2f}ms  "
+        f"p95={pct(0.95):7.2f}ms  max={ordered[-1]:7.2f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--baseline-seconds", type=float, default=2.0)
+    parser.add_argument("--interval-ms", type=float, default=10.0)
+    parser.add_argument("--blocking", action="store_true", help="run bcrypt on the event loop")
+    args = parser.parse_args()
+
+    if args.blocking:
+        auth.verify_password = blocking_verify_password
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+            password = "correct horse battery"
+            resp = await client.post("/signup", json={
+                "id": 0, "first_name": "Bench", "last_name": "User", "email": email, "password": password,
+            })
+            resp.raise_for_status()
+
+            pool = await get_pool()
+            async with pool.acquire() as connection:
+                renter_id = await connection.fetchval("SELECT id FROM renter_profiles WHERE is_active LIMIT 1")
+                listing_ids = [r["id"] for r in await connection.fetch("SELECT id FROM listings LIMIT 1000")]
+            if renter_id is None or not listing_ids:
+                raise SystemExit("Seed the database with renters and listings first")
+
+            samples = []
+            stop = asyncio.Event()
+            prober = asyncio.create_task(
+                probe(client, renter_id, listing_ids, args.interval_ms / 1000, stop, samples)
+            )
+            await asyncio.sleep(args.baseline_seconds)
+
+            burst_start = time.perf_counter()
+            results = await asyncio.gather(*[
+                client.post("/login", json={"email": email, "password": password})
+                for _ in range(args.logins)
+            ])
+            burst_end = time.perf_counter()
+            stop.set()
+            await prober
+
+            async with pool.acquire() as connection:
+                await connection.execute("DELETE FROM users WHERE email = $1", email)
+
+    assert all(r.status_code == 200 for r in results), "some logins failed"
+    mode = "inline bcrypt" if args.blocking else f"executor ({passwords.PASSWORD_HASH_WORKERS} workers)"
+    print(f"[bench] {args.logins} logins took {burst_end - burst_start:.2f}s, {mode}, rounds={passwords.BCRYPT_ROUNDS}")
+    summarize("baseline", [ms for start, ms in samples if start < burst_start])
+    summarize("burst", [ms for start, ms in samples if burst_start <= start < burst_end])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,139 @@
+"""
+Micro-benchmark for utils/scoring.py: ranking candidates by the score_sql
+expression in the database against fetching them and scoring them in a plain
+Python loop over the same formula. The loop's scores double as a check of the
+SQL expression.
+
+Usage (from STBackend/):
+    BENCH_DATABASE_URL=postgresql://localhost/bench \
+        python -m benchmarks.bench_scoring --sizes 1000 10000 100000
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import time
+
+import asyncpg
+
+from utils.scoring import SCORING, score_sql
+
+TOP = 200
+
+CANDIDATES_TABLE = """
+CREATE TEMP TABLE bench_scoring_candidates (
+    id bigint PRIMARY KEY,
+    distance_km float8 NOT NULL,
+    asking_price float8 NOT NULL,
+    utilities_incl boolean NOT NULL,
+    bathroom_gap float8 NOT NULL,
+    same_building_type boolean NOT NULL,
+    gender_ok boolean NOT NULL
+)
+"""
+
+BUDGET = 1800.0
+
+
+def make_batch(rng: random.Random, size: int) -> list[tuple]:
+    return [
+        (
+            i,
+            rng.uniform(0, 50),
+            float(rng.randint(600, 3500)),
+            rng.random() < 0.5,
+            float(rng.randint(-1, 2)),
+            rng.random() < 0.3,
+            rng.random() < 0.6,
+        )
+        for i in range(size)
+    ]
+
+
+def python_score(params, row) -> float:
+    _, distance_km, asking_price, utilities_incl, bathroom_gap, same_building_type, gender_ok = row
+    price = asking_price + (0 if utilities_incl else params.utilities_adjustment)
+    return (
+        params.base_score
+        * params.distance_factor_base ** distance_km
+        * params.price_factor_base ** (price - BUDGET)
+        * params.bathroom_factor_base ** bathroom_gap
+        * (params.building_type_factor if same_building_type else 1)
+        * (params.gender_factor if gender_ok else 1)
+    )
+
+
+async def best_of(repeat: int, run) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await run()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if not args.dsn:
+        raise SystemExit("Set BENCH_DATABASE_URL or pass --dsn (use a scratch database)")
+
+    params = SCORING.listing_cards
+    score = score_sql(
+        params,
+        distance_km="distance_km",
+        asking_price="asking_price",
+        utilities_incl="utilities_incl",
+        budget=repr(BUDGET),
+        bathroom_gap="bathroom_gap",
+        same_building_type="same_building_type",
+        gender_ok="gender_ok",
+    )
+    ranked_sql = f"""
+    SELECT id, {score} AS score FROM bench_scoring_candidates
+    ORDER BY score DESC, id
+    LIMIT {TOP}
+    """
+
+    rng = random.Random(args.seed)
+    connection = await asyncpg.connect(args.dsn)
+    try:
+        await connection.execute(CANDIDATES_TABLE)
+        for size in args.sizes:
+            batch = make_batch(rng, size)
+            await connection.execute("TRUNCATE bench_scoring_candidates")
+            await connection.copy_records_to_table("bench_scoring_candidates", records=batch)
+            await connection.execute("ANALYZE bench_scoring_candidates")
+
+            ranked = await connection.fetch(ranked_sql)
+            expected = sorted(((python_score(params, row), row[0]) for row in batch), key=lambda p: (-p[0], p[1]))
+            assert [row["id"] for row in ranked] == [i for _, i in expected[:TOP]] and all(
+                math.isclose(row["score"], s, rel_tol=1e-9) for row, (s, _) in zip(ranked, expected)
+            ), "SQL and loop scores disagree"
+
+            async def in_sql():
+                await connection.fetch(ranked_sql)
+
+            async def in_python():
+                rows = await connection.fetch("SELECT * FROM bench_scoring_candidates")
+                sorted(((python_score(params, tuple(row)), row["id"]) for row in rows), key=lambda p: (-p[0], p[1]))[:TOP]
+
+            sql = await best_of(args.repeat, in_sql)
+            loop = await best_of(args.repeat, in_python)
+            print(
+                f"{size:>9,} candidates  sql {sql * 1000:8.3f}ms  "
+                f"fetch+python {loop * 1000:9.3f}ms  speedup {loop / sql:6.1f}x"
+            )
+    finally:
+        await connection.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,331 @@
+"""
+Swipe storage benchmark: the old renter_on_listing layout vs the partitioned one.
+
+Both layouts are built side by side in one schema of a scratch database (never
+point this at production) and filled with the same --rows seeded swipes, in
+swipe-time order rather than swiper order, so index maintenance sees the
+interleaving a live table does:
+
+  legacy       bigserial id primary key, unique (renter_profile_id, listing_id)
+               and single-column indexes on renter_profile_id, listing_id and
+               is_right
+  partitioned  (renter_profile_id, listing_id) primary key, hash-partitioned
+               by renter_profile_id, an index on listing_id and a partial
+               index over right swipes (create_tables.sql)
+
+Foreign keys are left out of both, since they cost the same either way.
+Reported per layout: load time and on-disk size, single-row and batched upsert
+throughput from concurrent connections, and p50/p95/p99 latency and shared
+buffers for the NOT EXISTS exclusion probe of get_listing_candidates and for
+a renter's most recent likes (what listing_colikes reads). Save a run with
+--out and compare a later one against it with --compare.
+
+Usage (from STBackend/):
+    BENCH_DATABASE_URL=postgresql://localhost/bench \
+        python -m benchmarks.bench_swipes --rows 10000000 --out swipes.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+
+import asyncpg
+
+from benchmarks import synthetic
+
+SCHEMA = "bench_swipes"
+LAYOUTS = ("legacy", "partitioned")
+
+LEGACY_DDL = """
+CREATE TABLE legacy (
+    id bigserial PRIMARY KEY,
+    renter_profile_id bigint NOT NULL,
+    listing_id bigint NOT NULL,
+    is_right boolean NOT NULL,
+    swiped_at timestamptz NOT NULL DEFAULT now(),
+    UNIQUE (renter_profile_id, listing_id)
+);
+CREATE INDEX idx_legacy_renter ON legacy(renter_profile_id);
+CREATE INDEX idx_legacy_listing ON legacy(listing_id);
+CREATE INDEX idx_legacy_is_right ON legacy(is_right);
+"""
+
+PARTITIONED_DDL = """
+CREATE TABLE partitioned (
+    id bigserial NOT NULL,
+    renter_profile_id bigint NOT NULL,
+    listing_id bigint NOT NULL,
+    is_right boolean NOT NULL,
+    swiped_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (renter_profile_id, listing_id)
+) PARTITION BY HASH (renter_profile_id);
+CREATE INDEX idx_partitioned_listing ON partitioned(listing_id);
+CREATE INDEX idx_partitioned_likes ON partitioned(renter_profile_id, swiped_at DESC)
+    INCLUDE (listing_id) WHERE is_right;
+"""
+
+UPSERT = """
+    INSERT INTO {table} (renter_profile_id, listing_id, is_right)
+    VALUES ($1, $2, $3)
+    ON CONFLICT (renter_profile_id, listing_id) DO UPDATE
+    SET is_right = EXCLUDED.is_right
+"""
+
+BATCH_UPSERT = """
+    INSERT INTO {table} (renter_profile_id, listing_id, is_right)
+    SELECT $1, t.listing_id, t.is_right
+    FROM unnest($2::bigint[], $3::boolean[]) AS t(listing_id, is_right)
+    ON CONFLICT (renter_profile_id, listing_id) DO UPDATE
+    SET is_right = EXCLUDED.is_right
+"""
+
+PROBES = {
+    # how get_listing_candidates drops listings the renter already swiped on
+    "not_exists": """
+        SELECT COUNT(*) FROM unnest($2::bigint[]) AS c(listing_id)
+        WHERE NOT EXISTS (
+            SELECT 1 FROM {table} s
+            WHERE s.renter_profile_id = $1 AND s.listing_id = c.listing_id
+        )
+    """,
+    # a renter's latest right swipes, newest first (the legacy layout only had
+    # the id to order by)
+    "recent_likes": """
+        SELECT listing_id FROM {table}
+        WHERE renter_profile_id = $1 AND is_right
+        ORDER BY {recency} DESC
+        LIMIT 50
+    """,
+}
+_RECENCY = {"legacy": "id", "partitioned": "swiped_at"}
+
+
+def _swipe_source(rng: random.Random, rows: int, renters: int, listings: int):
+    """Seeded (renter, listing, is_right, seconds ago) rows; at most one per pair."""
+    appeal = [rng.betavariate(2, 5) for _ in range(listings)]
+    swipes = synthetic.generate_swipes(
+        rng, rows, ["all"] * renters, {"all": list(range(1, listings + 1))}, appeal
+    )
+    for renter_id, listing_id, is_right in swipes:
+        yield (renter_id, listing_id, is_right, rng.random() * 180 * 86400)
+
+
+async def load(connection, args) -> dict:
+    await connection.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await connection.execute(f"CREATE SCHEMA {SCHEMA}")
+    await connection.execute(f"SET search_path TO {SCHEMA}")
+    await connection.execute(
+        """
+        CREATE UNLOGGED TABLE swipe_source (
+            renter_profile_id bigint, listing_id bigint, is_right boolean, age_seconds float8
+        )
+        """
+    )
+    start = time.perf_counter()
+    await connection.copy_records_to_table(
+        "swipe_source",
+        records=_swipe_source(random.Random(args.seed), args.rows, args.renters, args.listings),
+        schema_name=SCHEMA,
+    )
+    # sort once, so each layout is loaded from the same pre-ordered heap
+    await connection.execute(
+        """
+        CREATE UNLOGGED TABLE swipe_stream AS
+        SELECT renter_profile_id, listing_id, is_right,
+               now() - age_seconds * interval '1 second' AS swiped_at
+        FROM swipe_source ORDER BY age_seconds DESC
+        """
+    )
+    await connection.execute("DROP TABLE swipe_source")
+    print(f"[bench] generated {args.rows:,} swipes in {time.perf_counter() - start:.1f}s")
+
+    await connection.execute(LEGACY_DDL)
+    await connection.execute(PARTITIONED_DDL)
+    for i in range(args.partitions):
+        await connection.execute(
+            f"CREATE TABLE partitioned_p{i} PARTITION OF partitioned "
+            f"FOR VALUES WITH (modulus {args.partitions}, remainder {i})"
+        )
+
+    results = {}
+    for table in LAYOUTS:
+        start = time.perf_counter()
+        await connection.execute(
+            f"""
+            INSERT INTO {table} (renter_profile_id, listing_id, is_right, swiped_at)
+            SELECT renter_profile_id, listing_id, is_right, swiped_at FROM swipe_stream
+            """
+        )
+        elapsed = time.perf_counter() - start
+        await connection.execute(f"VACUUM ANALYZE {table}")
+        size = await connection.fetchval(
+            """
+            SELECT COALESCE(SUM(pg_total_relation_size(relid))::bigint, pg_total_relation_size($1::regclass))
+            FROM pg_partition_tree($1::regclass)
+            """,
+            table,
+        )
+        results[table] = {"load_s": elapsed, "load_rows_per_s": args.rows / elapsed, "size_mb": size / 2**20}
+        print(f"[bench] {table}: loaded in {elapsed:.1f}s, {size / 2**20:,.0f} MB")
+    await connection.execute("DROP TABLE swipe_stream")
+    return results
+
+
+async def upsert_throughput(pool, table: str, args, batch: int) -> float:
+    """Upserted rows per second from args.concurrency connections, `batch` rows per statement."""
+    rng = random.Random(args.seed + batch)
+    statements = args.upserts // batch
+    plan = []
+    for _ in range(statements):
+        renter_id = rng.randint(1, args.renters)
+        listing_ids = rng.sample(range(1, args.listings + 1), batch)
+        plan.append((renter_id, listing_ids, [rng.random() < 0.3 for _ in listing_ids]))
+
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        async with pool.acquire() as connection:
+            while next_index < len(plan):
+                renter_id, listing_ids, is_right = plan[next_index]
+                next_index += 1
+                if batch == 1:
+                    await connection.execute(UPSERT.format(table=table), renter_id, listing_ids[0], is_right[0])
+                else:
+                    await connection.execute(BATCH_UPSERT.format(table=table), renter_id, listing_ids, is_right)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return statements * batch / (time.perf_counter() - start)
+
+
+def _buffers(plan: dict) -> int:
+    return plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0)
+
+
+async def probe_latency(connection, args) -> dict:
+    """Time every probe against both layouts, alternating so neither gets a warmer cache."""
+    rng = random.Random(args.seed)
+    calls = []
+    for _ in range(args.probes):
+        renter_id = rng.randint(1, args.renters)
+        candidates = rng.sample(range(1, args.listings + 1), min(args.candidates, args.listings))
+        calls.append((renter_id, candidates))
+
+    results = {}
+    for probe, template in PROBES.items():
+        queries = {table: template.format(table=table, recency=_RECENCY[table]) for table in LAYOUTS}
+        samples = {table: [] for table in LAYOUTS}
+        buffers = {table: [] for table in LAYOUTS}
+        for index, (renter_id, candidates) in enumerate(calls):
+            probe_args = (renter_id, candidates) if probe == "not_exists" else (renter_id,)
+            for table, query in queries.items():
+                start = time.perf_counter()
+                await connection.fetch(query, *probe_args)
+                samples[table].append((time.perf_counter() - start) * 1000)
+                if index % 10 == 0:
+                    plan = await connection.fetchval(
+                        f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", *probe_args
+                    )
+                    buffers[table].append(_buffers(json.loads(plan)[0]["Plan"]))
+        for table in LAYOUTS:
+            ordered = sorted(samples[table][len(samples[table]) // 10:])  # first 10% is warm-up
+            pct = lambda p: ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+            results.setdefault(table, {})[probe] = {
+                "p50": pct(0.50),
+                "p95": pct(0.95),
+                "p99": pct(0.99),
+                "mean": statistics.fmean(ordered),
+                "buffers": statistics.fmean(buffers[table]),
+            }
+    return results
+
+
+def report(results: dict, baseline: dict | None):
+    def delta(table, *path):
+        before = (baseline or {}).get(table)
+        for key in path:
+            before = (before or {}).get(key)
+        now = results[table]
+        for key in path:
+            now = now[key]
+        return f" ({100 * (now - before) / before:+.0f}%)" if before else ""
+
+    for table in LAYOUTS:
+        r = results[table]
+        print(f"{table}:")
+        print(f"  load          {r['load_s']:8.1f}s{delta(table, 'load_s')}  "
+              f"{r['size_mb']:,.0f} MB{delta(table, 'size_mb')}")
+        print(f"  upsert        {r['upsert_rows_per_s']:8.0f} rows/s{delta(table, 'upsert_rows_per_s')}")
+        print(f"  batch         {r['batch_rows_per_s']:8.0f} rows/s{delta(table, 'batch_rows_per_s')}")
+        for probe in PROBES:
+            p = r[probe]
+            print(
+                f"  {probe:<14}p50={p['p50']:7.2f}ms  p95={p['p95']:7.2f}ms  "
+                f"p99={p['p99']:7.2f}ms{delta(table, probe, 'p99')}  buffers={p['buffers']:.0f}"
+            )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--renters", type=int, default=200_000)
+    parser.add_argument("--listings", type=int, default=100_000)
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--upserts", type=int, default=20_000, help="rows upserted per layout and mode")
+    parser.add_argument("--batch", type=int, default=50, help="rows per batched upsert")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--probes", type=int, default=1000)
+    parser.add_argument("--candidates", type=int, default=500, help="listing ids per NOT EXISTS probe")
+    parser.add_argument("--keep", action="store_true", help="keep the bench schema afterwards")
+    parser.add_argument("--out", help="write the results as JSON")
+    parser.add_argument("--compare", help="JSON results of an earlier run to diff against")
+    args = parser.parse_args()
+
+    if not args.dsn:
+        raise SystemExit("Set BENCH_DATABASE_URL or pass --dsn (use a scratch database)")
+
+    connection = await asyncpg.connect(args.dsn)
+    pool = await asyncpg.create_pool(
+        args.dsn, min_size=args.concurrency, max_size=args.concurrency,
+        server_settings={"search_path": SCHEMA},
+    )
+    try:
+        results = await load(connection, args)
+        # probe first: the upserts below add rows the probes would then see
+        for table, probes in (await probe_latency(connection, args)).items():
+            results[table].update(probes)
+        for table in LAYOUTS:
+            results[table]["upsert_rows_per_s"] = await upsert_throughput(pool, table, args, 1)
+            results[table]["batch_rows_per_s"] = await upsert_throughput(pool, table, args, args.batch)
+        if not args.keep:
+            await connection.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+    finally:
+        await pool.close()
+        await connection.close()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    report(results, baseline)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(
+                {"args": {k: v for k, v in vars(args).items() if k not in ("dsn", "out", "compare")},
+                 "results": results},
+                f,
+                indent=2,
+            )
+        print(f"[bench] results written to {args.out}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,283 @@
+"""
+Query plan regression check for the hot SQL.
+
+Loads a seeded synthetic data set into a schema of a scratch database (never
+point this at production) and runs EXPLAIN (ANALYZE, BUFFERS) for each hot
+query over a sample of ids. The run fails (exit status 1) when a plan
+sequentially scans more than --seq-scan-rows rows of a table, doesn't use an
+index the query is built around (REQUIRED_INDEXES), or touches more shared
+buffers than the query's budget. Budgets are measured, not guessed: a run
+with --calibrate writes the worst sample of each query plus --headroom to
+plan_budgets.json next to this script, and later runs check against it; a
+query with no budget recorded fails the run until one is calibrated. With
+--baseline, a run also fails when buffers grow more than --tolerance over an
+earlier --out run. Index regressions therefore show up before a deploy, not
+as latency after it.
+
+get_listing_candidates and get_renter_candidates are plain SQL functions,
+which the planner inlines, so EXPLAIN of a call shows the plan of their own
+SELECT as the database has it installed. The ranking statements that call them
+(utils/matching.py) are explained as the app runs them.
+
+Usage (from STBackend/):
+    BENCH_DATABASE_URL=postgresql://localhost/bench \
+        python -m benchmarks.plan_check --out plans.json
+    python -m benchmarks.plan_check --skip-load --baseline plans.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import statistics
+import time
+
+import asyncpg
+
+from benchmarks import synthetic
+
+SCHEMA = "plan_check"
+
+# ids each query is explained for
+ID_QUERIES = {
+    "renter": "SELECT id FROM renter_profiles WHERE is_active AND locations_id IS NOT NULL",
+    "listing": "SELECT id FROM listings WHERE is_active AND locations_id IS NOT NULL",
+    "liking_renter": "SELECT DISTINCT renter_profile_id FROM renter_on_listing WHERE is_right",
+    "matched_renter": "SELECT DISTINCT renter_profile_id FROM mutual_matches",
+    "matched_listing": "SELECT DISTINCT listing_id FROM mutual_matches",
+}
+
+def hot_queries() -> dict:
+    """
+    name -> (SQL, kind of id, extra arguments). Imported here rather than at
+    the top, since db.py wants DATABASE_URL at import.
+    """
+    from routes.listings import COLLABORATIVE_RECOMMENDATIONS_QUERY
+    from routes.mutualmatches import MUTUAL_MATCH_LISTINGS_QUERY, MUTUAL_MATCH_RENTERS_QUERY
+    from utils.matching import (
+        LISTING_CANDIDATES_QUERY,
+        MATCH_RADIUS_KM,
+        MATCH_RESULT_LIMIT,
+        RENTER_CANDIDATES_QUERY,
+    )
+
+    # the first page, as utils/matching.py asks for it
+    matching = (MATCH_RADIUS_KM, None, None, MATCH_RESULT_LIMIT + 1)
+    return {
+        "get_listing_candidates": ("SELECT * FROM get_listing_candidates($1, $2)", "renter", (MATCH_RADIUS_KM,)),
+        "get_renter_candidates": ("SELECT * FROM get_renter_candidates($1, $2)", "listing", (MATCH_RADIUS_KM,)),
+        "listing_candidates": (LISTING_CANDIDATES_QUERY, "renter", matching),
+        "renter_candidates": (RENTER_CANDIDATES_QUERY, "listing", matching),
+        "mutual_matches_by_renter": (MUTUAL_MATCH_LISTINGS_QUERY, "matched_renter", ()),
+        "mutual_matches_by_listing": (MUTUAL_MATCH_RENTERS_QUERY, "matched_listing", ()),
+        "collaborative_recommendations": (COLLABORATIVE_RECOMMENDATIONS_QUERY, "liking_renter", ()),
+    }
+
+
+# Indexes each plan must scan (Index, Index Only or Bitmap Index Scan). On the
+# clustered data set a 50 km radius holds a large share of a city, so buffers
+# alone can't tell the bounding-box prefilter from a sequential scan of
+# locations; the plan's nodes can.
+REQUIRED_INDEXES = {
+    "get_listing_candidates": ("idx_locations_point",),
+    "get_renter_candidates": ("idx_locations_point",),
+    "listing_candidates": ("idx_locations_point",),
+    "renter_candidates": ("idx_locations_point",),
+    "mutual_matches_by_renter": ("idx_mutual_matches_renter",),
+    "mutual_matches_by_listing": ("mutual_matches_pkey",),
+    # neighbour lists are read by listing_id, the key's leading column
+    "collaborative_recommendations": ("listing_colikes_pkey",),
+}
+
+# Most shared buffers (hit + read) one execution may touch, per query, as
+# measured by --calibrate on the default data set. Scale them with
+# --budget-scale for other data sizes.
+BUDGETS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plan_budgets.json")
+
+
+def load_budgets() -> dict:
+    if not os.path.exists(BUDGETS_FILE):
+        return {}
+    with open(BUDGETS_FILE) as f:
+        return json.load(f)["budgets"]
+
+
+def calibrated_budgets(results: dict, headroom: float) -> dict:
+    return {name: math.ceil(r["buffers"] * (1 + headroom)) for name, r in results.items() if r["samples"]}
+
+
+def _walk(plan: dict):
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from _walk(child)
+
+
+def _indexes_used(plan: dict) -> set[str]:
+    return {node["Index Name"] for node in _walk(plan) if "Index Name" in node}
+
+
+def _seq_scans(plan: dict) -> dict[str, int]:
+    """Rows read by sequential scans, per table."""
+    scanned = {}
+    for node in _walk(plan):
+        if node["Node Type"] == "Seq Scan":
+            rows = (node.get("Actual Rows", 0) + node.get("Rows Removed by Filter", 0)) * node.get("Actual Loops", 1)
+            scanned[node["Relation Name"]] = scanned.get(node["Relation Name"], 0) + int(rows)
+    return scanned
+
+
+async def explain(connection, sql: str, args: tuple) -> dict:
+    plan = await connection.fetchval(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", *args)
+    return json.loads(plan)[0]
+
+
+async def check(connection, name: str, sql: str, extra_args: tuple, ids: list[int]) -> dict:
+    samples, buffers, seq_scans, missing = [], [], {}, set()
+    for id_ in ids:
+        result = await explain(connection, sql, (id_, *extra_args))
+        plan = result["Plan"]
+        samples.append(result["Execution Time"])
+        buffers.append(plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0))
+        for table, rows in _seq_scans(plan).items():
+            seq_scans[table] = max(seq_scans.get(table, 0), rows)
+        missing.update(set(REQUIRED_INDEXES.get(name, ())) - _indexes_used(plan))
+    if not samples:
+        return {
+            "samples": 0, "execution_ms": 0.0, "max_execution_ms": 0.0, "buffers": 0,
+            "seq_scans": {}, "missing_indexes": [],
+        }
+    return {
+        "samples": len(samples),
+        "execution_ms": statistics.median(samples),
+        "max_execution_ms": max(samples),
+        "buffers": max(buffers),
+        "seq_scans": seq_scans,
+        "missing_indexes": sorted(missing),
+    }
+
+
+def failures(results: dict, args, budgets: dict, baseline: dict | None) -> list[str]:
+    found = []
+    for name, r in results.items():
+        for table, rows in r["seq_scans"].items():
+            if rows > args.seq_scan_rows:
+                found.append(f"{name}: sequential scan of {table} read {rows:,} rows (limit {args.seq_scan_rows:,})")
+        for index in r["missing_indexes"]:
+            found.append(f"{name}: plan does not use {index}")
+        if not r["samples"]:
+            continue
+        if name not in budgets:
+            found.append(f"{name}: no buffer budget in {os.path.basename(BUDGETS_FILE)}; run with --calibrate")
+        elif r["buffers"] > int(budgets[name] * args.budget_scale):
+            found.append(f"{name}: {r['buffers']:,} buffers (budget {int(budgets[name] * args.budget_scale):,})")
+        before = (baseline or {}).get(name)
+        if before and before["buffers"] and r["buffers"] > before["buffers"] * (1 + args.tolerance):
+            found.append(
+                f"{name}: {r['buffers']:,} buffers, {100 * (r['buffers'] / before['buffers'] - 1):+.0f}% "
+                f"over the baseline's {before['buffers']:,}"
+            )
+    return found
+
+
+def report(results: dict, budgets: dict, budget_scale: float):
+    print(f"{'query':<32} {'n':>4} {'p50':>9} {'max':>9} {'buffers':>8} {'budget':>8}  seq scans (rows)")
+    for name, r in results.items():
+        scans = ", ".join(f"{table} {rows:,}" for table, rows in sorted(r["seq_scans"].items())) or "-"
+        budget = f"{int(budgets[name] * budget_scale):,}" if name in budgets else "-"
+        print(
+            f"{name:<32} {r['samples']:>4} {r['execution_ms']:>7.2f}ms {r['max_execution_ms']:>7.2f}ms "
+            f"{r['buffers']:>8,} {budget:>8}  {scans}"
+        )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL"))
+    # smaller data sets get (rightly) different plans: hash joins over a seq
+    # scan of users or listings beat index probes when those tables are tiny
+    parser.add_argument("--listings", type=int, default=100_000)
+    parser.add_argument("--renters", type=int, default=100_000)
+    parser.add_argument("--swipes", type=int, default=3_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-load", action="store_true", help="reuse the data set from a previous run")
+    parser.add_argument("--samples", type=int, default=20, help="ids explained per query")
+    parser.add_argument("--queries", nargs="+", help="only these queries")
+    parser.add_argument("--seq-scan-rows", type=int, default=1000, help="most rows one sequential scan may read")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="multiply the budgets by this")
+    parser.add_argument("--calibrate", action="store_true", help="write this run's buffers as the budgets")
+    parser.add_argument("--headroom", type=float, default=0.2, help="budget over the worst sample, with --calibrate")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="buffer growth allowed over --baseline")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare buffers against")
+    parser.add_argument("--out", help="write the results as JSON")
+    args = parser.parse_args()
+
+    if not args.dsn:
+        raise SystemExit("Set BENCH_DATABASE_URL or pass --dsn (use a scratch database)")
+    os.environ.setdefault("DATABASE_URL", args.dsn)
+    checks = hot_queries()
+    unknown = set(args.queries or ()) - set(checks)
+    if unknown:
+        raise SystemExit(f"Unknown queries: {', '.join(sorted(unknown))} (choose from {', '.join(checks)})")
+
+    connection = await asyncpg.connect(args.dsn)
+    try:
+        if not args.skip_load:
+            print(f"[bench] loading {args.listings:,} listings, {args.renters:,} renters, "
+                  f"{args.swipes:,} swipes into {SCHEMA}")
+            start = time.perf_counter()
+            await synthetic.load_dataset(
+                connection, SCHEMA, args.listings, args.renters, args.swipes, args.seed
+            )
+            print(f"[bench] loaded in {time.perf_counter() - start:.1f}s")
+        await connection.execute(f"SET search_path TO {SCHEMA}, public")
+
+        rng = random.Random(args.seed)
+        results = {}
+        for name in args.queries or checks:
+            sql, id_kind, extra_args = checks[name]
+            ids = [row[0] for row in await connection.fetch(ID_QUERIES[id_kind])]
+            results[name] = await check(
+                connection, name, sql, extra_args, rng.sample(ids, min(args.samples, len(ids)))
+            )
+    finally:
+        await connection.close()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    budgets = load_budgets()
+    if args.calibrate:
+        budgets = {**budgets, **calibrated_budgets(results, args.headroom)}
+        with open(BUDGETS_FILE, "w") as f:
+            json.dump(
+                {"args": {k: v for k, v in vars(args).items() if k in ("listings", "renters", "swipes", "seed", "samples", "headroom")},
+                 "budgets": budgets},
+                f,
+                indent=2,
+            )
+        print(f"[bench] budgets written to {BUDGETS_FILE}")
+    report(results, budgets, args.budget_scale)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(
+                {"args": {k: v for k, v in vars(args).items() if k not in ("dsn", "out", "baseline")},
+                 "results": results},
+                f,
+                indent=2,
+            )
+        print(f"[bench] results written to {args.out}")
+
+    found = failures(results, args, budgets, baseline)
+    for failure in found:
+        print(f"[FAIL] {failure}")
+    if found:
+        raise SystemExit(1)
+    print("[bench] all plans within limits")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
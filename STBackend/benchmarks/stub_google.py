@@ -0,0 +1,100 @@
+"""
+Local stand-in for the Google Geocoding and Places Autocomplete endpoints the
+backend calls, with deterministic answers, optional latency and call counters.
+Lets the geocode/autocomplete caches be exercised without an API key.
+
+Usage (from STBackend/):
+    STUB_LATENCY_MS=80 uvicorn benchmarks.stub_google:app --port 8081
+
+    GOOGLE_GEOCODE_URL=http://127.0.0.1:8081/maps/api/geocode/json \\
+    GOOGLE_AUTOCOMPLETE_URL=http://127.0.0.1:8081/maps/api/place/autocomplete/json \\
+        uvicorn server:app
+
+GET /stats returns how many upstream calls each endpoint received.
+"""
+
+import asyncio
+import hashlib
+import os
+from collections import Counter
+
+from fastapi import FastAPI
+
+from benchmarks.synthetic import CITIES
+
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "0"))
+
+STREETS = [
+    "University Ave W", "University Ave E", "Union St", "King St N", "King St W",
+    "Kingsway", "Queen St W", "Columbia St W", "Lester St", "Albert St",
+    "Phillip St", "Erb St W", "Weber St N", "Bloor St W", "Yonge St",
+]
+STREET_CATALOGUE = [
+    f"{number} {street}, {city}"
+    for city, *_ in CITIES
+    for street in STREETS
+    for number in (10, 200)
+]
+
+app = FastAPI()
+calls = Counter()
+
+
+def _place(text: str) -> dict:
+    digest = hashlib.sha1(text.strip().lower().encode()).digest()
+    name, lat, lng, _ = CITIES[digest[0] % len(CITIES)]
+    # spread within ~5 km of the city centre, same text -> same point
+    offset_lat = (int.from_bytes(digest[1:3], "big") / 65535 - 0.5) * 0.09
+    offset_lng = (int.from_bytes(digest[3:5], "big") / 65535 - 0.5) * 0.12
+    return {
+        "place_id": "stub_" + digest.hex()[:20],
+        "formatted_address": f"{text.strip().title()}, {name}, Canada",
+        "lat": round(lat + offset_lat, 6),
+        "lng": round(lng + offset_lng, 6),
+    }
+
+
+async def _latency():
+    if STUB_LATENCY_MS:
+        await asyncio.sleep(STUB_LATENCY_MS / 1000)
+
+
+@app.get("/maps/api/geocode/json")
+async def geocode(address: str = "", key: str | None = None):
+    calls["geocode"] += 1
+    await _latency()
+    if not address.strip():
+        return {"status": "ZERO_RESULTS", "results": []}
+    place = _place(address)
+    return {
+        "status": "OK",
+        "results": [{
+            "place_id": place["place_id"],
+            "formatted_address": place["formatted_address"],
+            "geometry": {"location": {"lat": place["lat"], "lng": place["lng"]}},
+        }],
+    }
+
+
+@app.get("/maps/api/place/autocomplete/json")
+async def autocomplete(input: str = "", key: str | None = None, components: str | None = None):
+    calls["autocomplete"] += 1
+    await _latency()
+    text = " ".join(input.split()).lower()
+    matches = [street for street in STREET_CATALOGUE if text and text in street.lower()]
+    if not matches:
+        return {"status": "ZERO_RESULTS", "predictions": []}
+    predictions = []
+    for street in matches[:5]:
+        city, province = street.split(", ")[1:3]
+        predictions.append({
+            "description": street + ", Canada",
+            "place_id": _place(street)["place_id"],
+            "terms": [{"value": street.split(", ")[0]}, {"value": city}, {"value": province}, {"value": "Canada"}],
+        })
+    return {"status": "OK", "predictions": predictions}
+
+
+@app.get("/stats")
+async def stats():
+    return dict(calls)
@@ -0,0 +1,298 @@
+"""
+Seeded synthetic data for the benchmark scripts.
+
+Everything here is deterministic for a given seed and never calls Google:
+locations are sampled around a fixed set of city centres, so candidate
+queries see realistic clustering instead of a uniform spread over Canada.
+Generators yield tuples in table column order so they can be handed straight
+to asyncpg's copy_records_to_table.
+"""
+
+import math
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+SQL_DIR = Path(__file__).resolve().parent.parent / "database_setup" / "SQLQueries"
+
+KM_PER_DEG_LAT = 111.045
+
+# (name, latitude, longitude, relative weight)
+CITIES = [
+    ("Waterloo, ON", 43.4643, -80.5204, 3),
+    ("Toronto, ON", 43.6532, -79.3832, 10),
+    ("Guelph, ON", 43.5448, -80.2482, 2),
+    ("London, ON", 42.9849, -81.2453, 2),
+    ("Hamilton, ON", 43.2557, -79.8711, 3),
+    ("Ottawa, ON", 45.4215, -75.6972, 4),
+    ("Montreal, QC", 45.5019, -73.5674, 7),
+    ("Vancouver, BC", 49.2827, -123.1207, 6),
+    ("Edmonton, AB", 53.5461, -113.4938, 3),
+    ("Calgary, AB", 51.0447, -114.0719, 4),
+]
+
+BUILDING_TYPES = ["Apartment", "Condo", "House", "Townhouse", "Basement", "Studio"]
+AMENITIES = [
+    "Wifi", "Laundry", "Parking", "Gym", "Air Conditioning", "Dishwasher",
+    "Balcony", "Furnished", "Elevator", "Pool",
+]
+GENDERS = ["male", "female", "nonbinary", "other", "prefer not to say"]
+
+USER_COLUMNS = ["id", "first_name", "last_name", "password", "email", "profile_photo"]
+LOCATION_COLUMNS = ["id", "places_api_id", "address_string", "longitude", "latitude"]
+LISTING_COLUMNS = [
+    "id", "user_id", "is_active", "locations_id", "start_date", "end_date",
+    "target_gender", "asking_price", "building_type_id", "num_bedrooms",
+    "num_bathrooms", "pet_friendly", "utilities_incl", "description",
+]
+RENTER_COLUMNS = [
+    "id", "user_id", "is_active", "locations_id", "start_date", "end_date",
+    "age", "gender", "budget", "building_type_id", "num_bedrooms",
+    "num_bathrooms", "has_pet", "bio",
+]
+
+_CITY_WEIGHTS = [c[3] for c in CITIES]
+
+
+def city_point(rng: random.Random, spread_km: float = 8.0):
+    """Sample a (city, lat, lng) point normally distributed around a city centre."""
+    name, lat, lng, _ = rng.choices(CITIES, weights=_CITY_WEIGHTS)[0]
+    dlat = rng.gauss(0, spread_km) / KM_PER_DEG_LAT
+    dlng = rng.gauss(0, spread_km) / (KM_PER_DEG_LAT * math.cos(math.radians(lat)))
+    return name, round(lat + dlat, 4), round(lng + dlng, 4)
+
+
+def group_by_city(ids, cities) -> dict[str, list[int]]:
+    """ids bucketed by the city recorded for them (see generate_locations(cities=...))."""
+    grouped = {}
+    for item_id, city in zip(ids, cities):
+        grouped.setdefault(city, []).append(item_id)
+    return grouped
+
+
+def term_dates(rng: random.Random, today: date):
+    """A start/end pair satisfying chk_start_date_future and chk_term_length."""
+    start = today + timedelta(days=rng.randint(5, 200))
+    end = start + timedelta(days=rng.randint(32, 360))
+    return start, end
+
+
+def generate_users(count: int, start_id: int = 1):
+    for user_id in range(start_id, start_id + count):
+        yield (
+            user_id,
+            f"First{user_id}",
+            f"Last{user_id}",
+            "not-a-real-hash",
+            f"user{user_id}@bench.local",
+            None,
+        )
+
+
+def generate_locations(rng: random.Random, count: int, start_id: int = 1, cities: list | None = None):
+    """Locations clustered around CITIES; the city of each is appended to `cities` if given."""
+    for location_id in range(start_id, start_id + count):
+        city, lat, lng = city_point(rng)
+        if cities is not None:
+            cities.append(city)
+        yield (
+            location_id,
+            f"synthetic_{location_id}",
+            f"{location_id} Synthetic St, {city}",
+            Decimal(str(lng)),
+            Decimal(str(lat)),
+        )
+
+
+def generate_listings(
+    rng: random.Random,
+    count: int,
+    user_count: int,
+    location_start_id: int = 1,
+    today: date | None = None,
+):
+    """One listing per location, owned by users 1..user_count."""
+    today = today or date.today()
+    for i in range(count):
+        start, end = term_dates(rng, today)
+        yield (
+            i + 1,
+            rng.randint(1, user_count),
+            rng.random() > 0.05,
+            location_start_id + i,
+            start,
+            end,
+            rng.choice(GENDERS),
+            Decimal(rng.randint(600, 3500)),
+            rng.randint(1, len(BUILDING_TYPES)),
+            rng.randint(1, 4),
+            rng.randint(1, 3),
+            rng.random() < 0.4,
+            rng.random() < 0.5,
+            None,
+        )
+
+
+def generate_renters(
+    rng: random.Random,
+    count: int,
+    user_start_id: int,
+    location_start_id: int,
+    today: date | None = None,
+):
+    """One renter profile per user, starting at user_start_id (user_id is unique)."""
+    today = today or date.today()
+    for i in range(count):
+        start, end = term_dates(rng, today)
+        yield (
+            i + 1,
+            user_start_id + i,
+            rng.random() > 0.05,
+            location_start_id + i,
+            start,
+            end,
+            rng.randint(18, 40),
+            rng.choice(GENDERS),
+            Decimal(rng.randint(700, 3000)),
+            rng.randint(1, len(BUILDING_TYPES)),
+            rng.randint(1, 3),
+            rng.randint(1, 2),
+            rng.random() < 0.15,
+            None,
+        )
+
+
+def generate_photos(rng: random.Random, listing_count: int, max_per_listing: int = 5):
+    for listing_id in range(1, listing_count + 1):
+        for n in range(rng.randint(1, max_per_listing)):
+            yield (listing_id, f"https://bench.invalid/{listing_id}/{n}.jpg", "cover" if n == 0 else None)
+
+
+def generate_listing_amenities(rng: random.Random, listing_count: int):
+    amenity_ids = range(1, len(AMENITIES) + 1)
+    for listing_id in range(1, listing_count + 1):
+        for amenity_id in sorted(rng.sample(amenity_ids, rng.randint(0, 5))):
+            yield (listing_id, amenity_id)
+
+
+def generate_swipes(
+    rng: random.Random,
+    count: int,
+    swiper_cities: list[str],
+    targets_by_city: dict[str, list[int]],
+    target_appeal: list[float],
+):
+    """
+    About `count` (swiper_id, target_id, is_right) rows for swipers
+    1..len(swiper_cities). Each swiper swipes on distinct targets in its own
+    city, as the candidate radius would have shown them, and swipes right with
+    the target's appeal as probability, so some targets are liked by many
+    and co-likes cluster. Rows are in swiper order, targets distinct per swiper.
+    """
+    swiper_count = len(swiper_cities)
+    per_swiper = count / swiper_count if swiper_count else 0
+    emitted = 0
+    for swiper_id, city in enumerate(swiper_cities, start=1):
+        pool = targets_by_city.get(city, ())
+        # spread the remainder so the total lands on count
+        quota = int(per_swiper * swiper_id) - int(per_swiper * (swiper_id - 1))
+        quota = min(quota, len(pool), count - emitted)
+        for target_id in rng.sample(pool, quota):
+            yield (swiper_id, target_id, rng.random() < target_appeal[target_id - 1])
+        emitted += quota
+
+
+async def create_schema(connection, schema: str):
+    """(Re)create an isolated schema and load the app's tables and functions into it."""
+    await connection.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+    await connection.execute(f"CREATE SCHEMA {schema}")
+    await connection.execute(f"SET search_path TO {schema}, public")
+    for name in ("create_tables.sql", "create_functions.sql"):
+        await connection.execute((SQL_DIR / name).read_text())
+    await connection.executemany(
+        "INSERT INTO building_types (id, type) VALUES ($1, $2)",
+        list(enumerate(BUILDING_TYPES, start=1)),
+    )
+    await connection.executemany(
+        "INSERT INTO amenities (id, name) VALUES ($1, $2)",
+        list(enumerate(AMENITIES, start=1)),
+    )
+
+
+# Trigger-maintained tables and their backfills; run after the bulk load so the
+# triggers don't fire once per copied row.
+DERIVED_SQL_FILES = ("create_view.sql", "deactivate_functions.sql", "create_similarity.sql")
+
+
+async def load_dataset(
+    connection,
+    schema: str,
+    listings: int,
+    renters: int,
+    swipes: int,
+    seed: int = 42,
+    listing_swipe_share: float = 0.3,
+    log=print,
+):
+    """
+    Create `schema` from scratch and fill every table with a seeded data set:
+    users, city-clustered locations, listings with photos and amenities,
+    renter profiles, and `swipes` swipes split between renter_on_listing and
+    listing_on_renter. Same arguments, same rows.
+    """
+    rng = random.Random(seed)
+    owners = max(1, listings // 2)
+
+    async def copy(table, records, columns):
+        start = time.perf_counter()
+        result = await connection.copy_records_to_table(
+            table, records=records, columns=columns, schema_name=schema
+        )
+        log(f"[bench] {table}: {result} in {time.perf_counter() - start:.1f}s")
+
+    await create_schema(connection, schema)
+    await copy("users", generate_users(owners + renters), USER_COLUMNS)
+    cities = []
+    await copy("locations", generate_locations(rng, listings + renters, cities=cities), LOCATION_COLUMNS)
+    await copy("listings", generate_listings(rng, listings, owners), LISTING_COLUMNS)
+    await copy(
+        "renter_profiles",
+        generate_renters(rng, renters, user_start_id=owners + 1, location_start_id=listings + 1),
+        RENTER_COLUMNS,
+    )
+    await copy("photos", generate_photos(rng, listings), ["listing_id", "url", "label"])
+    await copy("listing_amenities", generate_listing_amenities(rng, listings), ["listing_id", "amenity_id"])
+
+    listing_cities, renter_cities = cities[:listings], cities[listings:]
+    listing_appeal = [rng.betavariate(2, 5) for _ in range(listings)]
+    renter_appeal = [rng.betavariate(2, 5) for _ in range(renters)]
+    renter_swipes = int(swipes * (1 - listing_swipe_share))
+    await copy(
+        "renter_on_listing",
+        generate_swipes(
+            rng, renter_swipes, renter_cities,
+            group_by_city(range(1, listings + 1), listing_cities), listing_appeal,
+        ),
+        ["renter_profile_id", "listing_id", "is_right"],
+    )
+    await copy(
+        "listing_on_renter",
+        generate_swipes(
+            rng, swipes - renter_swipes, listing_cities,
+            group_by_city(range(1, renters + 1), renter_cities), renter_appeal,
+        ),
+        ["listing_id", "renter_profile_id", "is_right"],
+    )
+
+    for table in ("users", "locations", "listings", "renter_profiles"):
+        await connection.execute(
+            f"SELECT setval(pg_get_serial_sequence('{schema}.{table}', 'id'), "
+            f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {schema}.{table}), false)"
+        )
+    for name in DERIVED_SQL_FILES:
+        start = time.perf_counter()
+        await connection.execute((SQL_DIR / name).read_text())
+        log(f"[bench] {name} in {time.perf_counter() - start:.1f}s")
+    await connection.execute("ANALYZE")
@@ -1,4 +1,50 @@
-CREATE OR REPLACE FUNCTION get_listing_candidates(renter_id bigint)
+-- Great-circle distance in km between two lat/lng points
+CREATE OR REPLACE FUNCTION haversine_km(
+    lat1 double precision,
+    lng1 double precision,
+    lat2 double precision,
+    lng2 double precision
+)
+RETURNS double precision AS $$
+    SELECT 6371 * 2 * ASIN(SQRT(
+        POWER(SIN(RADIANS(lat2 - lat1) / 2), 2) +
+        COS(RADIANS(lat1)) * COS(RADIANS(lat2)) *
+        POWER(SIN(RADIANS(lng2 - lng1) / 2), 2)
+    ));
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+-- Box (in lng/lat degrees) enclosing the circle of radius_km around a point.
+-- Matches the expression indexed by idx_locations_point, so
+-- point(longitude, latitude) <@ bbox_around(...) is answered from the index.
+CREATE OR REPLACE FUNCTION bbox_around(
+    lat double precision,
+    lng double precision,
+    radius_km double precision
+)
+RETURNS box AS $$
+    SELECT box(
+        point(lng - radius_km / (111.045 * GREATEST(COS(RADIANS(lat)), 0.01)), lat - radius_km / 111.045),
+        point(lng + radius_km / (111.045 * GREATEST(COS(RADIANS(lat)), 0.01)), lat + radius_km / 111.045)
+    );
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+-- Candidate functions return every candidate within radius_km, in no
+-- particular order, with its exact distance_km. They are plain SQL, so a
+-- query calling them is planned (and streamed) as if their SELECT were
+-- written in place: the callers score, order and page the candidates
+-- themselves (utils/matching.py, utils/export.py), and the bounding box is
+-- answered from idx_locations_point.
+DROP FUNCTION IF EXISTS get_listing_candidates(bigint);
+DROP FUNCTION IF EXISTS get_renter_candidates(bigint);
+DROP FUNCTION IF EXISTS get_listing_candidates(bigint, integer);
+DROP FUNCTION IF EXISTS get_renter_candidates(bigint, integer);
+DROP FUNCTION IF EXISTS get_listing_candidates(bigint, integer, double precision);
+DROP FUNCTION IF EXISTS get_renter_candidates(bigint, integer, double precision);
+
+CREATE OR REPLACE FUNCTION get_listing_candidates(
+    p_renter_id bigint,
+    p_radius_km double precision DEFAULT 50
+)
 RETURNS TABLE (
     id bigint,
     user_id bigint,
@@ -16,52 +62,48 @@ RETURNS TABLE (
     address_string character varying(255),
     distance_km double precision
 ) AS $$
-BEGIN
-    RETURN QUERY
-    WITH base AS (
-        SELECT
-            l.id,
-            l.user_id,
-            l.is_active,
-            l.asking_price,
-            l.num_bedrooms,
-            l.num_bathrooms,
-            l.start_date,
-            l.end_date,
-            l.pet_friendly,
-            l.utilities_incl,
-            l.locations_id,
-            l.building_type_id,
-            l.target_gender,
-            loc.address_string,
-            6371 * 2 * ASIN(SQRT(
-                POWER(SIN(RADIANS(loc.latitude - loc_ref.latitude) / 2), 2) +
-                COS(RADIANS(loc_ref.latitude)) * COS(RADIANS(loc.latitude)) *
-                POWER(SIN(RADIANS(loc.longitude - loc_ref.longitude) / 2), 2)
-            )) AS distance_km
-        FROM listings l
-        JOIN renter_profiles r ON r.id = renter_id
-        JOIN locations loc_ref ON r.locations_id = loc_ref.id
-        JOIN locations loc ON l.locations_id = loc.id
-        WHERE l.is_active
-          AND l.user_id != r.user_id
-          AND l.num_bedrooms >= r.num_bedrooms
-          AND r.start_date >= l.start_date - 15
-          AND r.end_date <= l.end_date + 15
-          AND (NOT r.has_pet OR l.pet_friendly)
-          AND NOT EXISTS (
-              SELECT 1 FROM renter_on_listing rol
-              WHERE rol.renter_profile_id = renter_id
-                AND rol.listing_id = l.id
-          )
-    )
-    SELECT * FROM base
-    WHERE base.distance_km < 50
-    LIMIT 50;
-END;
-$$ LANGUAGE plpgsql;
+    SELECT
+        l.id,
+        l.user_id,
+        l.is_active,
+        l.asking_price,
+        l.num_bedrooms,
+        l.num_bathrooms,
+        l.start_date,
+        l.end_date,
+        l.pet_friendly,
+        l.utilities_incl,
+        l.locations_id,
+        l.building_type_id,
+        l.target_gender,
+        loc.address_string,
+        haversine_km(ref.latitude::float8, ref.longitude::float8, loc.latitude::float8, loc.longitude::float8) AS distance_km
+    FROM renter_profiles r
+    JOIN locations ref ON ref.id = r.locations_id
+    -- index-backed prefilter; exact distance is only computed for these rows
+    JOIN locations loc
+        ON point(loc.longitude::float8, loc.latitude::float8)
+           <@ bbox_around(ref.latitude::float8, ref.longitude::float8, p_radius_km)
+    JOIN listings l ON l.locations_id = loc.id
+    WHERE r.id = p_renter_id
+      AND haversine_km(ref.latitude::float8, ref.longitude::float8, loc.latitude::float8, loc.longitude::float8) < p_radius_km
+      AND l.is_active
+      AND l.user_id != r.user_id
+      AND l.num_bedrooms >= r.num_bedrooms
+      AND r.start_date >= l.start_date - 15
+      AND r.end_date <= l.end_date + 15
+      AND (NOT r.has_pet OR l.pet_friendly)
+      AND NOT EXISTS (
+          SELECT 1 FROM renter_on_listing rol
+          WHERE rol.renter_profile_id = r.id
+            AND rol.listing_id = l.id
+      )
+$$ LANGUAGE sql STABLE PARALLEL SAFE;
 
-CREATE OR REPLACE FUNCTION get_renter_candidates(listing_id bigint)
+CREATE OR REPLACE FUNCTION get_renter_candidates(
+    p_listing_id bigint,
+    p_radius_km double precision DEFAULT 50
+)
 RETURNS TABLE (
     id bigint,
     user_id bigint,
@@ -79,52 +121,40 @@ RETURNS TABLE (
     address_string character varying(255),
     distance_km double precision
 ) AS $$
-BEGIN
-    RETURN QUERY
-    WITH base AS (
-        SELECT
-            r.id,
-            r.user_id,
-            r.is_active,
-            r.budget,
-            r.num_bedrooms,
-            r.num_bathrooms,
-            r.start_date,
-            r.end_date,
-            r.has_pet,
-            r.locations_id,
-            r.building_type_id,
-            r.gender,
-            r.bio,
-            loc.address_string,
-            6371 * 2 * ASIN(SQRT(
-                POWER(SIN(RADIANS(loc.latitude - loc_ref.latitude) / 2), 2) +
-                COS(RADIANS(loc_ref.latitude)) * COS(RADIANS(loc.latitude)) *
-                POWER(SIN(RADIANS(loc.longitude - loc_ref.longitude) / 2), 2)
-            )) AS distance_km
-        FROM renter_profiles r
-        JOIN listings l ON l.id = listing_id
-        JOIN locations loc_ref ON l.locations_id = loc_ref.id
-        JOIN locations loc ON r.locations_id = loc.id
-        WHERE r.is_active
-          AND l.user_id != r.user_id
-          AND l.num_bedrooms >= r.num_bedrooms
-          AND r.start_date >= l.start_date - 15
-          AND r.end_date <= l.end_date + 15
-          AND (NOT r.has_pet OR l.pet_friendly)
-        --   AND NOT EXISTS (
-        --       SELECT 1 FROM renter_on_listing rol
-        --       WHERE rol.renter_profile_id = r.id
-        --         AND rol.listing_id = l.id
-        --   )
-          AND NOT EXISTS (
-              SELECT 1 FROM listing_on_renter lor
-              WHERE lor.listing_id = l.id
-                AND lor.renter_profile_id = r.id
-          )
-    )
-    SELECT * FROM base
-    WHERE base.distance_km < 50
-    LIMIT 50;
-END;
-$$ LANGUAGE plpgsql;
+    SELECT
+        r.id,
+        r.user_id,
+        r.is_active,
+        r.budget,
+        r.num_bedrooms,
+        r.num_bathrooms,
+        r.start_date,
+        r.end_date,
+        r.has_pet,
+        r.locations_id,
+        r.building_type_id,
+        r.gender,
+        r.bio,
+        loc.address_string,
+        haversine_km(ref.latitude::float8, ref.longitude::float8, loc.latitude::float8, loc.longitude::float8) AS distance_km
+    FROM listings l
+    JOIN locations ref ON ref.id = l.locations_id
+    -- index-backed prefilter; exact distance is only computed for these rows
+    JOIN locations loc
+        ON point(loc.longitude::float8, loc.latitude::float8)
+           <@ bbox_around(ref.latitude::float8, ref.longitude::float8, p_radius_km)
+    JOIN renter_profiles r ON r.locations_id = loc.id
+    WHERE l.id = p_listing_id
+      AND haversine_km(ref.latitude::float8, ref.longitude::float8, loc.latitude::float8, loc.longitude::float8) < p_radius_km
+      AND r.is_active
+      AND l.user_id != r.user_id
+      AND l.num_bedrooms >= r.num_bedrooms
+      AND r.start_date >= l.start_date - 15
+      AND r.end_date <= l.end_date + 15
+      AND (NOT r.has_pet OR l.pet_friendly)
+      AND NOT EXISTS (
+          SELECT 1 FROM listing_on_renter lor
+          WHERE lor.listing_id = l.id
+            AND lor.renter_profile_id = r.id
+      )
+$$ LANGUAGE sql STABLE PARALLEL SAFE;
@@ -0,0 +1,235 @@
+-- Item-to-item co-like counts for collaborative recommendations: colikes is
+-- how many renters swiped right on both listing_id and neighbor_id. Stored
+-- in both directions, so a recommendation is a merge over the neighbour lists
+-- of the renter's likes.
+--
+-- The renter_on_listing triggers below only queue the swiped listing in
+-- listing_colike_jobs; recounting its pairs and the pruning run in the
+-- background (utils/colike_queue.py), so a swipe's transaction writes one
+-- row and holds no locks on popular listings' neighbour rows. Counts trail the
+-- swipes by a poll interval.
+--
+-- A job recounts pairs from the swipes as they are when it runs rather than
+-- applying a +1/-1, so a job seen twice, or after a later swipe on the same
+-- pair, can't count anything twice. Likes, unlikes and deleted swipes (e.g. on
+-- deactivation) are all queued. Approximate by design: only the listing's
+-- current neighbours and the swipers' most recent likes (history_limit) are
+-- recounted, and each listing keeps only its max_neighbors strongest
+-- neighbours once its list grows past twice that many. Both come from
+-- COLIKE_HISTORY_LIMIT and COLIKE_MAX_NEIGHBORS in utils/colike_queue.py.
+create table if not exists listing_colikes (
+    listing_id bigint not null references listings(id) on delete cascade,
+    neighbor_id bigint not null references listings(id) on delete cascade,
+    colikes int not null,
+    primary key (listing_id, neighbor_id)
+);
+
+-- swiped listings whose pairs haven't been recounted yet, oldest first
+create table if not exists listing_colike_jobs (
+    id bigserial primary key,
+    renter_profile_id bigint not null,
+    listing_id bigint not null
+);
+
+-- jobs used to carry a +1/-1
+alter table listing_colike_jobs drop column if exists delta;
+drop index if exists idx_listing_colike_jobs_swipe;
+
+
+-- Keep the top max_neighbors neighbours of each listing given, once a list
+-- is more than twice that long (so pruning is occasional, not per swipe).
+drop function if exists prune_listing_colikes(bigint[], int);
+create or replace function prune_listing_colikes(p_listing_ids bigint[], max_neighbors int)
+returns void as $$
+    delete from listing_colikes c
+    using (
+        select listing_id, neighbor_id,
+               row_number() over (partition by listing_id order by colikes desc, neighbor_id) as neighbor_rank
+        from listing_colikes
+        where listing_id in (
+            select listing_id from listing_colikes
+            where listing_id = any(p_listing_ids)
+            group by listing_id
+            having count(*) > 2 * max_neighbors
+        )
+    ) ranked
+    where c.listing_id = ranked.listing_id
+      and c.neighbor_id = ranked.neighbor_id
+      and ranked.neighbor_rank > max_neighbors;
+$$ language sql;
+
+
+-- Recount the co-likes of a listing with its current neighbours and with
+-- the history_limit most recent likes of each renter given,
+-- from the swipes as they are now, and store them in both directions. Pairs
+-- nobody likes any more are deleted. Running it twice changes nothing.
+-- Returns the listings that gained a neighbour, the only ones whose lists can
+-- need pruning.
+drop function if exists adjust_listing_colikes(bigint, bigint, bigint, int);
+drop function if exists adjust_listing_colikes(bigint, bigint, int);
+drop function if exists adjust_listing_colikes(bigint, bigint, int, bigint);
+drop function if exists refresh_listing_colikes(bigint, bigint[]);
+create or replace function refresh_listing_colikes(p_listing_id bigint, p_renter_ids bigint[], history_limit int)
+returns bigint[] as $$
+declare
+    neighbors bigint[];
+    counted_ids bigint[];
+    counts int[];
+    grown bigint[];
+begin
+    -- the listing was deleted after the swipe was queued
+    perform 1 from listings where id = p_listing_id;
+    if not found then
+        return '{}';
+    end if;
+
+    select array_agg(distinct candidate.listing_id) into neighbors
+    from (
+        select neighbor_id as listing_id from listing_colikes
+        where listing_id = p_listing_id
+        union all
+        select recent.listing_id
+        from unnest(p_renter_ids) as renter(id)
+        cross join lateral (
+            select r.listing_id from renter_on_listing r
+            where r.renter_profile_id = renter.id
+              and r.is_right = true
+            order by r.swiped_at desc
+            limit history_limit
+        ) recent
+    ) candidate
+    where candidate.listing_id <> p_listing_id;
+
+    if neighbors is null then
+        return '{}';
+    end if;
+
+    select coalesce(array_agg(counted.listing_id order by counted.listing_id), '{}'),
+           coalesce(array_agg(counted.colikes order by counted.listing_id), '{}')
+    into counted_ids, counts
+    from (
+        select b.listing_id, count(*)::int as colikes
+        from renter_on_listing a
+        join renter_on_listing b
+          on b.renter_profile_id = a.renter_profile_id
+        where a.listing_id = p_listing_id
+          and a.is_right = true
+          and b.listing_id = any(neighbors)
+          and b.is_right = true
+        group by b.listing_id
+    ) counted;
+
+    delete from listing_colikes
+    where ((listing_id = p_listing_id and neighbor_id = any(neighbors))
+        or (neighbor_id = p_listing_id and listing_id = any(neighbors)))
+      and case when listing_id = p_listing_id then neighbor_id else listing_id end <> all(counted_ids);
+
+    with upserted as (
+        insert into listing_colikes (listing_id, neighbor_id, colikes)
+        select p_listing_id, c.neighbor_id, c.colikes from unnest(counted_ids, counts) as c(neighbor_id, colikes)
+        union all
+        select c.neighbor_id, p_listing_id, c.colikes from unnest(counted_ids, counts) as c(neighbor_id, colikes)
+        on conflict (listing_id, neighbor_id)
+        do update set colikes = excluded.colikes
+        where listing_colikes.colikes <> excluded.colikes
+        returning listing_id, xmax = 0 as inserted
+    )
+    select coalesce(array_agg(distinct listing_id), '{}') into grown
+    from upserted where inserted;
+    return grown;
+end;
+$$ language plpgsql;
+
+
+-- Recount the listings of up to batch_size queued swipes, each listing once
+-- however many of its swipes are queued, then prune the lists that grew. One
+-- batch runs at a time (across workers); returns how many jobs it took, 0
+-- when another batch holds the queue.
+drop function if exists process_listing_colike_jobs(int, int);
+create or replace function process_listing_colike_jobs(batch_size int, max_neighbors int, history_limit int)
+returns int as $$
+declare
+    job record;
+    done bigint[];
+    grown bigint[] := '{}';
+begin
+    if not pg_try_advisory_xact_lock(hashtextextended('listing_colike_jobs', 0)) then
+        return 0;
+    end if;
+
+    select coalesce(array_agg(id), '{}') into done
+    from (
+        select id from listing_colike_jobs
+        order by id
+        limit batch_size
+    ) batch;
+
+    for job in
+        select listing_id, array_agg(distinct renter_profile_id) as renter_ids
+        from listing_colike_jobs
+        where id = any(done)
+        group by listing_id
+    loop
+        grown := grown || refresh_listing_colikes(job.listing_id, job.renter_ids, history_limit);
+    end loop;
+
+    delete from listing_colike_jobs where id = any(done);
+    perform prune_listing_colikes(array(select distinct unnest(grown)), max_neighbors);
+    return cardinality(done);
+end;
+$$ language plpgsql;
+
+
+create or replace function sync_listing_colikes()
+returns trigger as $$
+begin
+    if tg_op = 'INSERT' and new.is_right
+       or tg_op = 'UPDATE' and old.is_right is distinct from new.is_right then
+        insert into listing_colike_jobs (renter_profile_id, listing_id)
+        values (new.renter_profile_id, new.listing_id);
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+drop trigger if exists renter_on_listing_colikes on renter_on_listing;
+create trigger renter_on_listing_colikes
+after insert or update of is_right on renter_on_listing
+for each row
+execute function sync_listing_colikes();
+
+-- Deleted likes (mostly the deactivation cascade's, thousands at a time) are
+-- queued in one statement.
+create or replace function queue_listing_colikes_of_deleted_swipes()
+returns trigger as $$
+begin
+    insert into listing_colike_jobs (renter_profile_id, listing_id)
+    select o.renter_profile_id, o.listing_id from old_rows o
+    where o.is_right;
+    return null;
+end;
+$$ language plpgsql;
+
+drop trigger if exists renter_on_listing_colikes_delete on renter_on_listing;
+create trigger renter_on_listing_colikes_delete
+after delete on renter_on_listing
+referencing old table as old_rows
+for each statement
+execute function queue_listing_colikes_of_deleted_swipes();
+
+
+-- backfill from existing right swipes
+insert into listing_colikes (listing_id, neighbor_id, colikes)
+select a.listing_id, b.listing_id, count(*)
+from renter_on_listing a
+join renter_on_listing b
+  on a.renter_profile_id = b.renter_profile_id
+ and a.listing_id <> b.listing_id
+where a.is_right = true
+  and b.is_right = true
+group by a.listing_id, b.listing_id
+on conflict (listing_id, neighbor_id) do nothing;
+
+-- pruned to COLIKE_MAX_NEIGHBORS' default; the worker prunes with the
+-- configured value as lists grow
+select prune_listing_colikes(array(select distinct listing_id from listing_colikes), 50);
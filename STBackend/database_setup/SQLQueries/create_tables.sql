@@ -11,14 +11,19 @@ create index if not exists idx_users_email on users(email);
 
 create table if not exists locations (
     id bigserial primary key,
-    places_api_id bigint not null,
+    places_api_id text not null,
     address_string varchar(255) not null,
     longitude decimal(7,4) not null,
     latitude decimal(7,4) not null
 );
 
+-- Google place ids are strings ('ChIJ...'); older databases declared a bigint
+alter table locations alter column places_api_id type text;
+
 create index if not exists idx_locations_places_api_id on locations(places_api_id);
 create index if not exists idx_locations_coords on locations(latitude, longitude);
+-- 2D index used by the candidate functions' bounding-box prefilter
+create index if not exists idx_locations_point on locations using gist (point(longitude::float8, latitude::float8));
 
 create table if not exists building_types (
     id serial primary key,
@@ -30,13 +35,21 @@ create table if not exists amenities (
     name varchar(255) not null unique
 );
 
-create type gender_enum as enum ('male', 'female', 'nonbinary', 'other', 'prefer not to say');
+do $$
+begin
+    create type gender_enum as enum ('male', 'female', 'nonbinary', 'other', 'prefer not to say');
+exception when duplicate_object then
+    null;
+end;
+$$;
 
 create table if not exists listings (
     id bigserial primary key,
     user_id bigint not null references users(id) on delete cascade,
     is_active boolean not null default true,
-    locations_id bigint not null references locations(id) on delete cascade,
+    -- null until the address in pending_address is geocoded (see utils/geocode_queue.py)
+    locations_id bigint references locations(id) on delete cascade,
+    pending_address text,
     start_date date not null,
     end_date date not null,
     target_gender gender_enum,
@@ -48,9 +61,7 @@ create table if not exists listings (
     utilities_incl boolean not null,
     description text,
 
-    constraint chk_start_date_future check (
-        start_date > current_date
-    ),
+    -- start_date > current_date is enforced by the check_start_date_future trigger below
     constraint chk_term_length check (
         end_date >= start_date + interval '1 month'
         and end_date <= start_date + interval '1 year'
@@ -61,7 +72,10 @@ create index if not exists idx_listings_user_id on listings(user_id);
 create index if not exists idx_listings_locations_id on listings(locations_id);
 create index if not exists idx_listings_building_type_id on listings(building_type_id);
 create index if not exists idx_listings_is_active on listings(is_active);
+create index if not exists idx_listings_active_locations_id on listings(locations_id) where is_active;
 create index if not exists idx_listings_required_attributes on listings(is_active, user_id, num_bedrooms, start_date, end_date);
+-- the expiry sweeper's scan (utils/expiry.py)
+create index if not exists idx_listings_active_end_date on listings(end_date) where is_active;
 
 create table if not exists photos (
     listing_id bigint not null references listings(id) on delete cascade,
@@ -76,7 +90,9 @@ create table if not exists renter_profiles (
     id bigserial primary key,
     user_id bigint not null references users(id) on delete cascade,
     is_active boolean not null default true,
-    locations_id bigint not null references locations(id) on delete cascade,
+    -- null until the address in pending_address is geocoded (see utils/geocode_queue.py)
+    locations_id bigint references locations(id) on delete cascade,
+    pending_address text,
     start_date date not null,
     end_date date not null,
     age int not null,
@@ -89,9 +105,7 @@ create table if not exists renter_profiles (
     bio text,
 
     unique(user_id),
-    constraint chk_start_date_future check (
-        start_date > current_date
-    ),
+    -- start_date > current_date is enforced by the check_start_date_future trigger below
     constraint chk_term_length check (
         end_date >= start_date + interval '1 month'
         and end_date <= start_date + interval '1 year'
@@ -105,30 +119,61 @@ create index if not exists idx_renter_profiles_user_id on renter_profiles(user_i
 create index if not exists idx_renter_profiles_locations_id on renter_profiles(locations_id);
 create index if not exists idx_renter_profiles_building_type_id on renter_profiles(building_type_id);
 create index if not exists idx_renter_profiles_is_active on renter_profiles(is_active);
+create index if not exists idx_renter_profiles_active_locations_id on renter_profiles(locations_id) where is_active;
+create index if not exists idx_renter_profiles_active_end_date on renter_profiles(end_date) where is_active;
 
+-- Swipes are the tables that grow without bound, so they are kept compact:
+-- keyed by (swiper, target) with no surrogate id, and hash-partitioned by the
+-- swiper, so the upsert, the candidate NOT EXISTS probe and a renter's likes
+-- each touch one partition. Besides the key there is one index on the target
+-- (the deactivation cascade) and, for renters, one on right swipes only.
+-- swiped_at orders a renter's likes for listing_colikes. Databases created
+-- with the old layout are converted by database_setup/migrate_swipes.py, which
+-- has to run before this script is re-run on them (swiped_at and the partitions
+-- below don't exist there yet).
+-- id is no key (a unique index would have to include the partition key); it
+-- is kept for the swipe endpoints' responses, which return it
 create table if not exists renter_on_listing (
-    id bigserial primary key,
+    id bigserial not null,
     renter_profile_id bigint not null references renter_profiles(id) on delete cascade,
     listing_id bigint not null references listings(id) on delete cascade,
     is_right boolean not null,
-    unique(renter_profile_id, listing_id)
-);
+    swiped_at timestamptz not null default now(),
+    primary key (renter_profile_id, listing_id)
+) partition by hash (renter_profile_id);
 
-create index if not exists idx_renter_on_listing_renter on renter_on_listing(renter_profile_id);
 create index if not exists idx_renter_on_listing_listing on renter_on_listing(listing_id);
-create index if not exists idx_renter_on_listing_is_right on renter_on_listing(is_right);
+-- a renter's likes, newest first: recommendations and listing_colikes
+create index if not exists idx_renter_on_listing_likes
+    on renter_on_listing(renter_profile_id, swiped_at desc) include (listing_id) where is_right;
 
 create table if not exists listing_on_renter (
-    id bigserial primary key,
+    id bigserial not null,
     listing_id bigint not null references listings(id) on delete cascade,
     renter_profile_id bigint not null references renter_profiles(id) on delete cascade,
     is_right boolean not null,
-    unique(listing_id, renter_profile_id)
-);
+    swiped_at timestamptz not null default now(),
+    primary key (listing_id, renter_profile_id)
+) partition by hash (listing_id);
 
-create index if not exists idx_listing_on_renter_listing on listing_on_renter(listing_id);
 create index if not exists idx_listing_on_renter_renter on listing_on_renter(renter_profile_id);
-create index if not exists idx_listing_on_renter_is_right on listing_on_renter(is_right);
+
+-- databases partitioned before the id came back
+alter table renter_on_listing add column if not exists id bigserial not null;
+alter table listing_on_renter add column if not exists id bigserial not null;
+
+do $$
+begin
+    for i in 0..15 loop
+        execute format(
+            'create table if not exists renter_on_listing_p%s partition of renter_on_listing '
+            'for values with (modulus 16, remainder %s)', i, i);
+        execute format(
+            'create table if not exists listing_on_renter_p%s partition of listing_on_renter '
+            'for values with (modulus 16, remainder %s)', i, i);
+    end loop;
+end;
+$$;
 
 create table if not exists listing_amenities (
     listing_id bigint not null references listings(id) on delete cascade,
@@ -137,3 +182,124 @@ create table if not exists listing_amenities (
 );
 
 create index if not exists idx_listing_amenities_listing on listing_amenities(listing_id);
+
+-- Precomputed swipe decks (see utils/deck.py). deck_kind is 'renter' for a
+-- renter profile's queue of listings and 'listing' for a listing's queue of renters.
+create table if not exists swipe_decks (
+    deck_kind varchar(16) not null check (deck_kind in ('renter', 'listing')),
+    owner_id bigint not null,
+    built_at timestamptz not null default now(),
+    expires_at timestamptz not null,
+    radius_km double precision not null default 50,
+    -- the last build scored every candidate in the radius, or found none past
+    -- the deck's tail, so there is nothing left to extend it with
+    exhausted boolean not null default false,
+    -- lowest score any of the deck's cards has been ranked at; cards appended
+    -- later are ranked below it (see utils/deck.py)
+    floor_score double precision,
+    primary key (deck_kind, owner_id)
+);
+
+alter table swipe_decks add column if not exists radius_km double precision not null default 50;
+alter table swipe_decks add column if not exists exhausted boolean not null default false;
+alter table swipe_decks add column if not exists floor_score double precision;
+
+create table if not exists swipe_deck_cards (
+    deck_kind varchar(16) not null,
+    owner_id bigint not null,
+    seq bigint not null,
+    target_id bigint not null,
+    -- rank of the card in its deck's pages; the card's own score, unless it
+    -- was appended below the deck's floor_score
+    score double precision,
+    card jsonb not null,
+    primary key (deck_kind, owner_id, seq),
+    unique (deck_kind, owner_id, target_id),
+    foreign key (deck_kind, owner_id) references swipe_decks(deck_kind, owner_id) on delete cascade
+);
+
+-- pages are read in score order with a (score, target_id) keyset cursor
+create index if not exists idx_swipe_deck_cards_score on swipe_deck_cards(deck_kind, owner_id, score desc, target_id);
+-- a deactivated or edited target's cards are dropped from every deck holding them
+create index if not exists idx_swipe_deck_cards_target on swipe_deck_cards(deck_kind, target_id);
+-- expired decks are purged by the expiry sweeper (utils/expiry.py)
+create index if not exists idx_swipe_decks_expires_at on swipe_decks(expires_at);
+
+-- Rows the expiry sweeper deactivated whose swipes it hasn't deleted yet. The
+-- deactivation triggers (deactivate_functions.sql) add them in the sweeper's
+-- own transaction, so a crash between deactivating and deleting leaves them
+-- here for the next sweep (see utils/expiry.py).
+create table if not exists swipe_cleanup_jobs (
+    target_kind varchar(16) not null check (target_kind in ('listing', 'renter')),
+    target_id bigint not null,
+    primary key (target_kind, target_id)
+);
+
+-- Geocoder results keyed by the normalized raw address the user typed
+-- (see utils/location_helper.py), so repeat addresses skip the Google call.
+create table if not exists geocode_cache (
+    normalized_address text primary key,
+    places_api_id text not null,
+    address_string varchar(255) not null,
+    latitude double precision not null,
+    longitude double precision not null,
+    created_at timestamptz not null default now()
+);
+
+-- Addresses waiting on the geocoder. A listing or renter profile whose address
+-- isn't in geocode_cache yet is saved with it in pending_address and one job
+-- here; a worker resolves it and attaches locations_id (see utils/geocode_queue.py).
+-- next_attempt_at is the retry time of a pending job and the lease expiry of a
+-- running one. Jobs are deleted once done; failed ones are kept for inspection.
+alter table listings alter column locations_id drop not null;
+alter table listings add column if not exists pending_address text;
+alter table renter_profiles alter column locations_id drop not null;
+alter table renter_profiles add column if not exists pending_address text;
+
+create table if not exists geocode_jobs (
+    id bigserial primary key,
+    target_kind varchar(16) not null check (target_kind in ('listing', 'renter')),
+    target_id bigint not null,
+    raw_address text not null,
+    status varchar(16) not null default 'pending' check (status in ('pending', 'running', 'failed')),
+    attempts int not null default 0,
+    next_attempt_at timestamptz not null default now(),
+    last_error text,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists idx_geocode_jobs_due on geocode_jobs(next_attempt_at) where status <> 'failed';
+create index if not exists idx_geocode_jobs_target on geocode_jobs(target_kind, target_id);
+
+-- start_date has to be in the future when it is set, not for the life of the
+-- row: as a check constraint it was re-evaluated on every update, so a listing
+-- or profile whose term had started could no longer be deactivated or expired.
+-- Raised as the same check violation, so callers see no difference.
+alter table listings drop constraint if exists chk_start_date_future;
+alter table renter_profiles drop constraint if exists chk_start_date_future;
+
+create or replace function check_start_date_future()
+returns trigger as $$
+begin
+    if tg_op = 'UPDATE' and new.start_date = old.start_date then
+        return new;
+    end if;
+    if new.start_date <= current_date then
+        raise exception 'new row for relation "%" violates check constraint "chk_start_date_future"', tg_table_name
+            using errcode = 'check_violation', constraint = 'chk_start_date_future', table = tg_table_name;
+    end if;
+    return new;
+end;
+$$ language plpgsql;
+
+drop trigger if exists listings_start_date_future on listings;
+create trigger listings_start_date_future
+before insert or update of start_date on listings
+for each row
+execute function check_start_date_future();
+
+drop trigger if exists renter_profiles_start_date_future on renter_profiles;
+create trigger renter_profiles_start_date_future
+before insert or update of start_date on renter_profiles
+for each row
+execute function check_start_date_future();
@@ -1,41 +1,151 @@
-drop view if exists mutual_matches;
-
-create view mutual_matches as
-with scored_matches as (
-  select
-    r.listing_id,
-    r.renter_profile_id,
-    (
+-- mutual_matches used to be a view joining both swipe tables with listings and
+-- renter_profiles on every read. It is now a table maintained by triggers on
+-- the swipe tables (and emptied by the deactivation triggers), with the
+-- compatibility score stored when the match happens.
+do $$
+begin
+    if exists (select 1 from pg_views where viewname = 'mutual_matches' and schemaname = current_schema()) then
+        drop view mutual_matches;
+    end if;
+end;
+$$;
+
+create table if not exists mutual_matches (
+    listing_id bigint not null references listings(id) on delete cascade,
+    renter_profile_id bigint not null references renter_profiles(id) on delete cascade,
+    compatibility_score int not null,
+    compatibility_percent numeric generated always as (round(compatibility_score * 100.0 / 7, 0)) stored,
+    compatibility_label varchar(32) generated always as (
+        case
+            when compatibility_score = 7 then 'Perfect Match'
+            when compatibility_score >= 5 then 'Strong Match'
+            when compatibility_score >= 3 then 'Moderate Match'
+            when compatibility_score >= 2 then 'Weak Match'
+            else 'Poor Match'
+        end
+    ) stored,
+    matched_at timestamptz not null default now(),
+    primary key (listing_id, renter_profile_id)
+);
+
+create index if not exists idx_mutual_matches_renter on mutual_matches(renter_profile_id);
+
+
+create or replace function compatibility_score(l listings, rp renter_profiles)
+returns int as $$
+    select
       case when rp.budget >= l.asking_price then 1 else 0 end +
       case when rp.num_bedrooms = l.num_bedrooms then 1 else 0 end +
       case when rp.num_bathrooms = l.num_bathrooms then 1 else 0 end +
       case when rp.building_type_id = l.building_type_id then 1 else 0 end +
-      case when rp.gender = l.target_gender then 1 else 0 end +      
+      case when rp.gender = l.target_gender then 1 else 0 end +
       case when rp.has_pet = l.pet_friendly then 1 else 0 end +
-      case when l.utilities_incl = true then 1 else 0 end
-    ) as compatibility_score
-  from listing_on_renter r
-  join renter_on_listing rl
-    on r.renter_profile_id = rl.renter_profile_id
-   and r.listing_id = rl.listing_id
-  join listings l on r.listing_id = l.id
-  join renter_profiles rp on r.renter_profile_id = rp.id
-  where r.is_right = true
-    and rl.is_right = true
-    and l.is_active = true
-    and rp.is_active = true
-)
-
-select
-  listing_id,
-  renter_profile_id,
-  compatibility_score,
-  round(compatibility_score * 100.0 / 7, 0) as compatibility_percent,
-  case
-    when compatibility_score = 7 then 'Perfect Match'
-    when compatibility_score >= 5 then 'Strong Match'
-    when compatibility_score >= 3 then 'Moderate Match'
-    when compatibility_score >= 2 then 'Weak Match'
-    else 'Poor Match'
-  end as compatibility_label
-from scored_matches;
+      case when l.utilities_incl = true then 1 else 0 end;
+$$ language sql immutable;
+
+
+-- Insert the pair if both sides swiped right and both are active, otherwise
+-- make sure it is not there.
+create or replace function refresh_mutual_match(p_listing_id bigint, p_renter_profile_id bigint)
+returns void as $$
+begin
+    perform 1
+    from listing_on_renter lor
+    join renter_on_listing rol
+      on rol.renter_profile_id = lor.renter_profile_id
+     and rol.listing_id = lor.listing_id
+    where lor.listing_id = p_listing_id
+      and lor.renter_profile_id = p_renter_profile_id
+      and lor.is_right = true
+      and rol.is_right = true;
+
+    if found then
+        insert into mutual_matches (listing_id, renter_profile_id, compatibility_score)
+        select l.id, rp.id, compatibility_score(l, rp)
+        from listings l, renter_profiles rp
+        where l.id = p_listing_id
+          and rp.id = p_renter_profile_id
+          and l.is_active = true
+          and rp.is_active = true
+        on conflict (listing_id, renter_profile_id) do nothing;
+    else
+        delete from mutual_matches
+        where listing_id = p_listing_id and renter_profile_id = p_renter_profile_id;
+    end if;
+end;
+$$ language plpgsql;
+
+
+-- Both swipes of a pair can commit at the same time, and under read committed
+-- neither trigger would see the other's row, losing the match. The pair's
+-- advisory lock is held until commit, so the second trigger waits for the
+-- first transaction and its check then sees the committed swipe.
+create or replace function sync_mutual_match_on_swipe()
+returns trigger as $$
+begin
+    perform pg_advisory_xact_lock(hashtextextended(
+        'mutual_match:' || new.listing_id || ':' || new.renter_profile_id, 0));
+
+    if not new.is_right then
+        delete from mutual_matches
+        where listing_id = new.listing_id and renter_profile_id = new.renter_profile_id;
+    elsif tg_op = 'INSERT' or not old.is_right then
+        perform refresh_mutual_match(new.listing_id, new.renter_profile_id);
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+-- Deleted swipes (mostly the deactivation cascade's, thousands at a time)
+-- drop their pairs' matches in one statement.
+create or replace function delete_mutual_matches_of_swipes()
+returns trigger as $$
+begin
+    delete from mutual_matches m
+    using old_rows o
+    where m.listing_id = o.listing_id and m.renter_profile_id = o.renter_profile_id;
+    return null;
+end;
+$$ language plpgsql;
+
+drop trigger if exists renter_on_listing_mutual_match on renter_on_listing;
+create trigger renter_on_listing_mutual_match
+after insert or update of is_right on renter_on_listing
+for each row
+execute function sync_mutual_match_on_swipe();
+
+drop trigger if exists listing_on_renter_mutual_match on listing_on_renter;
+create trigger listing_on_renter_mutual_match
+after insert or update of is_right on listing_on_renter
+for each row
+execute function sync_mutual_match_on_swipe();
+
+drop trigger if exists renter_on_listing_mutual_match_delete on renter_on_listing;
+create trigger renter_on_listing_mutual_match_delete
+after delete on renter_on_listing
+referencing old table as old_rows
+for each statement
+execute function delete_mutual_matches_of_swipes();
+
+drop trigger if exists listing_on_renter_mutual_match_delete on listing_on_renter;
+create trigger listing_on_renter_mutual_match_delete
+after delete on listing_on_renter
+referencing old table as old_rows
+for each statement
+execute function delete_mutual_matches_of_swipes();
+
+
+-- backfill from existing swipes
+insert into mutual_matches (listing_id, renter_profile_id, compatibility_score)
+select l.id, rp.id, compatibility_score(l, rp)
+from listing_on_renter r
+join renter_on_listing rl
+  on r.renter_profile_id = rl.renter_profile_id
+ and r.listing_id = rl.listing_id
+join listings l on r.listing_id = l.id
+join renter_profiles rp on r.renter_profile_id = rp.id
+where r.is_right = true
+  and rl.is_right = true
+  and l.is_active = true
+  and rp.is_active = true
+on conflict (listing_id, renter_profile_id) do nothing;
@@ -1,30 +1,75 @@
+-- Deactivating listings or renter profiles (by hand, or in batches by the
+-- expiry sweeper in utils/expiry.py) clears their matches and swipes. The
+-- triggers are per statement and read the transition tables, so a batch of
+-- deactivations costs one delete per table instead of three per row. The
+-- sweeper sets subletswipe.defer_swipe_cleanup for its own transaction; the
+-- rows are then queued in swipe_cleanup_jobs, committed with the deactivation,
+-- and the sweeper deletes their swipes afterwards, in capped chunks.
 create or replace function delete_swipes_on_listing()
 returns trigger as $$
+declare
+    deactivated bigint[];
 begin
-    delete from renter_on_listing where listing_id = old.id;
-    delete from listing_on_renter where listing_id = old.id;
-    return new;
+    select array_agg(o.id) into deactivated
+    from old_rows o
+    join new_rows n on n.id = o.id
+    where o.is_active and not n.is_active;
+
+    if deactivated is null then
+        return null;
+    end if;
+
+    delete from mutual_matches where listing_id = any(deactivated);
+    if coalesce(current_setting('subletswipe.defer_swipe_cleanup', true), '') = 'on' then
+        insert into swipe_cleanup_jobs (target_kind, target_id)
+        select 'listing', unnest(deactivated)
+        on conflict do nothing;
+    else
+        delete from renter_on_listing where listing_id = any(deactivated);
+        delete from listing_on_renter where listing_id = any(deactivated);
+    end if;
+    return null;
 end;
 $$ language plpgsql;
 
+drop trigger if exists listing_deactivation_cascade on listings;
 create trigger listing_deactivation_cascade
 after update on listings
-for each row
-when (old.is_active = true and new.is_active = false)
+referencing old table as old_rows new table as new_rows
+for each statement
 execute function delete_swipes_on_listing();
 
 
 create or replace function delete_swipes_on_renter()
 returns trigger as $$
+declare
+    deactivated bigint[];
 begin
-    delete from renter_on_listing where renter_profile_id = old.id;
-    delete from listing_on_renter where renter_profile_id = old.id;
-    return new;
+    select array_agg(o.id) into deactivated
+    from old_rows o
+    join new_rows n on n.id = o.id
+    where o.is_active and not n.is_active;
+
+    if deactivated is null then
+        return null;
+    end if;
+
+    delete from mutual_matches where renter_profile_id = any(deactivated);
+    if coalesce(current_setting('subletswipe.defer_swipe_cleanup', true), '') = 'on' then
+        insert into swipe_cleanup_jobs (target_kind, target_id)
+        select 'renter', unnest(deactivated)
+        on conflict do nothing;
+    else
+        delete from renter_on_listing where renter_profile_id = any(deactivated);
+        delete from listing_on_renter where renter_profile_id = any(deactivated);
+    end if;
+    return null;
 end;
 $$ language plpgsql;
 
+drop trigger if exists renter_deactivation_cascade on renter_profiles;
 create trigger renter_deactivation_cascade
 after update on renter_profiles
-for each row
-when (old.is_active = true and new.is_active = false)
+referencing old table as old_rows new table as new_rows
+for each statement
 execute function delete_swipes_on_renter();
@@ -8,5 +8,12 @@ drop table if exists
     renter_profiles,
     renter_on_listing,
     listing_on_renter,
-    listing_amenities
+    listing_amenities,
+    mutual_matches,
+    listing_colikes,
+    listing_colike_jobs,
+    swipe_decks,
+    swipe_deck_cards,
+    geocode_cache,
+    geocode_jobs
 cascade;
@@ -0,0 +1,346 @@
+"""
+Bulk loader for the seed spreadsheets (replaces insert_data.ipynb).
+
+Streams rows from an .xlsx workbook (one sheet per table, e.g. data/prod.xlsx)
+or a directory of <table>.csv files, and loads every table with COPY
+(asyncpg copy_records_to_table) in foreign key order, inside one transaction.
+Secondary indexes and user triggers on the loaded tables are dropped/disabled
+for the load; afterwards the indexes are rebuilt, the trigger-maintained
+tables (mutual_matches, listing_colikes) are backfilled and the id sequences
+are moved past the loaded rows.
+
+Rows carry no ids: as with the notebook, the n-th row of a sheet gets id n,
+which is what the foreign key columns of the other sheets refer to. Values
+are converted to the column types of the target database. Dates and ages
+that violate the table checks are fixed the way the notebook fixed them,
+unless --no-fix is given.
+
+Usage (from STBackend/database_setup/):
+    python load_data.py data/prod.xlsx --reset
+    python load_data.py path/to/csv_dir --dsn postgresql://localhost/sublet
+"""
+
+import argparse
+import asyncio
+import calendar
+import csv
+import os
+import re
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import asyncpg
+from dotenv import load_dotenv
+
+SQL_DIR = Path(__file__).resolve().parent / "SQLQueries"
+
+# load order: every table comes after the tables it references
+TABLES = [
+    "users",
+    "locations",
+    "building_types",
+    "amenities",
+    "listings",
+    "photos",
+    "renter_profiles",
+    "renter_on_listing",
+    "listing_on_renter",
+    "listing_amenities",
+]
+# tables whose rows get positional ids (the others are keyed by their references)
+ID_TABLES = {"users", "locations", "building_types", "amenities", "listings", "renter_profiles"}
+# trigger-maintained tables, rebuilt from the swipes by these scripts' backfills
+DERIVED_TABLES = ["mutual_matches", "listing_colikes"]
+DERIVED_SQL_FILES = ["create_view.sql", "create_similarity.sql"]
+# work queued by triggers; the backfills cover it, or its rows are gone
+QUEUE_TABLES = ["listing_colike_jobs", "swipe_cleanup_jobs"]
+
+ONE_MONTH = timedelta(days=31)
+
+
+class LoadError(Exception):
+    pass
+
+
+def _rows_from_workbook(path: Path):
+    try:
+        import openpyxl
+    except ImportError:
+        raise SystemExit("Reading .xlsx files needs openpyxl (pip install openpyxl)")
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    sheets = {sheet.title.lower(): sheet for sheet in workbook.worksheets}
+
+    def read(table):
+        sheet = sheets.get(table)
+        if sheet is None:
+            return None, None
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, ())
+        # drop the unnamed (empty header) columns pandas used to skip
+        keep = [i for i, name in enumerate(header) if name is not None and str(name).strip()]
+        columns = [str(header[i]).strip() for i in keep]
+        return columns, (
+            [row[i] if i < len(row) else None for i in keep]
+            for row in rows
+            if any(value is not None for value in row)
+        )
+
+    return read
+
+
+def _rows_from_csv_dir(path: Path):
+    def read(table):
+        file = path / f"{table}.csv"
+        if not file.exists():
+            return None, None
+
+        def rows():
+            with open(file, newline="", encoding="utf-8-sig") as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                for row in reader:
+                    if any(row):
+                        yield [value if value != "" else None for value in row]
+
+        with open(file, newline="", encoding="utf-8-sig") as f:
+            columns = [name.strip() for name in next(csv.reader(f), [])]
+        return columns, rows()
+
+    return read
+
+
+def _to_bool(value):
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in ("true", "t", "yes", "y", "1"):
+            return True
+        if lowered in ("false", "f", "no", "n", "0"):
+            return False
+        raise ValueError(f"not a boolean: {value!r}")
+    return bool(value)
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value).strip()[:10])
+
+
+def _to_int(value):
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"not an integer: {value!r}")
+    return int(value) if not isinstance(value, str) else int(value.strip())
+
+
+_CONVERTERS = {
+    "bigint": _to_int,
+    "integer": _to_int,
+    "smallint": _to_int,
+    "numeric": lambda value: Decimal(str(value).strip()),
+    "double precision": float,
+    "real": float,
+    "boolean": _to_bool,
+    "date": _to_date,
+}
+
+
+def _enum_key(value) -> str:
+    return re.sub(r"[^a-z0-9]", "", str(value).lower())
+
+
+def _enum_converter(labels: list[str]):
+    """Match spreadsheet spellings ("Non-binary") to the enum's labels ("nonbinary")."""
+    by_key = {_enum_key(label): label for label in labels}
+
+    def convert(value):
+        label = by_key.get(_enum_key(value))
+        if label is None:
+            raise ValueError(f"{value!r} is not one of {', '.join(labels)}")
+        return label
+
+    return convert
+
+
+def _converter(column_type):
+    data_type, enum_labels = column_type
+    if enum_labels is not None:
+        return _enum_converter(enum_labels)
+    # text and varchar go in as strings
+    return _CONVERTERS.get(data_type, lambda value: str(value))
+
+
+def _add_months(day: date, months: int) -> date:
+    """day + interval 'n months' as Postgres computes it (clamped to the month's end)."""
+    year, month = divmod(day.month - 1 + months, 12)
+    year, month = day.year + year, month + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def _fix_dates(record: dict, today: date, fixes: list):
+    """The notebook's fixes for chk_start_date_future and chk_term_length."""
+    start, end = record["start_date"], record["end_date"]
+    if start is None or end is None:
+        return
+    if start <= today:
+        record["start_date"] = today + timedelta(days=5)
+        record["end_date"] = record["start_date"] + 2 * ONE_MONTH
+        fixes.append("start_date")
+    elif not _add_months(start, 1) <= end <= _add_months(start, 12):
+        record["end_date"] = start + 2 * ONE_MONTH
+        fixes.append("end_date")
+
+
+def _fix_age(record: dict, fixes: list):
+    if record.get("age") is not None and record["age"] < 18:
+        record["age"] = 20
+        fixes.append("age")
+
+
+async def _column_types(connection, table: str) -> dict:
+    """column -> (data type, enum labels or None)"""
+    rows = await connection.fetch(
+        """
+        SELECT c.column_name, c.data_type,
+               (SELECT array_agg(e.enumlabel ORDER BY e.enumsortorder)
+                FROM pg_type t JOIN pg_enum e ON e.enumtypid = t.oid
+                WHERE t.typname = c.udt_name) AS enum_labels
+        FROM information_schema.columns c
+        WHERE c.table_schema = current_schema() AND c.table_name = $1
+        """,
+        table,
+    )
+    return {row["column_name"]: (row["data_type"], row["enum_labels"]) for row in rows}
+
+
+def _records(table, columns, rows, types, fix, today, stats):
+    """Typed COPY records for one table; ids are the 1-based row position."""
+    converters = [_converter(types[name]) for name in columns]
+    for index, row in enumerate(rows, start=1):
+        record = {}
+        for name, convert, value in zip(columns, converters, row):
+            try:
+                record[name] = None if value is None else convert(value)
+            except (TypeError, ValueError, ArithmeticError) as e:
+                raise LoadError(f"{table} row {index}, column {name}: {e}") from None
+        if fix:
+            fixes = []
+            if "start_date" in record and "end_date" in record:
+                _fix_dates(record, today, fixes)
+            if table == "renter_profiles":
+                _fix_age(record, fixes)
+            for name in fixes:
+                stats[name] = stats.get(name, 0) + 1
+        values = tuple(record[name] for name in columns)
+        yield (index,) + values if table in ID_TABLES else values
+
+
+async def _secondary_indexes(connection, tables: list[str]):
+    """(name, definition) of indexes on `tables` that don't back a constraint."""
+    return await connection.fetch(
+        """
+        SELECT i.indexrelid::regclass::text AS name, pg_get_indexdef(i.indexrelid) AS definition
+        FROM pg_index i
+        WHERE i.indrelid = ANY($1::regclass[])
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+        """,
+        tables,
+    )
+
+
+async def load(connection, read, reset: bool, fix: bool, log=print):
+    today = date.today()
+    if reset:
+        await connection.execute(
+            f"TRUNCATE {', '.join(TABLES + DERIVED_TABLES + QUEUE_TABLES)} RESTART IDENTITY CASCADE"
+        )
+    else:
+        for table in TABLES:
+            if await connection.fetchval(f"SELECT EXISTS (SELECT 1 FROM {table})"):
+                raise LoadError(f"{table} is not empty; pass --reset to replace its contents")
+
+    indexes = await _secondary_indexes(connection, TABLES)
+    for index in indexes:
+        await connection.execute(f"DROP INDEX {index['name']}")
+    for table in TABLES:
+        await connection.execute(f"ALTER TABLE {table} DISABLE TRIGGER USER")
+
+    for table in TABLES:
+        columns, rows = read(table)
+        if columns is None:
+            log(f"[INFO] no data for {table}, skipped")
+            continue
+        types = await _column_types(connection, table)
+        unknown = [name for name in columns if name not in types]
+        if unknown:
+            raise LoadError(f"{table} has no column(s) {', '.join(unknown)}")
+
+        start = time.perf_counter()
+        stats = {}
+        result = await connection.copy_records_to_table(
+            table,
+            records=_records(table, columns, rows, types, fix, today, stats),
+            columns=(["id"] if table in ID_TABLES else []) + columns,
+        )
+        fixed = ", ".join(f"{count} {name}" for name, count in stats.items())
+        log(f"[INFO] {table}: {result} in {time.perf_counter() - start:.2f}s"
+            + (f" (fixed {fixed})" if fixed else ""))
+        if table in ID_TABLES:
+            await connection.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {table}), false)"
+            )
+
+    start = time.perf_counter()
+    for index in indexes:
+        # indexes of partitioned tables (the swipes) come back as ON ONLY <parent>,
+        # which would leave out the partitions
+        await connection.execute(index["definition"].replace(" ON ONLY ", " ON ", 1))
+    log(f"[INFO] rebuilt {len(indexes)} indexes in {time.perf_counter() - start:.2f}s")
+
+    for table in TABLES:
+        await connection.execute(f"ALTER TABLE {table} ENABLE TRIGGER USER")
+    start = time.perf_counter()
+    for name in DERIVED_SQL_FILES:
+        await connection.execute((SQL_DIR / name).read_text())
+    log(f"[INFO] backfilled {', '.join(DERIVED_TABLES)} in {time.perf_counter() - start:.2f}s")
+
+
+async def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("source", type=Path, help=".xlsx workbook or directory of <table>.csv files")
+    parser.add_argument("--dsn", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--reset", action="store_true", help="truncate the tables before loading")
+    parser.add_argument("--no-fix", action="store_true", help="don't fix rows that violate the date/age checks")
+    args = parser.parse_args()
+
+    if not args.dsn:
+        raise SystemExit("Set DATABASE_URL or pass --dsn")
+    if args.source.is_dir():
+        read = _rows_from_csv_dir(args.source)
+    elif args.source.suffix.lower() in (".xlsx", ".xlsm"):
+        read = _rows_from_workbook(args.source)
+    else:
+        raise SystemExit(f"Expected an .xlsx file or a directory of CSV files, got {args.source}")
+
+    connection = await asyncpg.connect(args.dsn)
+    try:
+        start = time.perf_counter()
+        try:
+            async with connection.transaction():
+                await load(connection, read, args.reset, not args.no_fix)
+        except LoadError as e:
+            raise SystemExit(f"[ERROR] {e}; nothing was loaded")
+        await connection.execute("ANALYZE")
+        print(f"[INFO] loaded {args.source} in {time.perf_counter() - start:.2f}s")
+    finally:
+        await connection.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
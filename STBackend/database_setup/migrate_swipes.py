@@ -0,0 +1,201 @@
+"""
+Convert renter_on_listing and listing_on_renter to the partitioned layout.
+
+The old tables had a bigserial id primary key, a unique (swiper, target)
+constraint and indexes on swiper, target and is_right. The new ones are keyed
+by (swiper, target), hash-partitioned by the swiper, and keep one index on
+the target plus (for renter_on_listing) a partial index over right swipes;
+see create_tables.sql. The ids are copied (no longer a key, but still
+returned by the swipe endpoints) and swiped_at is filled from their order so
+listing_colikes keeps treating the same likes as the most recent.
+
+Everything runs in one transaction holding an exclusive lock on the swipe
+tables, so stop the app (or accept that swipes wait) while it runs. The old
+tables are renamed to <table>_unpartitioned and dropped at the end unless
+--keep-old is given. Tables that are already partitioned are skipped.
+
+Run it before re-running create_tables.sql on an old database: the new
+create_tables.sql indexes swiped_at and attaches partitions, and both fail
+on the unpartitioned tables.
+
+Usage (from STBackend/database_setup/):
+    python migrate_swipes.py --dsn postgresql://localhost/sublet
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from pathlib import Path
+
+import asyncpg
+from dotenv import load_dotenv
+
+SQL_DIR = Path(__file__).resolve().parent / "SQLQueries"
+
+# The swipe triggers live in these scripts; re-running them puts the triggers
+# on the new tables. Each also creates and backfills the table it maintains.
+# The backfill is skipped only when that table already existed as a table:
+# then it holds what the copied swipes would produce, and rebuilding
+# listing_colikes is the slow part of a large migration. On older databases
+# (mutual_matches still a view, no listing_colikes) it has to run, or every
+# existing match and co-like is lost.
+TRIGGER_SQL_FILES = {"create_view.sql": "mutual_matches", "create_similarity.sql": "listing_colikes"}
+BACKFILL_MARKER = "-- backfill"
+
+PARTITIONS = 16
+
+# table -> (swiper column, swiper table, target column, target table)
+SWIPE_TABLES = {
+    "renter_on_listing": ("renter_profile_id", "renter_profiles", "listing_id", "listings"),
+    "listing_on_renter": ("listing_id", "listings", "renter_profile_id", "renter_profiles"),
+}
+
+
+def _create_statements(table: str, partitions: int) -> list[str]:
+    swiper, swiper_table, target, target_table = SWIPE_TABLES[table]
+    statements = [
+        f"""
+        CREATE TABLE {table} (
+            id bigserial NOT NULL,
+            {swiper} bigint NOT NULL REFERENCES {swiper_table}(id) ON DELETE CASCADE,
+            {target} bigint NOT NULL REFERENCES {target_table}(id) ON DELETE CASCADE,
+            is_right boolean NOT NULL,
+            swiped_at timestamptz NOT NULL DEFAULT now()
+        ) PARTITION BY HASH ({swiper})
+        """
+    ]
+    statements += [
+        f"CREATE TABLE {table}_p{i} PARTITION OF {table} "
+        f"FOR VALUES WITH (modulus {partitions}, remainder {i})"
+        for i in range(partitions)
+    ]
+    return statements
+
+
+def _index_statements(table: str) -> list[str]:
+    """Built after the copy, which is much faster than maintaining them row by row."""
+    swiper, _, target, _ = SWIPE_TABLES[table]
+    statements = [
+        f"ALTER TABLE {table} ADD PRIMARY KEY ({swiper}, {target})",
+        f"CREATE INDEX idx_{table}_{target.split('_')[0]} ON {table}({target})",
+    ]
+    if table == "renter_on_listing":
+        statements.append(
+            f"CREATE INDEX idx_{table}_likes ON {table}({swiper}, swiped_at DESC) "
+            f"INCLUDE ({target}) WHERE is_right"
+        )
+    return statements
+
+
+async def _is_partitioned(connection, table: str):
+    """True/False, or None when the table doesn't exist."""
+    return await connection.fetchval(
+        """
+        SELECT c.relkind = 'p' FROM pg_class c
+        WHERE c.oid = to_regclass(current_schema() || '.' || $1)
+        """,
+        table,
+    )
+
+
+async def _is_table(connection, name: str) -> bool:
+    return bool(
+        await connection.fetchval(
+            """
+            SELECT c.relkind = 'r' FROM pg_class c
+            WHERE c.oid = to_regclass(current_schema() || '.' || $1)
+            """,
+            name,
+        )
+    )
+
+
+async def migrate_table(connection, table: str, partitions: int, log=print):
+    old = f"{table}_unpartitioned"
+    await connection.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+    await connection.execute(f"ALTER TABLE {table} RENAME TO {old}")
+    # free the index (and primary key) names for the new table
+    for name in await connection.fetch(
+        "SELECT indexrelid::regclass::text AS name FROM pg_index WHERE indrelid = $1::regclass", old
+    ):
+        await connection.execute(f"ALTER INDEX {name['name']} RENAME TO {name['name']}_unpartitioned")
+
+    for statement in _create_statements(table, partitions):
+        await connection.execute(statement)
+
+    swiper, _, target, _ = SWIPE_TABLES[table]
+    start = time.perf_counter()
+    # one microsecond per id keeps the old insertion order in swiped_at
+    result = await connection.execute(
+        f"""
+        INSERT INTO {table} (id, {swiper}, {target}, is_right, swiped_at)
+        SELECT id, {swiper}, {target}, is_right,
+               now() - (MAX(id) OVER () - id) * interval '1 microsecond'
+        FROM {old}
+        """
+    )
+    await connection.execute(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+        f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {table}), false)"
+    )
+    log(f"[INFO] {table}: copied {result.split()[-1]} rows in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    for statement in _index_statements(table):
+        await connection.execute(statement)
+    log(f"[INFO] {table}: built keys and indexes in {time.perf_counter() - start:.1f}s")
+
+
+async def migrate(connection, partitions: int, keep_old: bool, log=print):
+    migrated = []
+    for table in SWIPE_TABLES:
+        partitioned = await _is_partitioned(connection, table)
+        if partitioned is None:
+            raise SystemExit(f"[ERROR] {table} does not exist; create the schema with create_tables.sql")
+        if partitioned:
+            log(f"[INFO] {table} is already partitioned, skipped")
+            continue
+        await migrate_table(connection, table, partitions, log)
+        migrated.append(table)
+
+    if not migrated:
+        return migrated
+    for name, derived in TRIGGER_SQL_FILES.items():
+        script = (SQL_DIR / name).read_text()
+        if await _is_table(connection, derived):
+            script = script.split(BACKFILL_MARKER, 1)[0]
+        else:
+            log(f"[INFO] {derived} is not a table yet, building it from the swipes")
+        await connection.execute(script)
+    if not keep_old:
+        for table in migrated:
+            await connection.execute(f"DROP TABLE {table}_unpartitioned")
+    return migrated
+
+
+async def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dsn", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--partitions", type=int, default=PARTITIONS)
+    parser.add_argument("--keep-old", action="store_true", help="keep <table>_unpartitioned instead of dropping it")
+    args = parser.parse_args()
+
+    if not args.dsn:
+        raise SystemExit("Set DATABASE_URL or pass --dsn")
+
+    connection = await asyncpg.connect(args.dsn)
+    try:
+        start = time.perf_counter()
+        async with connection.transaction():
+            migrated = await migrate(connection, args.partitions, args.keep_old)
+        for table in migrated:
+            await connection.execute(f"ANALYZE {table}")
+        print(f"[INFO] migrated {', '.join(migrated) or 'nothing'} in {time.perf_counter() - start:.1f}s")
+    finally:
+        await connection.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
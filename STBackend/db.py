@@ -1,7 +1,9 @@
 import asyncpg
 import os
 import asyncio
+import time
 from dotenv import load_dotenv
+from utils.metrics import time_query
 
 load_dotenv()
 
@@ -9,17 +11,183 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable not set")
 
+# Pool sizing is per worker process: total connections = workers * max size
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "10"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10"))
+DB_POOL_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", "300"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+# seconds a cached statement is kept; 0 keeps the prepared hot statements for good
+DB_STATEMENT_CACHE_LIFETIME = float(os.getenv("DB_STATEMENT_CACHE_LIFETIME", "0"))
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT")) if os.getenv("DB_COMMAND_TIMEOUT") else None
+
+# Statements every connection prepares as soon as it is opened; filled in by
+# register_hot_statement() when the modules that own them are imported.
+HOT_STATEMENTS = {}
+
 _pool = None
 _lock = asyncio.Lock()
+_warmed = {}  # server pid -> names of hot statements prepared on that connection
+_stats = {
+    "acquires": 0,
+    "acquire_timeouts": 0,
+    "acquire_wait_ms_total": 0.0,
+    "acquire_wait_ms_max": 0.0,
+    "connections_opened": 0,
+    "hot_statements_prepared": 0,
+    "hot_calls_already_prepared": 0,
+    "hot_calls_first_on_connection": 0,
+}
+
+
+def register_hot_statement(name: str, sql: str) -> str:
+    """Register a statement to prepare on every connection; run it with hot_fetch*(), which also times it."""
+    HOT_STATEMENTS[name] = sql
+    return name
+
+
+async def _init_connection(connection):
+    """
+    Pool init hook: prepare every hot statement into the connection's asyncpg
+    statement cache, which hot_fetch*() is served from, so the first request
+    on a fresh connection skips the Parse round trip. executemany() with no
+    argument sets prepares the statement (one Parse and Describe) without
+    running it. A statement that fails to prepare (e.g. schema not migrated
+    yet) is prepared on first use instead.
+    """
+    _stats["connections_opened"] += 1
+    pid = connection.get_server_pid()
+    warmed = _warmed[pid] = set()
+    connection.add_termination_listener(lambda _: _warmed.pop(pid, None))
+    for name, sql in HOT_STATEMENTS.items():
+        try:
+            await connection.executemany(sql, [])
+        except Exception as e:
+            print(f"[ERROR] Failed to prepare hot statement {name}: {e}")
+            continue
+        warmed.add(name)
+    _stats["hot_statements_prepared"] += len(warmed)
+
+
+def _count_statement_use(connection, name: str):
+    """
+    Whether the statement was prepared on this connection before, by the init
+    hook or an earlier call. asyncpg doesn't expose its cache, so this is what
+    was put there, not a lookup: with DB_STATEMENT_CACHE_SIZE at least the
+    number of hot statements and no DB_STATEMENT_CACHE_LIFETIME, nothing is
+    evicted and the two agree.
+    """
+    warmed = _warmed.setdefault(connection.get_server_pid(), set())
+    if name in warmed:
+        _stats["hot_calls_already_prepared"] += 1
+    else:
+        _stats["hot_calls_first_on_connection"] += 1
+        warmed.add(name)
+
+
+async def hot_fetch(connection, name: str, *args):
+    _count_statement_use(connection, name)
+    with time_query(name):
+        return await connection.fetch(HOT_STATEMENTS[name], *args)
+
+
+async def hot_fetchrow(connection, name: str, *args):
+    _count_statement_use(connection, name)
+    with time_query(name):
+        return await connection.fetchrow(HOT_STATEMENTS[name], *args)
+
+
+async def hot_fetchval(connection, name: str, *args):
+    _count_statement_use(connection, name)
+    with time_query(name):
+        return await connection.fetchval(HOT_STATEMENTS[name], *args)
+
+
+async def hot_execute(connection, name: str, *args):
+    _count_statement_use(connection, name)
+    with time_query(name):
+        return await connection.execute(HOT_STATEMENTS[name], *args)
+
+
+class _TimedAcquire:
+    def __init__(self, pool, timeout):
+        self._pool = pool
+        self._timeout = timeout
+        self._connection = None
+
+    async def _acquire(self):
+        start = time.perf_counter()
+        try:
+            connection = await self._pool.acquire(timeout=self._timeout)
+        except asyncio.TimeoutError:
+            _stats["acquire_timeouts"] += 1
+            raise
+        waited = (time.perf_counter() - start) * 1000
+        _stats["acquires"] += 1
+        _stats["acquire_wait_ms_total"] += waited
+        _stats["acquire_wait_ms_max"] = max(_stats["acquire_wait_ms_max"], waited)
+        return connection
+
+    async def __aenter__(self):
+        self._connection = await self._acquire()
+        return self._connection
+
+    async def __aexit__(self, *exc):
+        connection, self._connection = self._connection, None
+        await self._pool.release(connection)
+
+    def __await__(self):
+        return self._acquire().__await__()
+
+
+class InstrumentedPool:
+    """asyncpg pool whose acquire() applies the configured timeout and records wait times."""
+
+    def __init__(self, pool):
+        self._pool = pool
+
+    def acquire(self, *, timeout=None):
+        return _TimedAcquire(self._pool, DB_POOL_ACQUIRE_TIMEOUT if timeout is None else timeout)
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
 
 async def get_pool():
     global _pool
     if _pool is None:
         async with _lock:
             if _pool is None:
-                _pool = await asyncpg.create_pool(dsn=DATABASE_URL)
+                _pool = InstrumentedPool(await asyncpg.create_pool(
+                    dsn=DATABASE_URL,
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    max_inactive_connection_lifetime=DB_POOL_MAX_INACTIVE_LIFETIME,
+                    statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+                    max_cached_statement_lifetime=DB_STATEMENT_CACHE_LIFETIME,
+                    command_timeout=DB_COMMAND_TIMEOUT,
+                    init=_init_connection,
+                ))
     return _pool
 
+
+def pool_stats() -> dict:
+    stats = dict(_stats)
+    stats["acquire_wait_ms_avg"] = (
+        stats["acquire_wait_ms_total"] / stats["acquires"] if stats["acquires"] else 0.0
+    )
+    if _pool is not None:
+        size = _pool.get_size()
+        stats.update(
+            size=size,
+            idle=_pool.get_idle_size(),
+            in_use=size - _pool.get_idle_size(),
+            min_size=_pool.get_min_size(),
+            max_size=_pool.get_max_size(),
+        )
+    return stats
+
+
 async def init_db():
     await get_pool()
 
@@ -28,3 +196,4 @@ async def close_db():
     if _pool:
         await _pool.close()
         _pool = None
+        _warmed.clear()
@@ -35,6 +35,7 @@ class ListingCreate(BaseModel):
 class ListingUpdate(BaseModel):
     start_date: Optional[date] = None
     end_date: Optional[date] = None
+    raw_address: Optional[str] = None
     target_gender: Optional[GenderEnum] = None
     asking_price: Optional[float] = None
     num_bedrooms: Optional[int] = None
@@ -98,3 +99,6 @@ class UserResponse(BaseModel):
 class SwipeCreate(BaseModel):
     target_id: int
     is_right: bool
+
+class SwipeBatchCreate(BaseModel):
+    swipes: List[SwipeCreate] = Field(..., min_length=1, max_length=500)
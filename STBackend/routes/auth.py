@@ -1,14 +1,14 @@
-import bcrypt
 from fastapi import APIRouter, HTTPException, status
 from models import UserCreate, UserLogin, UserResponse
 from db import get_pool
+from utils.passwords import hash_password, verify_password
 
 router = APIRouter()
 
 @router.post("/signup", status_code=status.HTTP_201_CREATED)
 async def signup(user: UserCreate):
 
-    hashed_password = bcrypt.hashpw(user.password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    hashed_password = await hash_password(user.password)
 
     query = """
         INSERT INTO users (email, first_name, last_name, password, profile_photo)
@@ -35,18 +35,18 @@ async def login(user: UserLogin):
     async with pool.acquire() as connection:
         row = await connection.fetchrow(query, user.email)
 
-        # email doesn't exist
-        if not row:
-            raise HTTPException(status_code=401, detail="Invalid email or password")
-
-        # password doesn't match
-        if not bcrypt.checkpw(user.password.encode("utf-8"), row["password"].encode("utf-8")):
-            raise HTTPException(status_code=401, detail="Invalid email or password")
-    
-        return {
-            "id": row["id"],
-            "email": row["email"],
-            "first_name": row["first_name"],
-            "last_name": row["last_name"],
-            "profile_photo": row["profile_photo"]
-        }
+    # email doesn't exist
+    if not row:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+
+    # password doesn't match (checked after the connection is back in the pool)
+    if not await verify_password(user.password, row["password"]):
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+
+    return {
+        "id": row["id"],
+        "email": row["email"],
+        "first_name": row["first_name"],
+        "last_name": row["last_name"],
+        "profile_photo": row["profile_photo"]
+    }
@@ -0,0 +1,68 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from db import get_pool
+from utils.export import stream_listing_matches, stream_region_matches, stream_renter_matches
+from utils.matching import MATCH_MAX_RADIUS_KM, MATCH_RADIUS_KM
+
+router = APIRouter()
+
+NDJSON = "application/x-ndjson"
+
+
+async def _exists(query: str, key: int) -> bool:
+    pool = await get_pool()
+    async with pool.acquire() as connection:
+        return await connection.fetchval(query, key) is not None
+
+
+def _stream(produce, *args) -> StreamingResponse:
+    """
+    Run `produce(connection, *args)` inside a read-only snapshot and stream what
+    it yields. If the client goes away Starlette cancels the generator, which
+    closes the cursor, rolls back and returns the connection to the pool.
+    """
+
+    async def body():
+        pool = await get_pool()
+        async with pool.acquire() as connection:
+            async with connection.transaction(isolation="repeatable_read", readonly=True):
+                async for chunk in produce(connection, *args):
+                    yield chunk
+
+    return StreamingResponse(body(), media_type=NDJSON)
+
+
+@router.get("/export/renters/{renter_id}/listing_matches")
+async def export_listing_matches(
+    renter_id: int,
+    radius_km: float = Query(MATCH_RADIUS_KM, gt=0, le=MATCH_MAX_RADIUS_KM),
+):
+    """Every listing candidate of a renter with its score, one JSON object per line."""
+    if not await _exists("SELECT 1 FROM renter_profiles WHERE id = $1", renter_id):
+        raise HTTPException(status_code=404, detail="Renter profile not found")
+    return _stream(stream_listing_matches, renter_id, radius_km)
+
+
+@router.get("/export/listings/{listing_id}/renter_matches")
+async def export_renter_matches(
+    listing_id: int,
+    radius_km: float = Query(MATCH_RADIUS_KM, gt=0, le=MATCH_MAX_RADIUS_KM),
+):
+    """Every renter candidate of a listing with its score, one JSON object per line."""
+    if not await _exists("SELECT 1 FROM listings WHERE id = $1", listing_id):
+        raise HTTPException(status_code=404, detail="Listing not found")
+    return _stream(stream_renter_matches, listing_id, radius_km)
+
+
+@router.get("/export/renter_matches")
+async def export_region_renter_matches(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    region_km: float = Query(..., gt=0, le=MATCH_MAX_RADIUS_KM),
+    radius_km: float = Query(MATCH_RADIUS_KM, gt=0, le=MATCH_MAX_RADIUS_KM),
+):
+    """
+    Renter candidates of every active listing within region_km of (lat, lng),
+    one scored pair per line.
+    """
+    return _stream(stream_region_matches, lat, lng, region_km, radius_km)
@@ -1,14 +1,38 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, Response, status
+from typing import Optional
 from models import Photo, ListingCreate, ListingUpdate
 from asyncpg import CheckViolationError, PostgresError
-from utils.location_helper import (
-    resolve_address_from_google,
-    insert_location_if_not_exists,
+from utils.geocode_queue import (
+    LISTING_LOCATION,
+    address_columns,
+    cancel_geocode,
+    enqueue_geocode,
+    wake_geocode_workers,
 )
+from utils.matching import MATCH_MAX_RADIUS_KM, MATCH_RADIUS_KM
+from utils.deck import LISTING_DECK, RENTER_DECK, drop_target_cards, get_deck_page, invalidate_deck
+from utils.details import (
+    LISTING_COLUMNS,
+    fetch_listing_details,
+    parse_fields,
+    parse_ids,
+    project,
+)
+from utils.detail_cache import LISTING_DETAIL, get_detail, get_details, invalidate_detail
+from utils.patch import apply_patch, patch_values, sync_links
 from db import get_pool
 
 router = APIRouter()
 
+# ListingUpdate fields that map straight onto listings columns
+LISTING_PATCH_COLUMNS = {
+    field: field
+    for field in (
+        "start_date", "end_date", "target_gender", "asking_price", "num_bedrooms",
+        "num_bathrooms", "pet_friendly", "utilities_incl", "description",
+    )
+}
+
 
 async def insert_listing_amenities(connection, listing_id: int, amenities: list[int]):
     if not amenities:
@@ -47,69 +71,129 @@ async def insert_listing_photos_bulk(connection, listing_id: int, photos: list[P
     await connection.execute(insert_query, *args)
 
 
-async def insert_listing(listing: ListingCreate) -> int:
+async def apply_photo_changes(
+    connection, listing_id: int, to_add: list[Photo], to_update: list[Photo], to_delete: list[str]
+) -> bool:
+    """
+    Photo edits of a PATCH in at most three statements: delete by url, relabel
+    existing photos, then upsert the added ones (an added url that exists just
+    gets the new label). Returns whether any photo row changed.
+    """
+    changed = False
+    if to_delete:
+        result = await connection.execute(
+            "DELETE FROM photos WHERE listing_id = $1 AND url = ANY($2::text[])",
+            listing_id,
+            to_delete,
+        )
+        changed |= result != "DELETE 0"
+
+    if to_update:
+        labels = {photo.url: photo.label for photo in to_update}
+        result = await connection.execute(
+            """
+            UPDATE photos p SET label = u.label
+            FROM unnest($2::text[], $3::text[]) AS u(url, label)
+            WHERE p.listing_id = $1 AND p.url = u.url
+              AND p.label IS DISTINCT FROM u.label
+            """,
+            listing_id,
+            list(labels),
+            list(labels.values()),
+        )
+        changed |= result != "UPDATE 0"
+
+    # one row per url: ON CONFLICT can't touch the same row twice
+    labels = {photo.url: photo.label for photo in to_add if photo.url}
+    if labels:
+        result = await connection.execute(
+            """
+            INSERT INTO photos (listing_id, url, label)
+            SELECT $1, a.url, a.label FROM unnest($2::text[], $3::text[]) AS a(url, label)
+            ON CONFLICT (listing_id, url) DO UPDATE SET label = EXCLUDED.label
+            WHERE photos.label IS DISTINCT FROM EXCLUDED.label
+            """,
+            listing_id,
+            list(labels),
+            list(labels.values()),
+        )
+        changed |= result != "INSERT 0 0"
+    return changed
+
+
+async def insert_listing(connection, listing: ListingCreate, location: dict) -> int:
+    """Insert the listing with its amenities and photos; `location` comes from address_columns()."""
     query = """
         INSERT INTO listings (
-            user_id, is_active, locations_id, start_date, end_date,
+            user_id, is_active, locations_id, pending_address, start_date, end_date,
             target_gender, asking_price, building_type_id,
             num_bedrooms, num_bathrooms, pet_friendly,
             utilities_incl, description
-        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13)
+        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14)
         RETURNING id
     """
 
-    pool = await get_pool()
-    async with pool.acquire() as connection:
-        async with connection.transaction():
-            row = await connection.fetchrow(
-                query,
-                listing.user_id,
-                listing.is_active,
-                listing.locations_id,
-                listing.start_date,
-                listing.end_date,
-                listing.target_gender.value,
-                listing.asking_price,
-                listing.building_type_id,
-                listing.num_bedrooms,
-                listing.num_bathrooms,
-                listing.pet_friendly,
-                listing.utilities_incl,
-                listing.description,
-            )
-            if not row:
-                raise RuntimeError("Insert succeeded but no ID returned.")
-            listing_id = row["id"]
+    row = await connection.fetchrow(
+        query,
+        listing.user_id,
+        listing.is_active,
+        location.get("locations_id"),
+        location["pending_address"],
+        listing.start_date,
+        listing.end_date,
+        listing.target_gender.value,
+        listing.asking_price,
+        listing.building_type_id,
+        listing.num_bedrooms,
+        listing.num_bathrooms,
+        listing.pet_friendly,
+        listing.utilities_incl,
+        listing.description,
+    )
+    if not row:
+        raise RuntimeError("Insert succeeded but no ID returned.")
+    listing_id = row["id"]
 
-            # add amenities
-            await insert_listing_amenities(connection, listing_id, listing.amenities)
+    # add amenities
+    await insert_listing_amenities(connection, listing_id, listing.amenities)
 
-            # add photos
-            await insert_listing_photos_bulk(connection, listing_id, listing.photos)
+    # add photos
+    await insert_listing_photos_bulk(connection, listing_id, listing.photos)
 
-            return listing_id
+    return listing_id
 
 
 @router.post("/listings", status_code=status.HTTP_201_CREATED)
-async def create_listing(listing: ListingCreate):
+async def create_listing(listing: ListingCreate, response: Response):
+    """
+    Saves the listing straight away. If its address hasn't been geocoded
+    before, the listing is created with location_status "pending" (202) and
+    gets its location in the background; it is left out of matching until then.
+    """
     try:
         if not listing.raw_address:
             raise HTTPException(status_code=400, detail="Missing address")
 
-        place_data = await resolve_address_from_google(listing.raw_address)
-        print("[DEBUG] place_data:", place_data)
-
         pool = await get_pool()
         async with pool.acquire() as connection:
-            location_id = await insert_location_if_not_exists(connection, place_data)
-            print(f"[DEBUG] location_id inserted or found: {location_id}")
-
             async with connection.transaction():
-                listing.locations_id = location_id
-                new_id = await insert_listing(listing)
-
-        return {"message": "Listing created", "id": new_id}
-
+                location = await address_columns(connection, listing.raw_address)
+                new_id = await insert_listing(connection, listing, location)
+                pending = location["pending_address"] is not None
+                if pending:
+                    await enqueue_geocode(connection, LISTING_LOCATION, new_id, listing.raw_address)
+
+        if pending:
+            wake_geocode_workers()
+            response.status_code = status.HTTP_202_ACCEPTED
+        return {
+            "message": "Listing created",
+            "id": new_id,
+            "location_status": "pending" if pending else "resolved",
+        }
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -117,57 +201,47 @@ async def create_listing(listing: ListingCreate):
         )
 
 
+@router.get("/listings")
+async def get_listings(ids: str, fields: Optional[str] = None):
+    """
+    Many listings in one request, e.g. /listings?ids=3,1,2&fields=asking_price,address_string.
+    Results keep the order of `ids`; ids that don't exist are reported in `missing`.
+    """
+    try:
+        listing_ids = parse_ids(ids)
+        field_names = parse_fields(fields, LISTING_COLUMNS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def load(missing):
+        pool = await get_pool()
+        async with pool.acquire() as connection:
+            rows = await fetch_listing_details(connection, missing, field_names)
+        return {row["id"]: row for row in rows}
+
+    found = await get_details(
+        LISTING_DETAIL, listing_ids, load, cache_loaded=field_names is None
+    )
+    listings = [project(found[i], field_names) for i in listing_ids if i in found]
+    return {
+        "listings": listings,
+        "count": len(listings),
+        "missing": [i for i in listing_ids if i not in found],
+    }
+
+
 @router.get("/listings/{listing_id}")
 async def get_listing(listing_id: int):
-    query = """
-        SELECT 
-            l.id,
-            l.user_id,
-            u.first_name,
-            u.last_name,
-            u.email,
-            u.profile_photo,
-            l.locations_id,
-            l.is_active,
-            l.start_date,
-            l.end_date,
-            l.target_gender,
-            l.asking_price,
-            l.num_bedrooms,
-            l.num_bathrooms,
-            l.pet_friendly,
-            l.utilities_incl,
-            l.description,
-            loc.address_string,
-            loc.latitude,
-            loc.longitude,
-            bt.id AS building_type_id,
-            bt.type AS building_type,
-            COALESCE(
-                (SELECT json_agg(json_build_object('url', p.url, 'label', p.label))
-                FROM photos p
-                WHERE p.listing_id = l.id), '[]'
-            ) AS photos,
-            COALESCE(
-                (SELECT json_agg(json_build_object('id', a.id, 'name', a.name))
-                FROM listing_amenities la
-                JOIN amenities a ON la.amenity_id = a.id
-                WHERE la.listing_id = l.id
-                ), '[]'
-            ) AS amenities
-        FROM listings l
-        JOIN users u ON l.user_id = u.id
-        JOIN locations loc ON l.locations_id = loc.id
-        LEFT JOIN building_types bt ON l.building_type_id = bt.id
-        WHERE l.id = $1
-    """
+    async def load():
+        pool = await get_pool()
+        async with pool.acquire() as connection:
+            rows = await fetch_listing_details(connection, [listing_id])
+            return rows[0] if rows else None
 
-    pool = await get_pool()
-    async with pool.acquire() as connection:
-        row = await connection.fetchrow(query, listing_id)
-        if not row:
-            raise HTTPException(status_code=404, detail="Listing not found")
-        return dict(row)
+    listing = await get_detail(LISTING_DETAIL, listing_id, load)
+    if listing is None:
+        raise HTTPException(status_code=404, detail="Listing not found")
+    return listing
 
 
 @router.put("/listings/{listing_id}/deactivate/{user_id}")
@@ -186,6 +260,10 @@ async def deactivate_listing(listing_id: int, user_id: int):
             raise HTTPException(
                 status_code=404, detail="Listing not found or user not authorized"
             )
+        await invalidate_deck(connection, LISTING_DECK, listing_id)
+        # other swipers' decks must stop serving it
+        await drop_target_cards(connection, RENTER_DECK, [listing_id])
+        invalidate_detail(LISTING_DETAIL, listing_id)
         return dict(row)
 
 
@@ -205,282 +283,168 @@ async def reactivate_listing(listing_id: int, user_id: int):
             raise HTTPException(
                 status_code=404, detail="Listing not found or user not authorized"
             )
+        # its swipes went with the deactivation, so its old deck is stale, and
+        # a build that raced the deactivation may still hold it as a card
+        await invalidate_deck(connection, LISTING_DECK, listing_id)
+        await drop_target_cards(connection, RENTER_DECK, [listing_id])
+        invalidate_detail(LISTING_DETAIL, listing_id)
         return dict(row)
 
 
 @router.patch("/listings/{listing_id}")
 async def partial_update_listing(listing_id: int, listing: ListingUpdate):
+    """
+    Only the fields present in the body are written: changed columns in one
+    UPDATE, amenities diffed against the current set, and each kind of photo
+    change as one set-based statement, however many photos it touches. A new
+    raw_address that hasn't been geocoded before is resolved in the background.
+    """
+    values = patch_values(listing, LISTING_PATCH_COLUMNS)
+
     pool = await get_pool()
     async with pool.acquire() as connection:
         async with connection.transaction():
-            existing = await connection.fetchrow(
-                "SELECT * FROM listings WHERE id = $1", listing_id
-            )
-            if not existing:
-                raise HTTPException(status_code=404, detail="Listing not found")
-
-            updated_values = {
-                "start_date": (
-                    listing.start_date
-                    if listing.start_date is not None
-                    else existing["start_date"]
-                ),
-                "end_date": (
-                    listing.end_date
-                    if listing.end_date is not None
-                    else existing["end_date"]
-                ),
-                "target_gender": (
-                    listing.target_gender.value
-                    if listing.target_gender is not None
-                    else existing["target_gender"]
-                ),
-                "asking_price": (
-                    listing.asking_price
-                    if listing.asking_price is not None
-                    else existing["asking_price"]
-                ),
-                "num_bedrooms": (
-                    listing.num_bedrooms
-                    if listing.num_bedrooms is not None
-                    else existing["num_bedrooms"]
-                ),
-                "num_bathrooms": (
-                    listing.num_bathrooms
-                    if listing.num_bathrooms is not None
-                    else existing["num_bathrooms"]
-                ),
-                "pet_friendly": (
-                    listing.pet_friendly
-                    if listing.pet_friendly is not None
-                    else existing["pet_friendly"]
-                ),
-                "utilities_incl": (
-                    listing.utilities_incl
-                    if listing.utilities_incl is not None
-                    else existing["utilities_incl"]
-                ),
-                "description": (
-                    listing.description
-                    if listing.description is not None
-                    else existing["description"]
-                ),
-            }
-
-            update_query = """
-                UPDATE listings SET
-                    start_date = $1,
-                    end_date = $2,
-                    target_gender = $3,
-                    asking_price = $4,
-                    num_bedrooms = $5,
-                    num_bathrooms = $6,
-                    pet_friendly = $7,
-                    utilities_incl = $8,
-                    description = $9
-                WHERE id = $10
-            """
-
             try:
-                await connection.execute(
-                    update_query, *updated_values.values(), listing_id
+                # checked (and locked) first, so no address is resolved or
+                # location saved for a listing that doesn't exist
+                exists = await connection.fetchval(
+                    "SELECT 1 FROM listings WHERE id = $1 FOR UPDATE", listing_id
                 )
+                if not exists:
+                    raise HTTPException(status_code=404, detail="Listing not found")
+                if listing.raw_address:
+                    values.update(await address_columns(connection, listing.raw_address))
+                found, changed = await apply_patch(connection, "listings", listing_id, values)
+                if not found:
+                    raise HTTPException(status_code=404, detail="Listing not found")
+
+                pending = values.get("pending_address") is not None
+                if pending:
+                    await enqueue_geocode(connection, LISTING_LOCATION, listing_id, listing.raw_address)
+                elif listing.raw_address:
+                    await cancel_geocode(connection, LISTING_LOCATION, listing_id)
 
                 if listing.amenities is not None:
-                    await connection.execute(
-                        "DELETE FROM listing_amenities WHERE listing_id = $1",
-                        listing_id,
-                    )
-                    await insert_listing_amenities(
-                        connection, listing_id, listing.amenities
-                    )
-
-                if listing.photos_to_delete:
-                    await connection.execute(
-                        "DELETE FROM photos WHERE listing_id = $1 AND url = ANY($2::text[])",
-                        listing_id,
-                        listing.photos_to_delete,
+                    changed |= await sync_links(
+                        connection, "listing_amenities", "listing_id", listing_id,
+                        "amenity_id", listing.amenities,
                     )
+                changed |= await apply_photo_changes(
+                    connection,
+                    listing_id,
+                    to_add=listing.photos_to_add or [],
+                    to_update=listing.photos_to_update or [],
+                    to_delete=listing.photos_to_delete or [],
+                )
 
-                if listing.photos_to_update:
-                    for photo in listing.photos_to_update:
-                        await connection.execute(
-                            "UPDATE photos SET label = $1 WHERE listing_id = $2 AND url = $3",
-                            photo.label,
-                            listing_id,
-                            photo.url,
-                        )
-
-                if listing.photos_to_add:
-                    for photo in listing.photos_to_add:
-                        if photo.url:
-                            # Try to update label for existing photo
-                            result = await connection.execute(
-                                """UPDATE photos SET label = $1 WHERE listing_id = $2 AND url = $3""",
-                                photo.label,
-                                listing_id,
-                                photo.url,
-                            )
-                            # If no row was updated, insert as new
-                            if result == "UPDATE 0":
-                                await connection.execute(
-                                    """INSERT INTO photos (listing_id, url, label) VALUES ($1, $2, $3)""",
-                                    listing_id,
-                                    photo.url,
-                                    photo.label,
-                                )
-
+            except HTTPException:
+                raise
             except Exception as e:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail=f"Error updating listing: {str(e)}",
                 )
 
+            if changed:
+                # the listing's attributes rank its own deck, and they and its
+                # cover photo are stored in the renter decks' cards
+                await invalidate_deck(connection, LISTING_DECK, listing_id)
+                await drop_target_cards(connection, RENTER_DECK, [listing_id])
+
+    if changed:
+        # after commit, so a concurrent read can't re-cache the old row
+        invalidate_detail(LISTING_DETAIL, listing_id)
+    if pending:
+        wake_geocode_workers()
+        return {"message": "Listing updated successfully", "location_status": "pending"}
     return {"message": "Listing updated successfully"}
 
 
 @router.get("/listings/{listing_id}/renter_matches")
-async def get_renter_matches(listing_id: int):
-    query = """
-WITH score_params AS (
+async def get_renter_matches(
+    listing_id: int,
+    radius_km: float = Query(MATCH_RADIUS_KM, gt=0, le=MATCH_MAX_RADIUS_KM),
+    after_score: Optional[float] = None,
+    after_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=100),
+):
+    """
+    One page of the ranked deck, best first. Pass the returned next_cursor's
+    after_score/after_id to get the following page.
+    """
+    if (after_score is None) != (after_id is None):
+        raise HTTPException(
+            status_code=400, detail="after_score and after_id must be given together"
+        )
+    after = (after_score, after_id) if after_id is not None else None
+    matches, next_cursor = await get_deck_page(LISTING_DECK, listing_id, radius_km, after, limit)
+    if not matches:
+        return {
+            "matches": [],
+            "message": "No renter matches found for this listing",
+        }
+    return {"matches": matches, "count": len(matches), "next_cursor": next_cursor}
+
+
+COLLABORATIVE_RECOMMENDATIONS_QUERY = """
+WITH
+  -- Listings the current renter has liked (swiped right on)
+  current_likes AS (
+    SELECT listing_id
+    FROM renter_on_listing
+    WHERE renter_profile_id = $1
+      AND is_right = TRUE
+  ),
+
+  -- Merge the neighbour lists of those listings, skipping ones already liked
+  scored_recs AS (
     SELECT
-        100.0 AS base_score,
-        0.99 AS distance_factor_base,
-        0.997 AS price_factor_base,
-        1.2 AS bathroom_factor_base,
-        100 AS utilities_adjustment,
-        1.7 AS gender_factor
-),
-listing AS (
-    SELECT * FROM listings WHERE id = $1
-)
+      c.neighbor_id AS listing_id,
+      SUM(c.colikes) AS score
+    FROM current_likes AS cl
+    JOIN listing_colikes AS c
+      ON c.listing_id = cl.listing_id
+    WHERE c.neighbor_id NOT IN (SELECT listing_id FROM current_likes)
+    GROUP BY c.neighbor_id
+  )
+
+-- Return top recommendations; details are fetched in bulk afterwards
 SELECT
-  rc.id AS renter_id,
-  rc.budget,
-  rc.num_bedrooms,
-  rc.num_bathrooms,
-  rc.start_date,
-  rc.end_date,
-  rc.has_pet,
-  rc.bio,
-  rc.address_string,
-  bt.type AS building_type,
-  u.first_name AS renter_first_name,
-  u.last_name AS renter_last_name,
-  u.profile_photo AS renter_profile_photo,
-  rc.distance_km,
-  (
-    p.base_score *
-    POWER(p.distance_factor_base, rc.distance_km) *
-    POWER(p.price_factor_base,
-      (l.asking_price + CASE WHEN l.utilities_incl THEN 0 ELSE p.utilities_adjustment END) - rc.budget) *
-    POWER(p.bathroom_factor_base, (rc.num_bathrooms - l.num_bathrooms)) *
-    CASE WHEN rc.gender IS NULL OR rc.gender = l.target_gender THEN p.gender_factor ELSE 1 END
-  ) AS score
-FROM get_renter_candidates($1) rc
-JOIN listing l ON TRUE
-JOIN score_params p ON TRUE
-LEFT JOIN building_types bt ON rc.building_type_id = bt.id
-LEFT JOIN users u ON rc.user_id = u.id
-ORDER BY score DESC;
-    """
-
-    pool = await get_pool()
-    async with pool.acquire() as connection:
-        rows = await connection.fetch(query, listing_id)
-        if not rows:
-            return {
-                "matches": [],
-                "message": "No renter matches found for this listing",
-            }
-        matches = [dict(row) for row in rows]
-        return {"matches": matches, "count": len(matches)}
+  l.id,
+  sr.score
+FROM scored_recs AS sr
+JOIN listings AS l
+  ON l.id = sr.listing_id
+WHERE l.is_active = TRUE
+ORDER BY sr.score DESC, l.start_date ASC
+LIMIT 10;
+"""
 
 
 @router.get("/listings/recommendations/{current_renter_id}")
 async def get_collaborative_recommendations(current_renter_id: int):
     """
     Get collaborative filtering recommendations for a renter based on similar renters' preferences.
-    This route finds listings that similar renters (those who liked the same listings) have also liked.
+    Listings are scored by how often they were co-liked with the listings this renter liked,
+    using the precomputed listing_colikes neighbour lists (see create_similarity.sql).
     """
-    query = """
-    WITH
-      -- Listings the current renter has liked (swiped right on)
-      current_likes AS (
-        SELECT listing_id
-        FROM renter_on_listing
-        WHERE renter_profile_id = $1
-          AND is_right = TRUE
-      ),
-
-      --  Other renters who share at least 1 liked listing with the current renter
-      similar_renters AS (
-        SELECT
-          rol2.renter_profile_id,
-          COUNT(*) AS common_likes
-        FROM renter_on_listing AS rol1
-        JOIN renter_on_listing AS rol2
-          ON rol1.listing_id = rol2.listing_id
-          AND rol2.is_right = TRUE
-        WHERE rol1.renter_profile_id = $1
-          AND rol1.is_right = TRUE
-          AND rol2.renter_profile_id != $1
-        GROUP BY rol2.renter_profile_id
-        HAVING COUNT(*) >= 1
-      ),
-
-      -- Score unseen listings by how many similar renters liked them
-      scored_recs AS (
-        SELECT
-          rol.listing_id,
-          COUNT(*) AS score
-        FROM similar_renters AS sr
-        JOIN renter_on_listing AS rol
-          ON rol.renter_profile_id = sr.renter_profile_id
-          AND rol.is_right = TRUE
-        WHERE rol.listing_id NOT IN (SELECT listing_id FROM current_likes)
-        GROUP BY rol.listing_id
-      )
-
-    -- Return top recommendations with listing details
-    SELECT
-      l.*,
-      sr.score
-    FROM scored_recs AS sr
-    JOIN listings AS l
-      ON l.id = sr.listing_id
-    WHERE l.is_active = TRUE
-    ORDER BY sr.score DESC, l.start_date ASC
-    LIMIT 10;
-    """
-
     pool = await get_pool()
     async with pool.acquire() as connection:
         try:
-            rows = await connection.fetch(query, current_renter_id)
+            rows = await connection.fetch(COLLABORATIVE_RECOMMENDATIONS_QUERY, current_renter_id)
             if not rows:
                 return {
                     "recommendations": [],
                     "message": "No recommendations found. Try swiping on more listings to get personalized recommendations.",
                 }
 
-            # Get full listing details for each recommended listing
-            recommendations = []
-            for row in rows:
-                listing_id = row["id"]
-                score = row["score"]
-
-                # Get full listing details using the existing get_listing endpoint
-                listing_details = await get_listing(listing_id)
-                if listing_details:
-                    # Rename first_name to lister_name
-                    if "first_name" in listing_details:
-                        listing_details["lister_name"] = listing_details.pop(
-                            "first_name"
-                        )
-
-                    listing_details["score"] = score
-                    recommendations.append(listing_details)
+            # Full details for all recommended listings in one query, in ranking order
+            scores = {row["id"]: row["score"] for row in rows}
+            recommendations = await fetch_listing_details(connection, list(scores))
+            for listing_details in recommendations:
+                # Rename first_name to lister_name
+                listing_details["lister_name"] = listing_details.pop("first_name")
+                listing_details["score"] = scores[listing_details["id"]]
 
             return {
                 "recommendations": recommendations,
@@ -1,39 +1,125 @@
 from fastapi import APIRouter, HTTPException, status
 from models import Photo, ListingCreate
 from db import get_pool
+from utils.http_client import get_http_client
+from utils.lru import LRUCache
+from utils.metrics import time_stage
+from utils.singleflight import SingleFlight
 import httpx
 import os
+import re
 from dotenv import load_dotenv
 load_dotenv()
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+GOOGLE_AUTOCOMPLETE_URL = os.getenv(
+    "GOOGLE_AUTOCOMPLETE_URL", "https://maps.googleapis.com/maps/api/place/autocomplete/json"
+)
+AUTOCOMPLETE_CACHE_SIZE = int(os.getenv("AUTOCOMPLETE_CACHE_SIZE", "5000"))
+AUTOCOMPLETE_CACHE_TTL_SECONDS = float(os.getenv("AUTOCOMPLETE_CACHE_TTL_SECONDS", "3600"))
+# Places autocomplete returns at most this many predictions; a shorter result
+# means the list was complete for that prefix
+AUTOCOMPLETE_MAX_PREDICTIONS = 5
 
 router = APIRouter()
 
+# normalized input -> (predictions already restricted to Canada, whether the
+# upstream list was complete for that input)
+_autocomplete_cache = LRUCache(maxsize=AUTOCOMPLETE_CACHE_SIZE, ttl=AUTOCOMPLETE_CACHE_TTL_SECONDS)
+_autocomplete_flight = SingleFlight()
+_autocomplete_counters = {"derived_hits": 0}
+
+
+def normalize_input(input: str) -> str:
+    return re.sub(r"\s+", " ", input).strip().lower()
+
+
+def autocomplete_cache_stats() -> dict:
+    return {
+        "hits": _autocomplete_cache.hits,
+        "misses": _autocomplete_cache.misses,
+        "size": len(_autocomplete_cache),
+        "upstream_calls": _autocomplete_flight.calls,
+        "coalesced": _autocomplete_flight.coalesced,
+        **_autocomplete_counters,
+    }
+
+
+def is_canadian(prediction: dict) -> bool:
+    return any(term.get("value", "").lower() == "canada" for term in prediction.get("terms", []))
+
+
+def _derive_from_prefix(key: str):
+    """
+    Answer `key` from a cached shorter prefix. Only safe when that prefix's
+    list was complete (Google returned fewer than its maximum, counted before
+    the Canada filter) and not empty: then every match for the longer input is
+    already in it. Returns None when nothing usable is cached, so the input
+    goes upstream.
+    """
+    for end in range(len(key) - 1, 0, -1):
+        cached = _autocomplete_cache.peek(key[:end])
+        if cached is None:
+            continue
+        predictions, complete = cached
+        if not complete or not predictions:
+            return None
+        derived = [p for p in predictions if key in normalize_input(p.get("description", ""))]
+        # an empty filter result may just mean Google matched more loosely
+        return derived or None
+    return None
+
+
 async def get_address_autocomplete_predictions(input: str):
-    url = f"https://maps.googleapis.com/maps/api/place/autocomplete/json?input={input}&key={GOOGLE_API_KEY}"
+    params = {"input": input, "key": GOOGLE_API_KEY, "components": "country:ca"}
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(url)
-            if resp.status_code != 200:
-                raise HTTPException(status_code=resp.status_code, detail="Failed to fetch from Google Places API")
-            data = resp.json()
-            if "status" not in data or data["status"] != "OK":
-                raise HTTPException(status_code=400, detail=f"Google API failed: {data.get('status', 'No status')}")
-            if "predictions" not in data:
-                raise HTTPException(status_code=400, detail="No predictions in Google API response")
-            return data["predictions"]
+        client = await get_http_client()
+        with time_stage("autocomplete"):
+            resp = await client.get(GOOGLE_AUTOCOMPLETE_URL, params=params)
+        if resp.status_code != 200:
+            raise HTTPException(status_code=resp.status_code, detail="Failed to fetch from Google Places API")
+        data = resp.json()
+        if data.get("status") == "ZERO_RESULTS":
+            return []
+        if "status" not in data or data["status"] != "OK":
+            raise HTTPException(status_code=400, detail=f"Google API failed: {data.get('status', 'No status')}")
+        if "predictions" not in data:
+            raise HTTPException(status_code=400, detail="No predictions in Google API response")
+        return data["predictions"]
+    except HTTPException:
+        raise
     except httpx.RequestError as e:
         raise HTTPException(status_code=500, detail=f"HTTPX error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
+
+async def get_cached_predictions(input: str):
+    key = normalize_input(input)
+    if not key:
+        return []
+
+    cached = _autocomplete_cache.get(key)
+    if cached is not None:
+        return cached[0]
+
+    derived = _derive_from_prefix(key)
+    if derived is not None:
+        _autocomplete_counters["derived_hits"] += 1
+        # every match of a complete list, so complete too
+        _autocomplete_cache.set(key, (derived, True))
+        return derived
+
+    async def fetch():
+        predictions = await get_address_autocomplete_predictions(input)
+        # components=country:ca restricts upstream; keep the check for safety
+        canadian = [p for p in predictions if is_canadian(p)]
+        _autocomplete_cache.set(key, (canadian, len(predictions) < AUTOCOMPLETE_MAX_PREDICTIONS))
+        return canadian
+
+    return await _autocomplete_flight.do(key, fetch)
+
+
 @router.get("/locations/{input}")
 async def get_location_predictions(input: str):
-    predictions = await get_address_autocomplete_predictions(input)
-    # filter for only locations in Canada
-    canadian = [
-        p for p in predictions
-        if any(term.get("value", "").lower() == "canada" for term in p.get("terms", []))
-    ]
-    return {"predictions": canadian}
\ No newline at end of file
+    return {"predictions": await get_cached_predictions(input)}
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from utils.cloudinary_utils import delete_photo
+from utils.cloudinary_utils import delete_photos
 from typing import List
 
 router = APIRouter()
@@ -13,19 +13,15 @@ async def delete_cloudinary_photos(payload: PhotoDeleteRequest):
     print("Received delete request for:", payload.public_ids)
     
     try:
-        failed = []
-        for public_id in payload.public_ids:
-            result = delete_photo(public_id)
-            if result.get("result") != "ok":
-                failed.append(public_id)
-
-        if failed:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Failed to delete some photos: {failed}"
-            )
-
-        return {"message": "Photos deleted successfully"}
+        results = await delete_photos(payload.public_ids)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    failed = [public_id for public_id, result in results.items() if result != "deleted"]
+    if failed:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Failed to delete some photos: {failed}"
+        )
+
+    return {"message": "Photos deleted successfully", "results": results}
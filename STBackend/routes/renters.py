@@ -1,59 +1,100 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, Response, status
+from typing import Optional
 from models import RenterProfileCreate, RenterProfileUpdate
 from asyncpg import CheckViolationError, PostgresError
-from utils.location_helper import (
-    resolve_address_from_google,
-    insert_location_if_not_exists,
+from utils.geocode_queue import (
+    RENTER_LOCATION,
+    address_columns,
+    cancel_geocode,
+    enqueue_geocode,
+    wake_geocode_workers,
 )
+from utils.matching import MATCH_MAX_RADIUS_KM, MATCH_RADIUS_KM
+from utils.deck import LISTING_DECK, RENTER_DECK, drop_target_cards, get_deck_page, invalidate_deck
+from utils.details import (
+    RENTER_COLUMNS,
+    fetch_renter_details,
+    parse_fields,
+    parse_ids,
+    project,
+)
+from utils.detail_cache import RENTER_DETAIL, get_detail, get_details, invalidate_detail
+from utils.patch import apply_patch, patch_values
 from db import get_pool
 
 router = APIRouter()
 
+# RenterProfileUpdate fields that map straight onto renter_profiles columns
+# (raw_address is resolved to locations_id separately, see address_columns())
+RENTER_PATCH_COLUMNS = {
+    field: field
+    for field in (
+        "start_date", "end_date", "age", "gender", "budget", "building_type_id",
+        "num_bedrooms", "num_bathrooms", "has_pet", "bio",
+    )
+}
+
 
 @router.post("/renters", status_code=status.HTTP_201_CREATED)
-async def create_renter_profile(profile: RenterProfileCreate):
+async def create_renter_profile(profile: RenterProfileCreate, response: Response):
+    """
+    Saves the profile straight away. If its address hasn't been geocoded
+    before, the profile is created with location_status "pending" (202) and
+    gets its location in the background; it has no matches until then.
+    """
     if not profile.raw_address:
         raise HTTPException(status_code=400, detail="Missing address")
 
     try:
-        place_data = await resolve_address_from_google(profile.raw_address)
-
         pool = await get_pool()
         async with pool.acquire() as connection:
-            location_id = await insert_location_if_not_exists(connection, place_data)
+            async with connection.transaction():
+                location = await address_columns(connection, profile.raw_address)
 
-            query = """
-                INSERT INTO renter_profiles (
-                    user_id, locations_id, start_date, end_date,
-                    age, gender, budget, building_type_id,
-                    num_bedrooms, num_bathrooms, has_pet, bio
-                )
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)
-                RETURNING *
-            """
-
-            row = await connection.fetchrow(
-                query,
-                profile.user_id,
-                location_id,
-                profile.start_date,
-                profile.end_date,
-                profile.age,
-                profile.gender.value,
-                profile.budget,
-                profile.building_type_id,
-                profile.num_bedrooms,
-                profile.num_bathrooms,
-                profile.has_pet,
-                profile.bio,
-            )
+                query = """
+                    INSERT INTO renter_profiles (
+                        user_id, locations_id, pending_address, start_date, end_date,
+                        age, gender, budget, building_type_id,
+                        num_bedrooms, num_bathrooms, has_pet, bio
+                    )
+                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13)
+                    RETURNING *
+                """
 
-            if not row:
-                raise HTTPException(
-                    status_code=500, detail="Renter profile insert failed"
+                row = await connection.fetchrow(
+                    query,
+                    profile.user_id,
+                    location.get("locations_id"),
+                    location["pending_address"],
+                    profile.start_date,
+                    profile.end_date,
+                    profile.age,
+                    profile.gender.value,
+                    profile.budget,
+                    profile.building_type_id,
+                    profile.num_bedrooms,
+                    profile.num_bathrooms,
+                    profile.has_pet,
+                    profile.bio,
                 )
 
-            return {"message": "Renter profile created", "id": row["id"]}
+                if not row:
+                    raise HTTPException(
+                        status_code=500, detail="Renter profile insert failed"
+                    )
+
+                pending = location["pending_address"] is not None
+                if pending:
+                    await enqueue_geocode(connection, RENTER_LOCATION, row["id"], profile.raw_address)
+
+        if pending:
+            wake_geocode_workers()
+            response.status_code = status.HTTP_202_ACCEPTED
+        return {
+            "message": "Renter profile created",
+            "id": row["id"],
+            "location_status": "pending" if pending else "resolved",
+        }
 
     except Exception as e:
         if "renter_profiles_user_id_key" in str(e):
@@ -68,43 +109,47 @@ async def create_renter_profile(profile: RenterProfileCreate):
             raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
 
 
+@router.get("/renters")
+async def get_renter_profiles(ids: str, fields: Optional[str] = None):
+    """
+    Many renter profiles in one request, e.g. /renters?ids=3,1,2&fields=first_name,budget.
+    Results keep the order of `ids`; ids that don't exist are reported in `missing`.
+    """
+    try:
+        renter_ids = parse_ids(ids)
+        field_names = parse_fields(fields, RENTER_COLUMNS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def load(missing):
+        pool = await get_pool()
+        async with pool.acquire() as connection:
+            rows = await fetch_renter_details(connection, missing, field_names)
+        return {row["id"]: row for row in rows}
+
+    found = await get_details(
+        RENTER_DETAIL, renter_ids, load, cache_loaded=field_names is None
+    )
+    renters = [project(found[i], field_names) for i in renter_ids if i in found]
+    return {
+        "renters": renters,
+        "count": len(renters),
+        "missing": [i for i in renter_ids if i not in found],
+    }
+
+
 @router.get("/renters/{renter_id}")
 async def get_renter_profile(renter_id: int):
-    query = """
-        SELECT 
-            rp.id,
-            rp.user_id,
-            u.first_name,
-            u.last_name,
-            u.email,
-            u.profile_photo,
-            rp.is_active,
-            rp.start_date,
-            rp.end_date,
-            rp.age,
-            rp.gender,
-            rp.budget,
-            rp.num_bedrooms,
-            rp.num_bathrooms,
-            rp.has_pet,
-            rp.bio,
-            loc.address_string,
-            loc.latitude,
-            loc.longitude,
-            bt.type AS building_type
-        FROM renter_profiles rp
-        JOIN users u ON rp.user_id = u.id
-        JOIN locations loc ON rp.locations_id = loc.id
-        LEFT JOIN building_types bt ON rp.building_type_id = bt.id
-        WHERE rp.id = $1
-    """
+    async def load():
+        pool = await get_pool()
+        async with pool.acquire() as connection:
+            rows = await fetch_renter_details(connection, [renter_id])
+            return rows[0] if rows else None
 
-    pool = await get_pool()
-    async with pool.acquire() as connection:
-        row = await connection.fetchrow(query, renter_id)
-        if not row:
-            raise HTTPException(status_code=404, detail="Renter profile not found")
-        return dict(row)
+    profile = await get_detail(RENTER_DETAIL, renter_id, load)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Renter profile not found")
+    return profile
 
 
 @router.put("/renters/{renter_id}/deactivate/{user_id}")
@@ -124,98 +169,41 @@ async def deactivate_renter_profile(renter_id: int, user_id: int):
                 status_code=404,
                 detail="Renter profile not found or user not authorized",
             )
+        await invalidate_deck(connection, RENTER_DECK, renter_id)
+        # other swipers' decks must stop serving it
+        await drop_target_cards(connection, LISTING_DECK, [renter_id])
+        invalidate_detail(RENTER_DETAIL, renter_id)
         return dict(row)
 
 
 @router.patch("/renters/{renter_id}")
 async def update_renter_profile(renter_id: int, profile: RenterProfileUpdate):
+    """Only the fields present in the body are written, in one UPDATE."""
+    values = patch_values(profile, RENTER_PATCH_COLUMNS)
+
     pool = await get_pool()
     async with pool.acquire() as connection:
         async with connection.transaction():
-            existing = await connection.fetchrow(
-                "SELECT * FROM renter_profiles WHERE id = $1", renter_id
+            # checked (and locked) first, so no address is resolved or location
+            # saved for a profile that doesn't exist
+            exists = await connection.fetchval(
+                "SELECT 1 FROM renter_profiles WHERE id = $1 FOR UPDATE", renter_id
             )
-            if not existing:
+            if not exists:
                 raise HTTPException(status_code=404, detail="Renter profile not found")
 
-            # Resolve new location if a raw_address was provided
+            # a new address that was geocoded before sets locations_id now;
+            # otherwise it is left pending and resolved in the background
             if profile.raw_address:
                 try:
-                    place_data = await resolve_address_from_google(profile.raw_address)
-                    locations_id = await insert_location_if_not_exists(
-                        connection, place_data
-                    )
+                    values.update(await address_columns(connection, profile.raw_address))
                 except Exception as e:
                     raise HTTPException(
                         status_code=400, detail=f"Failed to resolve address: {str(e)}"
                     )
-            else:
-                locations_id = existing["locations_id"]
-
-            updated_values = {
-                "locations_id": locations_id,
-                "start_date": (
-                    profile.start_date
-                    if profile.start_date is not None
-                    else existing["start_date"]
-                ),
-                "end_date": (
-                    profile.end_date
-                    if profile.end_date is not None
-                    else existing["end_date"]
-                ),
-                "age": profile.age if profile.age is not None else existing["age"],
-                "gender": (
-                    profile.gender.value
-                    if profile.gender is not None
-                    else existing["gender"]
-                ),
-                "budget": (
-                    profile.budget if profile.budget is not None else existing["budget"]
-                ),
-                "building_type_id": (
-                    profile.building_type_id
-                    if profile.building_type_id is not None
-                    else existing["building_type_id"]
-                ),
-                "num_bedrooms": (
-                    profile.num_bedrooms
-                    if profile.num_bedrooms is not None
-                    else existing["num_bedrooms"]
-                ),
-                "num_bathrooms": (
-                    profile.num_bathrooms
-                    if profile.num_bathrooms is not None
-                    else existing["num_bathrooms"]
-                ),
-                "has_pet": (
-                    profile.has_pet
-                    if profile.has_pet is not None
-                    else existing["has_pet"]
-                ),
-                "bio": profile.bio if profile.bio is not None else existing["bio"],
-            }
-
-            update_query = """
-                UPDATE renter_profiles SET
-                    locations_id = $1,
-                    start_date = $2,
-                    end_date = $3,
-                    age = $4,
-                    gender = $5,
-                    budget = $6,
-                    building_type_id = $7,
-                    num_bedrooms = $8,
-                    num_bathrooms = $9,
-                    has_pet = $10,
-                    bio = $11
-                WHERE id = $12
-            """
 
             try:
-                await connection.execute(
-                    update_query, *updated_values.values(), renter_id
-                )
+                found, changed = await apply_patch(connection, "renter_profiles", renter_id, values)
             except CheckViolationError as e:
                 msg = str(e)
                 if "chk_age_min" in msg:
@@ -231,74 +219,52 @@ async def update_renter_profile(renter_id: int, profile: RenterProfileUpdate):
                 raise HTTPException(
                     status_code=500, detail="A database error occurred."
                 )
+            if not found:
+                raise HTTPException(status_code=404, detail="Renter profile not found")
+
+            pending = values.get("pending_address") is not None
+            if pending:
+                await enqueue_geocode(connection, RENTER_LOCATION, renter_id, profile.raw_address)
+            elif profile.raw_address:
+                await cancel_geocode(connection, RENTER_LOCATION, renter_id)
 
+            if changed:
+                # preferences changed, so the ranked deck is stale, and the
+                # listing decks' cards hold the old profile
+                await invalidate_deck(connection, RENTER_DECK, renter_id)
+                await drop_target_cards(connection, LISTING_DECK, [renter_id])
+
+    if changed:
+        # after commit, so a concurrent read can't re-cache the old row
+        invalidate_detail(RENTER_DETAIL, renter_id)
+    if pending:
+        wake_geocode_workers()
+        return {"message": "Renter profile updated successfully", "location_status": "pending"}
     return {"message": "Renter profile updated successfully"}
 
 
 @router.get("/renters/{renter_id}/listing_matches")
-async def get_renter_matches(renter_id: int):
-    query = """
-WITH score_params AS (
-    SELECT
-        100.0 AS base_score,
-        0.99 AS distance_factor_base,
-        0.997 AS price_factor_base,
-        1.2 AS bathroom_factor_base,
-        100 AS utilities_adjustment,
-        1.2 AS building_type_factor,
-        1.5 AS gender_factor
-),
-renter AS (
-    SELECT * FROM renter_profiles WHERE id = $1
-)
-SELECT
-    lc.id,
-    lc.asking_price,
-    lc.num_bedrooms,
-    lc.num_bathrooms,
-    lc.start_date,
-    lc.end_date,
-    lc.address_string,
-    bt.type as building_type,
-    lister.first_name as lister_name,
-    photo.url as photo_url,
-    photo.label as photo_label,
-    (
-        p.base_score *
-        POWER(p.distance_factor_base, lc.distance_km) *
-        POWER(p.price_factor_base,
-            (lc.asking_price + CASE WHEN lc.utilities_incl THEN 0 ELSE p.utilities_adjustment END) - r.budget) *
-        POWER(p.bathroom_factor_base, (lc.num_bathrooms - r.num_bathrooms)) *
-        CASE WHEN lc.building_type_id = r.building_type_id THEN p.building_type_factor ELSE 1 END *
-        CASE WHEN lc.target_gender IS NULL OR lc.target_gender = r.gender THEN p.gender_factor ELSE 1 END
-    ) AS score
-FROM get_listing_candidates($1) lc
-JOIN renter r ON TRUE
-JOIN score_params p ON TRUE
-JOIN building_types bt ON lc.building_type_id = bt.id
-LEFT JOIN LATERAL (
-    SELECT url, label
-    FROM photos
-    WHERE photos.listing_id = lc.id
-    LIMIT 1
-) AS photo ON TRUE
-LEFT JOIN LATERAL (
-    SELECT first_name
-    FROM users
-    WHERE users.id = lc.user_id
-    LIMIT 1
-) AS lister ON TRUE
-ORDER BY score DESC;
+async def get_renter_matches(
+    renter_id: int,
+    radius_km: float = Query(MATCH_RADIUS_KM, gt=0, le=MATCH_MAX_RADIUS_KM),
+    after_score: Optional[float] = None,
+    after_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=100),
+):
     """
+    One page of the ranked deck, best first. Pass the returned next_cursor's
+    after_score/after_id to get the following page.
+    """
+    if (after_score is None) != (after_id is None):
+        raise HTTPException(
+            status_code=400, detail="after_score and after_id must be given together"
+        )
+    after = (after_score, after_id) if after_id is not None else None
+    matches, next_cursor = await get_deck_page(RENTER_DECK, renter_id, radius_km, after, limit)
+    if not matches:
+        return {"matches": [], "message": "No matches found for this renter"}
 
-    pool = await get_pool()
-    async with pool.acquire() as connection:
-        rows = await connection.fetch(query, renter_id)
-        if not rows:
-            return {"matches": [], "message": "No matches found for this renter"}
-
-        matches = [dict(row) for row in rows]
-        return {"matches": matches, "count": len(matches)}
+    return {"matches": matches, "count": len(matches), "next_cursor": next_cursor}
 
 
 @router.put("/renters/{renter_id}/reactivate/{user_id}")
@@ -318,4 +284,9 @@ async def reactivate_renter_profile(renter_id: int, user_id: int):
                 status_code=404,
                 detail="Renter profile not found or user not authorized",
             )
+        # its swipes went with the deactivation, so its old deck is stale, and
+        # a build that raced the deactivation may still hold it as a card
+        await invalidate_deck(connection, RENTER_DECK, renter_id)
+        await drop_target_cards(connection, LISTING_DECK, [renter_id])
+        invalidate_detail(RENTER_DETAIL, renter_id)
         return dict(row)
@@ -1,39 +1,53 @@
 from fastapi import APIRouter, HTTPException, status
-from models import SwipeCreate
-from db import get_pool
+from models import SwipeCreate, SwipeBatchCreate
+from db import get_pool, hot_fetchrow, register_hot_statement
+from utils.deck import LISTING_DECK, RENTER_DECK, pop_cards
+from utils.metrics import time_query
 
 router = APIRouter()
 
-@router.post("/swipes/listing/{listing_id}", status_code=status.HTTP_201_CREATED)
-async def create_swipe(listing_id: int, swipe: SwipeCreate):
-    insert_query = """
-        INSERT INTO listing_on_renter (listing_id, renter_profile_id, is_right)
-        VALUES ($1, $2, $3)
-        ON CONFLICT (listing_id, renter_profile_id) DO UPDATE
-        SET is_right = EXCLUDED.is_right
-        RETURNING id
-    """
+LISTING_SWIPE_UPSERT = register_hot_statement("listing_swipe_upsert", """
+    INSERT INTO listing_on_renter (listing_id, renter_profile_id, is_right)
+    VALUES ($1, $2, $3)
+    ON CONFLICT (listing_id, renter_profile_id) DO UPDATE
+    SET is_right = EXCLUDED.is_right
+    RETURNING id
+""")
 
-    mutual_match_query = """
-        SELECT EXISTS (
-            SELECT 1 FROM mutual_matches
-            WHERE listing_id = $1 AND renter_profile_id = $2
-        ) AS is_match
-    """
+RENTER_SWIPE_UPSERT = register_hot_statement("renter_swipe_upsert", """
+    INSERT INTO renter_on_listing (renter_profile_id, listing_id, is_right)
+    VALUES ($1, $2, $3)
+    ON CONFLICT (renter_profile_id, listing_id) DO UPDATE
+    SET is_right = EXCLUDED.is_right
+    RETURNING id
+""")
 
+MUTUAL_MATCH_PROBE = register_hot_statement("mutual_match_probe", """
+    SELECT EXISTS (
+        SELECT 1 FROM mutual_matches
+        WHERE listing_id = $1 AND renter_profile_id = $2
+    ) AS is_match
+""")
+
+@router.post("/swipes/listing/{listing_id}", status_code=status.HTTP_201_CREATED)
+async def create_swipe(listing_id: int, swipe: SwipeCreate):
     pool = await get_pool()
     async with pool.acquire() as connection:
         try:
-            row = await connection.fetchrow(
-                insert_query,
+            row = await hot_fetchrow(
+                connection,
+                LISTING_SWIPE_UPSERT,
                 listing_id,
                 swipe.target_id,
                 swipe.is_right
             )
-            # Check mutual match only if swipe is right swipe
+            await pop_cards(connection, LISTING_DECK, listing_id, [swipe.target_id])
+
+            # Check mutual match only if swipe is right swipe. mutual_matches is
+            # maintained by the swipe triggers, so this is a primary-key lookup.
             is_match = False
             if swipe.is_right:
-                match_row = await connection.fetchrow(mutual_match_query, listing_id, swipe.target_id)
+                match_row = await hot_fetchrow(connection, MUTUAL_MATCH_PROBE, listing_id, swipe.target_id)
                 is_match = match_row["is_match"]
 
             return {
@@ -49,33 +63,21 @@ async def create_swipe(listing_id: int, swipe: SwipeCreate):
 
 @router.post("/swipes/renter/{renter_profile_id}", status_code=status.HTTP_201_CREATED)
 async def create_swipe(renter_profile_id: int, swipe: SwipeCreate):
-    insert_query = """
-        INSERT INTO renter_on_listing (renter_profile_id, listing_id, is_right)
-        VALUES ($1, $2, $3)
-        ON CONFLICT (renter_profile_id, listing_id) DO UPDATE
-        SET is_right = EXCLUDED.is_right
-        RETURNING id
-    """
-
-    mutual_match_query = """
-        SELECT EXISTS (
-            SELECT 1 FROM mutual_matches
-            WHERE renter_profile_id = $1 AND listing_id = $2
-        ) AS is_match
-    """
-
     pool = await get_pool()
     async with pool.acquire() as connection:
         try:
-            row = await connection.fetchrow(
-                insert_query,
+            row = await hot_fetchrow(
+                connection,
+                RENTER_SWIPE_UPSERT,
                 renter_profile_id,
                 swipe.target_id,
                 swipe.is_right
             )
+            await pop_cards(connection, RENTER_DECK, renter_profile_id, [swipe.target_id])
+
             is_match = False
             if swipe.is_right:
-                match_row = await connection.fetchrow(mutual_match_query, renter_profile_id, swipe.target_id)
+                match_row = await hot_fetchrow(connection, MUTUAL_MATCH_PROBE, swipe.target_id, renter_profile_id)
                 is_match = match_row["is_match"]
 
             return {
@@ -88,3 +90,120 @@ async def create_swipe(renter_profile_id: int, swipe: SwipeCreate):
                 status_code=400,
                 detail=f"Failed to record renter swipe: {str(e)}"
             )
+
+
+# (swipe table, swiper column, swiper table, target column, target table, deck kind)
+_BATCH_TARGETS = {
+    "listing": ("listing_on_renter", "listing_id", "listings", "renter_profile_id", "renter_profiles", LISTING_DECK),
+    "renter": ("renter_on_listing", "renter_profile_id", "renter_profiles", "listing_id", "listings", RENTER_DECK),
+}
+_NOT_FOUND = {"listings": "Listing not found", "renter_profiles": "Renter profile not found"}
+
+
+async def _record_swipe_batch(kind: str, swiper_id: int, batch: SwipeBatchCreate):
+    """
+    Record many swipes from one swiper with a single upsert and a single
+    mutual-match lookup. Results come back in request order; if a target
+    appears more than once, the last swipe on it wins.
+    """
+    swipe_table, swiper_column, swiper_table, target_column, target_table, deck_kind = _BATCH_TARGETS[kind]
+
+    latest = {}
+    for index, swipe in enumerate(batch.swipes):
+        latest[swipe.target_id] = index
+
+    upsert_query = f"""
+        INSERT INTO {swipe_table} ({swiper_column}, {target_column}, is_right)
+        SELECT $1, t.target_id, t.is_right
+        FROM unnest($2::bigint[], $3::boolean[]) AS t(target_id, is_right)
+        ON CONFLICT ({swiper_column}, {target_column}) DO UPDATE
+        SET is_right = EXCLUDED.is_right
+        RETURNING id, {target_column} AS target_id
+    """
+
+    pool = await get_pool()
+    async with pool.acquire() as connection:
+        async with connection.transaction():
+            if not await connection.fetchval(f"SELECT 1 FROM {swiper_table} WHERE id = $1", swiper_id):
+                raise HTTPException(status_code=404, detail=_NOT_FOUND[swiper_table])
+
+            existing = {
+                row["id"]
+                for row in await connection.fetch(
+                    f"SELECT id FROM {target_table} WHERE id = ANY($1::bigint[])", list(latest)
+                )
+            }
+            valid = [target_id for target_id in latest if target_id in existing]
+
+            swipe_ids = {}
+            if valid:
+                with time_query(f"{deck_kind}_swipe_batch_upsert"):
+                    rows = await connection.fetch(
+                        upsert_query,
+                        swiper_id,
+                        valid,
+                        [batch.swipes[latest[target_id]].is_right for target_id in valid],
+                    )
+                swipe_ids = {row["target_id"]: row["id"] for row in rows}
+
+            right_ids = [target_id for target_id in valid if batch.swipes[latest[target_id]].is_right]
+            matched = set()
+            if right_ids:
+                with time_query("mutual_match_batch_probe"):
+                    rows = await connection.fetch(
+                        f"""
+                        SELECT {target_column} AS target_id FROM mutual_matches
+                        WHERE {swiper_column} = $1 AND {target_column} = ANY($2::bigint[])
+                        """,
+                        swiper_id,
+                        right_ids,
+                    )
+                matched = {row["target_id"] for row in rows}
+
+        if valid:
+            await pop_cards(connection, deck_kind, swiper_id, valid)
+
+    results = []
+    for index, swipe in enumerate(batch.swipes):
+        result = {"target_id": swipe.target_id, "is_right": swipe.is_right}
+        if latest[swipe.target_id] != index:
+            result["error"] = "Superseded by a later swipe on the same target"
+        elif swipe.target_id not in existing:
+            result["error"] = _NOT_FOUND[target_table]
+        else:
+            result["id"] = swipe_ids[swipe.target_id]
+            result["match"] = swipe.target_id in matched
+        results.append(result)
+
+    return {
+        "message": f"{kind.capitalize()} swipes recorded",
+        "recorded": len(valid),
+        "failed": len(results) - len(valid),
+        "results": results,
+    }
+
+
+@router.post("/swipes/listing/{listing_id}/batch", status_code=status.HTTP_200_OK)
+async def create_listing_swipe_batch(listing_id: int, batch: SwipeBatchCreate):
+    try:
+        return await _record_swipe_batch("listing", listing_id, batch)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Failed to record listing swipes: {str(e)}"
+        )
+
+
+@router.post("/swipes/renter/{renter_profile_id}/batch", status_code=status.HTTP_200_OK)
+async def create_renter_swipe_batch(renter_profile_id: int, batch: SwipeBatchCreate):
+    try:
+        return await _record_swipe_batch("renter", renter_profile_id, batch)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Failed to record renter swipes: {str(e)}"
+        )
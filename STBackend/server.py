@@ -1,91 +1,167 @@
-from fastapi import FastAPI, HTTPException
-from contextlib import asynccontextmanager
-from db import init_db, close_db, get_pool
-from routes import listings, hello, renters, auth, users, locations, swipes, mutualmatches, photos
-from typing import List
-from pydantic import BaseModel
-
-class Amenity(BaseModel):
-    id: int
-    name: str
-
-class BuildingType(BaseModel):
-    id: int
-    type: str
-
-class Gender(BaseModel):
-    id: int
-    gender: str
-
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Startup: Initialize DB pool
-    await init_db()
-    yield
-    # Shutdown: Close DB pool
-    await close_db()
-
-app = FastAPI(lifespan=lifespan)
-
-app.include_router(listings.router)
-app.include_router(auth.router)
-app.include_router(hello.router)
-app.include_router(renters.router)
-app.include_router(users.router)
-app.include_router(locations.router)
-app.include_router(swipes.router)
-app.include_router(mutualmatches.router)
-app.include_router(photos.router)
-
-from fastapi.middleware.cors import CORSMiddleware
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-@app.get("/amenities", response_model=List[Amenity])
-async def get_amenities():
-    """
-    Get all available amenities
-    """
-    pool = await get_pool()
-    async with pool.acquire() as connection:
-        try:
-            rows = await connection.fetch("SELECT id, name FROM amenities ORDER BY name")
-            return [Amenity(id=row["id"], name=row["name"]) for row in rows]
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-
-@app.get("/building-types", response_model=List[BuildingType])
-async def get_building_types():
-    """
-    Get all available building types
-    """
-    pool = await get_pool()
-    async with pool.acquire() as connection:
-        try:
-            rows = await connection.fetch("SELECT id, type FROM building_types ORDER BY type")
-            return [BuildingType(id=row["id"], type=row["type"]) for row in rows]
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-
-@app.get("/genders", response_model=List[Gender])
-async def get_genders():
-    """
-    Get all available genders from gender_enum
-    """
-    pool = await get_pool()
-    async with pool.acquire() as connection:
-        try:
-            # Query PostgreSQL enum values
-            rows = await connection.fetch("""
-                SELECT unnest(enum_range(NULL::gender_enum)) as gender
-            """)
-            # Create Gender objects with index as id
-            return [Gender(id=i+1, gender=row["gender"]) for i, row in enumerate(rows)]
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
\ No newline at end of file
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from contextlib import asynccontextmanager
+import time
+from db import init_db, close_db, pool_stats
+from utils.detail_cache import detail_cache_stats
+from utils.location_helper import geocode_cache_stats
+from utils.geocode_queue import geocode_queue_stats, start_geocode_workers, stop_geocode_workers
+from utils.expiry import expiry_stats, start_expiry_sweeper, stop_expiry_sweeper
+from utils.colike_queue import colike_queue_stats, start_colike_worker, stop_colike_worker
+from utils.metrics import REQUEST_LATENCY, render_gauges, render_metrics
+from utils.http_client import init_http_client, close_http_client
+from utils.passwords import shutdown_password_executor
+from utils.reference_data import (
+    invalidate_reference_data,
+    reference_etags,
+    reference_response,
+    warm_reference_data,
+)
+from routes import listings, hello, renters, auth, users, locations, swipes, mutualmatches, photos, exports
+from typing import List
+from pydantic import BaseModel
+
+class Amenity(BaseModel):
+    id: int
+    name: str
+
+class BuildingType(BaseModel):
+    id: int
+    type: str
+
+class Gender(BaseModel):
+    id: int
+    gender: str
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: Initialize DB pool and the shared HTTP client
+    await init_db()
+    await init_http_client()
+    try:
+        await warm_reference_data()
+    except Exception as e:
+        # endpoints load lazily if this fails
+        print(f"[ERROR] Failed to warm reference data cache: {e}")
+    # resolves addresses of listings/profiles saved with a pending location
+    start_geocode_workers()
+    # deactivates listings and renter profiles past their end_date
+    start_expiry_sweeper()
+    # pairs queued likes into listing_colikes
+    start_colike_worker()
+    yield
+    # Shutdown: stop the background tasks, close DB pool, HTTP client and password hashing threads
+    await stop_colike_worker()
+    await stop_expiry_sweeper()
+    await stop_geocode_workers()
+    await close_http_client()
+    await close_db()
+    shutdown_password_executor()
+
+app = FastAPI(lifespan=lifespan)
+
+app.include_router(listings.router)
+app.include_router(auth.router)
+app.include_router(hello.router)
+app.include_router(renters.router)
+app.include_router(users.router)
+app.include_router(locations.router)
+app.include_router(swipes.router)
+app.include_router(mutualmatches.router)
+app.include_router(photos.router)
+app.include_router(exports.router)
+
+from fastapi.middleware.cors import CORSMiddleware
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # label by route template (/listings/{listing_id}), not the raw path,
+        # so ids don't create a series each
+        route = request.scope.get("route")
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - start,
+            request.method,
+            route.path if route else "unmatched",
+            str(status_code),
+        )
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+@app.get("/amenities", response_model=List[Amenity])
+async def get_amenities(request: Request):
+    """
+    Get all available amenities
+    """
+    try:
+        return await reference_response("amenities", request)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@app.get("/building-types", response_model=List[BuildingType])
+async def get_building_types(request: Request):
+    """
+    Get all available building types
+    """
+    try:
+        return await reference_response("building_types", request)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@app.get("/genders", response_model=List[Gender])
+async def get_genders(request: Request):
+    """
+    Get all available genders from gender_enum
+    """
+    try:
+        return await reference_response("genders", request)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@app.post("/reference-data/refresh")
+async def refresh_reference_data():
+    """
+    Reload amenities, building types and genders after they were changed in the database
+    """
+    invalidate_reference_data()
+    try:
+        await warm_reference_data()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    return {"message": "Reference data reloaded", "etags": reference_etags()}
+
+@app.get("/stats/pool")
+async def get_pool_stats():
+    """
+    Connection pool usage for this worker: acquire waits, connections opened and in use, hot statement calls already prepared on their connection
+    """
+    return pool_stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Prometheus text exposition: request, query and stage latency histograms plus
+    pool and cache counters for this worker
+    """
+    extra = (
+        render_gauges("db_pool", pool_stats())
+        + render_gauges("geocode_cache", geocode_cache_stats())
+        + render_gauges("geocode_queue", geocode_queue_stats())
+        + render_gauges("expiry", expiry_stats())
+        + render_gauges("colike_queue", colike_queue_stats())
+        + render_gauges("autocomplete_cache", locations.autocomplete_cache_stats())
+        + render_gauges("detail_cache", detail_cache_stats(), label="kind")
+    )
+    return PlainTextResponse(render_metrics(extra), media_type="text/plain; version=0.0.4")
@@ -1,6 +1,9 @@
+import asyncio
 import os
+from pathlib import Path
+
 import cloudinary
-import cloudinary.uploader
+import cloudinary.api
 from dotenv import load_dotenv
 
 load_dotenv() 
@@ -12,6 +15,69 @@ cloudinary.config(
     api_secret=os.getenv("CLOUDINARY_API_SECRET"),
 )
 
-def delete_photo(public_id: str):
-    result = cloudinary.uploader.destroy(public_id)
-    return result
+# "cloudinary", or "local" to delete files under LOCAL_PHOTO_DIR instead
+# (development and tests, no Cloudinary account needed)
+PHOTO_STORAGE_BACKEND = os.getenv("PHOTO_STORAGE_BACKEND", "cloudinary")
+LOCAL_PHOTO_DIR = Path(os.getenv("LOCAL_PHOTO_DIR", "local_photos"))
+# Admin API delete_resources accepts at most 100 public ids per call
+DELETE_CHUNK_SIZE = 100
+DELETE_CONCURRENCY = int(os.getenv("CLOUDINARY_DELETE_CONCURRENCY", "4"))
+
+class CloudinaryBackend:
+    def delete_many(self, public_ids: list[str]) -> dict[str, str]:
+        """Blocking; returns public_id -> "deleted" / "not_found" / ..."""
+        result = cloudinary.api.delete_resources(public_ids)
+        deleted = result.get("deleted", {})
+        return {public_id: deleted.get(public_id, "unknown") for public_id in public_ids}
+
+
+class LocalPhotoBackend:
+    """Stand-in for Cloudinary: a photo is a file named after its public id."""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def delete_many(self, public_ids: list[str]) -> dict[str, str]:
+        results = {}
+        for public_id in public_ids:
+            path = (self.root / public_id).resolve()
+            if self.root.resolve() not in path.parents:
+                results[public_id] = "invalid"
+            elif path.is_file():
+                path.unlink()
+                results[public_id] = "deleted"
+            else:
+                results[public_id] = "not_found"
+        return results
+
+
+def get_photo_backend():
+    if PHOTO_STORAGE_BACKEND == "local":
+        return LocalPhotoBackend(LOCAL_PHOTO_DIR)
+    return CloudinaryBackend()
+
+
+async def delete_photos(public_ids: list[str]) -> dict[str, str]:
+    """
+    Delete many photos with the backend's bulk call, in chunks of
+    DELETE_CHUNK_SIZE, at most DELETE_CONCURRENCY chunks at a time, each in a
+    worker thread. Returns public_id -> status ("deleted" on success); a chunk
+    whose call fails marks each of its ids "error: ...".
+    """
+    backend = get_photo_backend()
+    unique_ids = list(dict.fromkeys(public_ids))
+    chunks = [unique_ids[i:i + DELETE_CHUNK_SIZE] for i in range(0, len(unique_ids), DELETE_CHUNK_SIZE)]
+    limit = asyncio.Semaphore(DELETE_CONCURRENCY)
+
+    async def delete_chunk(chunk):
+        async with limit:
+            try:
+                return await asyncio.to_thread(backend.delete_many, chunk)
+            except Exception as e:
+                print(f"[ERROR] Bulk photo delete failed for {len(chunk)} ids: {e}")
+                return {public_id: f"error: {e}" for public_id in chunk}
+
+    results = {}
+    for chunk_results in await asyncio.gather(*[delete_chunk(chunk) for chunk in chunks]):
+        results.update(chunk_results)
+    return results
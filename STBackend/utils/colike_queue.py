@@ -0,0 +1,78 @@
+import asyncio
+import os
+
+from db import get_pool
+
+# Background pairing of likes into listing_colikes. The renter_on_listing
+# triggers (create_similarity.sql) only queue each like, unlike or deleted like
+# in listing_colike_jobs; this task works the queue off in batches of
+# COLIKE_BATCH_SIZE, each in its own transaction: recounting the swiped
+# listings' pairs and pruning the lists that grew happen here rather than
+# inside the swipe. A job recounts from the swipes rather than adding or
+# subtracting one, so a batch that is retried or sees a later swipe of the
+# same pair first can't skew the counts. The database lets one batch run at a
+# time, so any number of processes can poll.
+
+COLIKE_POLL_SECONDS = float(os.getenv("COLIKE_POLL_SECONDS", "5"))
+COLIKE_BATCH_SIZE = int(os.getenv("COLIKE_BATCH_SIZE", "100"))
+# a listing keeps its strongest COLIKE_MAX_NEIGHBORS neighbours, pruned once
+# its list is twice that long
+COLIKE_MAX_NEIGHBORS = int(os.getenv("COLIKE_MAX_NEIGHBORS", "50"))
+# how many of a swiper's most recent likes are paired with a swiped listing
+COLIKE_HISTORY_LIMIT = int(os.getenv("COLIKE_HISTORY_LIMIT", "200"))
+# breathing room between batches of a large backlog
+COLIKE_BATCH_PAUSE_SECONDS = float(os.getenv("COLIKE_BATCH_PAUSE_SECONDS", "0.1"))
+
+_worker: asyncio.Task | None = None
+_stats = {"batches": 0, "jobs": 0}
+
+
+def colike_queue_stats() -> dict:
+    return dict(_stats)
+
+
+async def process_colike_jobs() -> int:
+    """Work off the queued swipes batch by batch; how many were processed."""
+    processed = 0
+    pool = await get_pool()
+    while True:
+        # a connection per batch, so requests get the pool between batches
+        async with pool.acquire() as connection:
+            count = await connection.fetchval(
+                "SELECT process_listing_colike_jobs($1, $2, $3)",
+                COLIKE_BATCH_SIZE,
+                COLIKE_MAX_NEIGHBORS,
+                COLIKE_HISTORY_LIMIT,
+            )
+        processed += count
+        _stats["batches"] += bool(count)
+        _stats["jobs"] += count
+        if count < COLIKE_BATCH_SIZE:
+            return processed
+        await asyncio.sleep(COLIKE_BATCH_PAUSE_SECONDS)
+
+
+async def _run():
+    while True:
+        try:
+            await process_colike_jobs()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # the batch rolled back; its jobs are still queued
+            print(f"[ERROR] Co-like worker: {e}")
+        await asyncio.sleep(COLIKE_POLL_SECONDS)
+
+
+def start_colike_worker():
+    global _worker
+    if _worker is None and COLIKE_POLL_SECONDS > 0:
+        _worker = asyncio.create_task(_run())
+
+
+async def stop_colike_worker():
+    global _worker
+    if _worker is not None:
+        _worker.cancel()
+        await asyncio.gather(_worker, return_exceptions=True)
+        _worker = None
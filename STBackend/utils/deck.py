@@ -0,0 +1,351 @@
+import asyncio
+import json
+import math
+import os
+
+from fastapi.encoders import jsonable_encoder
+
+from db import get_pool
+from utils.matching import fetch_listing_matches, fetch_renter_matches
+
+# A deck is the ranked queue of cards shown to one swiper. It is scored once,
+# persisted in swipe_decks/swipe_deck_cards, served in score order by a
+# (score, target id) keyset cursor and shrinks as the owner swipes. When it runs
+# low it is topped up in the background, and a page that reaches its tail extends
+# it with the next-best candidates, so a swipe session costs one scoring pass per
+# MATCH_RESULT_LIMIT cards instead of one per fetch. Each pass ranks every
+# candidate in the radius (see utils/matching.py) and keeps the best of them.
+
+RENTER_DECK = "renter"  # a renter profile swiping on listings
+LISTING_DECK = "listing"  # a listing swiping on renter profiles
+
+DECK_TTL_SECONDS = int(os.getenv("DECK_TTL_SECONDS", "900"))
+DECK_REFILL_THRESHOLD = int(os.getenv("DECK_REFILL_THRESHOLD", "10"))
+
+_builders = {
+    RENTER_DECK: fetch_listing_matches,
+    LISTING_DECK: fetch_renter_matches,
+}
+
+# key in each card that identifies the swipe target
+_target_keys = {
+    RENTER_DECK: "id",
+    LISTING_DECK: "renter_id",
+}
+
+# swipe table of each deck's owner: (table, owner column, target column)
+_swipe_tables = {
+    RENTER_DECK: ("renter_on_listing", "renter_profile_id", "listing_id"),
+    LISTING_DECK: ("listing_on_renter", "listing_id", "renter_profile_id"),
+}
+
+_refills: dict[tuple[str, int], asyncio.Task] = {}
+
+
+async def _lock_deck(connection, kind: str, owner_id: int, shared: bool = False):
+    """
+    Transaction-level lock on one deck: builders take it exclusively, pop_cards
+    shared, so a swipe's pop waits for a build in flight (and vice versa).
+    """
+    await connection.execute(
+        f"SELECT pg_advisory_xact_lock{'_shared' if shared else ''}"
+        "(hashtextextended($1 || ':' || $2::bigint::text, 0))",
+        kind,
+        owner_id,
+    )
+
+
+async def _live_deck(connection, kind: str, owner_id: int):
+    """The unexpired swipe_decks row of a deck, or None."""
+    return await connection.fetchrow(
+        """
+        SELECT radius_km, exhausted, floor_score FROM swipe_decks
+        WHERE deck_kind = $1 AND owner_id = $2 AND expires_at > now()
+        """,
+        kind,
+        owner_id,
+    )
+
+
+async def _fill_deck(
+    connection,
+    kind: str,
+    owner_id: int,
+    replace: bool,
+    radius_km: float | None = None,
+    after: tuple[float, int] | None = None,
+):
+    """
+    Score candidates and store them as cards. With replace=True the old cards
+    are dropped (fresh build for radius_km); otherwise only unseen targets are
+    appended, using the deck's own radius. `after` starts the scoring pass past
+    that (score, id) keyset, to extend a deck from its tail.
+    """
+    async with connection.transaction():
+        # serialize builders of the same deck across requests and workers
+        await _lock_deck(connection, kind, owner_id)
+        live = await _live_deck(connection, kind, owner_id)
+        if replace and live and live["radius_km"] == radius_km:
+            return  # someone else built it while we waited for the lock
+        if not replace:
+            if not live:
+                return  # expired or dropped meanwhile; the next page rebuilds it
+            radius_km = live["radius_km"]
+
+        matches, last = await _builders[kind](connection, owner_id, radius_km, after)
+
+        last_seq = await connection.fetchval(
+            """
+            SELECT COALESCE(MAX(seq), 0) FROM swipe_deck_cards
+            WHERE deck_kind = $1 AND owner_id = $2
+            """,
+            kind,
+            owner_id,
+        )
+        if replace:
+            await connection.execute(
+                "DELETE FROM swipe_deck_cards WHERE deck_kind = $1 AND owner_id = $2",
+                kind,
+                owner_id,
+            )
+            seen = set()
+        else:
+            rows = await connection.fetch(
+                "SELECT target_id FROM swipe_deck_cards WHERE deck_kind = $1 AND owner_id = $2",
+                kind,
+                owner_id,
+            )
+            seen = {row["target_id"] for row in rows}
+
+        target_key = _target_keys[kind]
+        cards = [card for card in matches if card[target_key] not in seen]
+        # Nothing to extend with once the last candidates in the radius are in,
+        # or when nothing unseen ranks past the tail: re-scoring on every page
+        # would find nothing new until the owner swipes (and a refill
+        # recomputes this).
+        exhausted = last or (after is not None and not cards)
+
+        # Appended cards are ranked after every card the deck has held, or a
+        # client whose cursor is past a better-scoring newcomer would never
+        # see it. The card keeps its real score; the column only orders pages.
+        # cards come best first, so each one only has to go below the last
+        floor = None if replace else live["floor_score"]
+        positions = []
+        for card in cards:
+            position = card["score"]
+            if floor is not None:
+                position = min(position, math.nextafter(floor, -math.inf))
+            positions.append(position)
+            floor = position
+
+        if replace:
+            await connection.execute(
+                """
+                INSERT INTO swipe_decks (deck_kind, owner_id, built_at, expires_at, radius_km, exhausted, floor_score)
+                VALUES ($1, $2, now(), now() + $3::int * interval '1 second', $4, $5, $6)
+                ON CONFLICT (deck_kind, owner_id) DO UPDATE
+                SET built_at = EXCLUDED.built_at,
+                    expires_at = EXCLUDED.expires_at,
+                    radius_km = EXCLUDED.radius_km,
+                    exhausted = EXCLUDED.exhausted,
+                    floor_score = EXCLUDED.floor_score
+                """,
+                kind,
+                owner_id,
+                DECK_TTL_SECONDS,
+                radius_km,
+                exhausted,
+                floor,
+            )
+        else:
+            # an append keeps the deck's expiry, so a deck in use is still
+            # rebuilt from fresh cards every DECK_TTL_SECONDS
+            await connection.execute(
+                """
+                UPDATE swipe_decks SET exhausted = $3, floor_score = $4
+                WHERE deck_kind = $1 AND owner_id = $2
+                """,
+                kind,
+                owner_id,
+                exhausted,
+                floor,
+            )
+        if not cards:
+            return
+
+        # targets swiped since they were scored stay out
+        swipe_table, owner_column, target_column = _swipe_tables[kind]
+        await connection.execute(
+            f"""
+            INSERT INTO swipe_deck_cards (deck_kind, owner_id, seq, target_id, score, card)
+            SELECT $1, $2, c.seq, c.target_id, c.score, c.card::jsonb
+            FROM unnest($3::bigint[], $4::bigint[], $5::float8[], $6::text[])
+                AS c(seq, target_id, score, card)
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {swipe_table} s
+                WHERE s.{owner_column} = $2 AND s.{target_column} = c.target_id
+            )
+            """,
+            kind,
+            owner_id,
+            [last_seq + i for i in range(1, len(cards) + 1)],
+            [card[target_key] for card in cards],
+            positions,
+            [json.dumps(jsonable_encoder(card)) for card in cards],
+        )
+
+
+async def _read_page(connection, kind: str, owner_id: int, after, limit: int):
+    after_score, after_id = after if after is not None else (None, None)
+    return await connection.fetch(
+        """
+        SELECT target_id, score, card FROM swipe_deck_cards
+        WHERE deck_kind = $1 AND owner_id = $2
+          AND ($3::float8 IS NULL OR score < $3 OR (score = $3 AND target_id > $4))
+        ORDER BY score DESC, target_id
+        LIMIT $5
+        """,
+        kind,
+        owner_id,
+        after_score,
+        after_id,
+        limit,
+    )
+
+
+async def get_deck_page(
+    kind: str,
+    owner_id: int,
+    radius_km: float,
+    after: tuple[float, int] | None,
+    limit: int,
+):
+    """
+    Return (cards, next_cursor) for the page after the (score, target id)
+    keyset `after`, building the deck first if it is missing, expired or was
+    built for another radius. next_cursor is None on the last page.
+    """
+    pool = await get_pool()
+    async with pool.acquire() as connection:
+        live = await _live_deck(connection, kind, owner_id)
+        if not live or live["radius_km"] != radius_km:
+            await _fill_deck(connection, kind, owner_id, replace=True, radius_km=radius_km)
+            live = await _live_deck(connection, kind, owner_id)
+
+        rows = await _read_page(connection, kind, owner_id, after, limit)
+        if len(rows) < limit and live and not live["exhausted"]:
+            # reached the tail of the deck: score the candidates past it
+            # by the tail card's real score, not its (possibly lowered) rank
+            tail = rows[-1] if rows else None
+            tail = (json.loads(tail["card"])["score"], tail["target_id"]) if tail else after
+            await _fill_deck(connection, kind, owner_id, replace=False, after=tail)
+            rows = await _read_page(connection, kind, owner_id, after, limit)
+
+    cards = [json.loads(row["card"]) for row in rows]
+    next_cursor = (
+        {"after_score": rows[-1]["score"], "after_id": rows[-1]["target_id"]}
+        if len(rows) == limit
+        else None
+    )
+    return cards, next_cursor
+
+
+async def pop_cards(connection, kind: str, owner_id: int, target_ids: list[int]):
+    """
+    Remove swiped targets from a deck and schedule a background refill when
+    the remaining queue drops below DECK_REFILL_THRESHOLD. Call it once the
+    swipes are committed: the refill only starts after this commits, and a
+    build already in flight is waited for, so neither can put the swiped
+    targets back.
+    """
+    async with connection.transaction():
+        await _lock_deck(connection, kind, owner_id, shared=True)
+        remaining = await connection.fetchval(
+            """
+            WITH popped AS (
+                DELETE FROM swipe_deck_cards
+                WHERE deck_kind = $1 AND owner_id = $2 AND target_id = ANY($3::bigint[])
+                RETURNING 1
+            )
+            SELECT (SELECT COUNT(*) FROM swipe_deck_cards c
+                    WHERE c.deck_kind = $1 AND c.owner_id = $2)
+                 - (SELECT COUNT(*) FROM popped)
+            FROM swipe_decks d
+            WHERE d.deck_kind = $1 AND d.owner_id = $2 AND d.expires_at > now()
+            """,
+            kind,
+            owner_id,
+            target_ids,
+        )
+    # no live deck: the next page request builds a fresh one anyway
+    if remaining is not None and remaining < DECK_REFILL_THRESHOLD:
+        schedule_refill(kind, owner_id)
+
+
+async def invalidate_deck(connection, kind: str, owner_id: int):
+    """Drop a deck, e.g. after the owner's preferences changed."""
+    await connection.execute(
+        "DELETE FROM swipe_decks WHERE deck_kind = $1 AND owner_id = $2",
+        kind,
+        owner_id,
+    )
+
+
+async def invalidate_decks(connection, kind: str, owner_ids: list[int]):
+    """invalidate_deck() for many owners in one statement."""
+    await connection.execute(
+        "DELETE FROM swipe_decks WHERE deck_kind = $1 AND owner_id = ANY($2::bigint[])",
+        kind,
+        owner_ids,
+    )
+
+
+async def drop_target_cards(connection, kind: str, target_ids: list[int]):
+    """
+    Remove the targets' cards from every deck of `kind` holding them, e.g. once
+    a target is deactivated or its card contents changed. The decks keep their
+    place; an active target comes back, freshly scored, with their next build.
+    """
+    await connection.execute(
+        "DELETE FROM swipe_deck_cards WHERE deck_kind = $1 AND target_id = ANY($2::bigint[])",
+        kind,
+        target_ids,
+    )
+
+
+async def purge_expired_decks(connection, limit: int) -> int:
+    """Delete up to `limit` expired decks (their cards cascade); how many."""
+    status = await connection.execute(
+        """
+        DELETE FROM swipe_decks d
+        USING (
+            SELECT deck_kind, owner_id FROM swipe_decks
+            WHERE expires_at <= now()
+            LIMIT $1
+        ) doomed
+        WHERE d.deck_kind = doomed.deck_kind
+          AND d.owner_id = doomed.owner_id
+          AND d.expires_at <= now()
+        """,
+        limit,
+    )
+    return int(status.split()[-1])
+
+
+async def _refill(kind: str, owner_id: int):
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as connection:
+            await _fill_deck(connection, kind, owner_id, replace=False)
+    except Exception as e:
+        print(f"[ERROR] refilling {kind} deck {owner_id} failed: {e}")
+
+
+def schedule_refill(kind: str, owner_id: int):
+    """Top up a deck in the background; at most one refill per deck at a time."""
+    key = (kind, owner_id)
+    if key in _refills:
+        return
+    task = asyncio.create_task(_refill(kind, owner_id))
+    _refills[key] = task
+    task.add_done_callback(lambda _: _refills.pop(key, None))
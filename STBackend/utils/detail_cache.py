@@ -0,0 +1,117 @@
+import os
+
+from utils.lru import LRUCache
+from utils.singleflight import SingleFlight
+
+# Read-through cache for the listing and renter profile detail payloads.
+# Routes that change a listing or profile call invalidate_detail() after
+# their write commits; the TTL bounds staleness for writes that don't go
+# through those routes (e.g. a user renaming themselves).
+LISTING_DETAIL = "listing"
+RENTER_DETAIL = "renter"
+DETAIL_CACHE_SIZE = int(os.getenv("DETAIL_CACHE_SIZE", "2000"))
+DETAIL_CACHE_TTL_SECONDS = float(os.getenv("DETAIL_CACHE_TTL_SECONDS", "300"))
+
+_caches = {
+    kind: LRUCache(maxsize=DETAIL_CACHE_SIZE, ttl=DETAIL_CACHE_TTL_SECONDS)
+    for kind in (LISTING_DETAIL, RENTER_DETAIL)
+}
+_flights = {kind: SingleFlight() for kind in _caches}
+# key -> [loads in flight, generation] for keys being loaded right now. An
+# invalidation bumps the generation, so a load that started before a write
+# doesn't put the old row back into the cache. The entry goes away with the
+# last load, so this only ever holds keys in flight.
+_loading = {kind: {} for kind in _caches}
+
+
+def _start_loads(kind: str, keys) -> dict:
+    """Register loads of `keys`; their current generations."""
+    generations = {}
+    for key in keys:
+        entry = _loading[kind].setdefault(key, [0, 0])
+        entry[0] += 1
+        generations[key] = entry[1]
+    return generations
+
+
+def _finish_loads(kind: str, generations: dict) -> set:
+    """Unregister loads started by _start_loads(); the keys not invalidated meanwhile."""
+    current = set()
+    for key, generation in generations.items():
+        entry = _loading[kind][key]
+        if entry[1] == generation:
+            current.add(key)
+        entry[0] -= 1
+        if not entry[0]:
+            del _loading[kind][key]
+    return current
+
+
+async def get_detail(kind: str, key: int, loader):
+    """
+    Cached payload for `key`, calling `loader()` on a miss. Concurrent misses
+    for the same key share one load. A None result (not found) isn't cached.
+    """
+    cache = _caches[kind]
+    value = cache.get(key)
+    if value is not None:
+        return dict(value)
+
+    async def load():
+        generations = _start_loads(kind, [key])
+        try:
+            loaded = await loader()
+        finally:
+            current = _finish_loads(kind, generations)
+        if loaded is not None and key in current:
+            cache.set(key, loaded)
+        return loaded
+
+    value = await _flights[kind].do(key, load)
+    return dict(value) if value is not None else None
+
+
+async def get_details(kind: str, keys: list[int], bulk_loader, cache_loaded: bool = True) -> dict:
+    """
+    Cached payloads for many keys at once: hits come from the cache and all
+    misses go to `bulk_loader(missing_keys)` together, which returns a dict
+    of key -> payload (absent keys are not found). Returns the same mapping
+    for every key that exists. Pass cache_loaded=False when the loader
+    returns partial payloads (a field projection) that mustn't be cached.
+    """
+    cache = _caches[kind]
+    found = {}
+    missing = []
+    for key in keys:
+        value = cache.get(key)
+        if value is not None:
+            found[key] = dict(value)
+        else:
+            missing.append(key)
+
+    if missing:
+        generations = _start_loads(kind, missing)
+        try:
+            loaded = await bulk_loader(missing)
+        finally:
+            current = _finish_loads(kind, generations)
+        for key, value in loaded.items():
+            if cache_loaded and key in current:
+                cache.set(key, value)
+            found[key] = dict(value)
+    return found
+
+
+def invalidate_detail(kind: str, key: int):
+    entry = _loading[kind].get(key)
+    if entry is not None:
+        entry[1] += 1
+    _caches[kind].pop(key)
+    _flights[kind].forget(key)
+
+
+def detail_cache_stats() -> dict:
+    return {
+        kind: {**cache.stats(), "loads": _flights[kind].calls, "coalesced": _flights[kind].coalesced}
+        for kind, cache in _caches.items()
+    }
@@ -0,0 +1,171 @@
+from db import hot_fetch, register_hot_statement
+
+# Listing and renter profile detail payloads for any number of ids in one
+# round trip. Rows come back in the order of the ids passed in; ids that
+# don't exist are skipped. `fields` narrows the select list (id is always
+# included), so list screens can skip description/photos/amenities.
+# A row whose address is still being geocoded has no location columns yet;
+# location_status says whether it is 'pending' or 'failed' (see utils/geocode_queue.py).
+
+
+def _location_status(alias: str, kind: str) -> str:
+    return f"""CASE
+            WHEN {alias}.pending_address IS NULL THEN 'resolved'
+            WHEN EXISTS (
+                SELECT 1 FROM geocode_jobs j
+                WHERE j.target_kind = '{kind}' AND j.target_id = {alias}.id
+                  AND j.raw_address = {alias}.pending_address AND j.status = 'failed'
+            ) THEN 'failed'
+            ELSE 'pending'
+        END"""
+
+
+LISTING_COLUMNS = {
+    "id": "l.id",
+    "user_id": "l.user_id",
+    "first_name": "u.first_name",
+    "last_name": "u.last_name",
+    "email": "u.email",
+    "profile_photo": "u.profile_photo",
+    "locations_id": "l.locations_id",
+    "is_active": "l.is_active",
+    "start_date": "l.start_date",
+    "end_date": "l.end_date",
+    "target_gender": "l.target_gender",
+    "asking_price": "l.asking_price",
+    "num_bedrooms": "l.num_bedrooms",
+    "num_bathrooms": "l.num_bathrooms",
+    "pet_friendly": "l.pet_friendly",
+    "utilities_incl": "l.utilities_incl",
+    "description": "l.description",
+    "address_string": "loc.address_string",
+    "latitude": "loc.latitude",
+    "longitude": "loc.longitude",
+    "pending_address": "l.pending_address",
+    "location_status": _location_status("l", "listing"),
+    "building_type_id": "bt.id",
+    "building_type": "bt.type",
+    "photos": """COALESCE(
+            (SELECT json_agg(json_build_object('url', p.url, 'label', p.label))
+            FROM photos p
+            WHERE p.listing_id = l.id), '[]'
+        )""",
+    "amenities": """COALESCE(
+            (SELECT json_agg(json_build_object('id', a.id, 'name', a.name))
+            FROM listing_amenities la
+            JOIN amenities a ON la.amenity_id = a.id
+            WHERE la.listing_id = l.id
+            ), '[]'
+        )""",
+}
+
+LISTING_FROM = """
+    FROM unnest($1::bigint[]) WITH ORDINALITY AS ids(id, ord)
+    JOIN listings l ON l.id = ids.id
+    JOIN users u ON l.user_id = u.id
+    LEFT JOIN locations loc ON l.locations_id = loc.id
+    LEFT JOIN building_types bt ON l.building_type_id = bt.id
+    ORDER BY ids.ord
+"""
+
+RENTER_COLUMNS = {
+    "id": "rp.id",
+    "user_id": "rp.user_id",
+    "first_name": "u.first_name",
+    "last_name": "u.last_name",
+    "email": "u.email",
+    "profile_photo": "u.profile_photo",
+    "is_active": "rp.is_active",
+    "start_date": "rp.start_date",
+    "end_date": "rp.end_date",
+    "age": "rp.age",
+    "gender": "rp.gender",
+    "budget": "rp.budget",
+    "num_bedrooms": "rp.num_bedrooms",
+    "num_bathrooms": "rp.num_bathrooms",
+    "has_pet": "rp.has_pet",
+    "bio": "rp.bio",
+    "address_string": "loc.address_string",
+    "latitude": "loc.latitude",
+    "longitude": "loc.longitude",
+    "pending_address": "rp.pending_address",
+    "location_status": _location_status("rp", "renter"),
+    "building_type": "bt.type",
+}
+
+RENTER_FROM = """
+    FROM unnest($1::bigint[]) WITH ORDINALITY AS ids(id, ord)
+    JOIN renter_profiles rp ON rp.id = ids.id
+    JOIN users u ON rp.user_id = u.id
+    LEFT JOIN locations loc ON rp.locations_id = loc.id
+    LEFT JOIN building_types bt ON rp.building_type_id = bt.id
+    ORDER BY ids.ord
+"""
+
+
+def _details_query(columns: dict, from_clause: str, fields=None) -> str:
+    names = list(columns) if fields is None else ["id"] + [f for f in fields if f != "id"]
+    select_list = ",\n        ".join(
+        expr if expr.endswith("." + name) else f"{expr} AS {name}"
+        for name, expr in ((name, columns[name]) for name in names)
+    )
+    return f"SELECT\n        {select_list}{from_clause}"
+
+
+BULK_DETAILS_MAX_IDS = 100
+
+
+def parse_ids(ids: str) -> list[int]:
+    """Comma-separated id list -> distinct ids in request order; ValueError if malformed or too long."""
+    try:
+        parsed = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+    except ValueError:
+        raise ValueError("ids must be a comma-separated list of integers")
+    if not parsed:
+        raise ValueError("ids must not be empty")
+    if len(parsed) > BULK_DETAILS_MAX_IDS:
+        raise ValueError(f"At most {BULK_DETAILS_MAX_IDS} ids per request")
+    return parsed
+
+
+def project(row: dict, fields) -> dict:
+    if fields is None:
+        return row
+    return {name: row[name] for name in ["id"] + [f for f in fields if f != "id"]}
+
+
+def parse_fields(fields: str | None, columns: dict):
+    """Comma-separated field list -> list of names, None for all; ValueError on unknown names."""
+    if not fields:
+        return None
+    names = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [name for name in names if name not in columns]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+
+LISTING_DETAILS_QUERY = _details_query(LISTING_COLUMNS, LISTING_FROM)
+RENTER_DETAILS_QUERY = _details_query(RENTER_COLUMNS, RENTER_FROM)
+LISTING_DETAILS = register_hot_statement("listing_details", LISTING_DETAILS_QUERY)
+RENTER_DETAILS = register_hot_statement("renter_details", RENTER_DETAILS_QUERY)
+
+
+async def fetch_listing_details(connection, listing_ids: list[int], fields=None) -> list[dict]:
+    if not listing_ids:
+        return []
+    if fields is None:
+        rows = await hot_fetch(connection, LISTING_DETAILS, list(listing_ids))
+    else:
+        rows = await connection.fetch(_details_query(LISTING_COLUMNS, LISTING_FROM, fields), list(listing_ids))
+    return [dict(row) for row in rows]
+
+
+async def fetch_renter_details(connection, renter_ids: list[int], fields=None) -> list[dict]:
+    if not renter_ids:
+        return []
+    if fields is None:
+        rows = await hot_fetch(connection, RENTER_DETAILS, list(renter_ids))
+    else:
+        rows = await connection.fetch(_details_query(RENTER_COLUMNS, RENTER_FROM, fields), list(renter_ids))
+    return [dict(row) for row in rows]
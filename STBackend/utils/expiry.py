@@ -0,0 +1,210 @@
+import asyncio
+import os
+
+from db import get_pool
+from utils.deck import LISTING_DECK, RENTER_DECK, drop_target_cards, invalidate_decks, purge_expired_decks
+from utils.detail_cache import LISTING_DETAIL, RENTER_DETAIL, invalidate_detail
+
+# Background sweeper that deactivates listings and renter profiles whose
+# end_date has passed, so they drop out of the candidate scans and decks.
+# Rows are claimed and deactivated EXPIRY_BATCH_SIZE at a time in one short
+# transaction (UPDATE ... RETURNING id); rows locked by a request in flight are
+# skipped until the next sweep, so the sweeper never waits on the app. The
+# deactivation triggers (deactivate_functions.sql) drop the batch's matches but
+# leave its swipes to the sweeper: they queue the rows in swipe_cleanup_jobs,
+# in the same transaction, and the sweeper then deletes the swipes of exactly
+# the queued rows, at most EXPIRY_SWIPE_DELETE_LIMIT per statement, since a few
+# popular rows can have far more swipes than the batch has rows. A row leaves
+# the queue once its swipes are gone, so a sweep that fails or a process that
+# dies midway leaves the rest to the next sweep. A backlog is therefore worked
+# off in bounded chunks rather than one long transaction holding row locks on
+# the swipe tables, and a row that stays active keeps its swipes. Expired swipe decks are purged at the end of each sweep, the same
+# EXPIRY_BATCH_SIZE at a time.
+
+EXPIRY_SWEEP_INTERVAL_SECONDS = float(os.getenv("EXPIRY_SWEEP_INTERVAL_SECONDS", "3600"))
+EXPIRY_BATCH_SIZE = int(os.getenv("EXPIRY_BATCH_SIZE", "200"))
+EXPIRY_SWIPE_DELETE_LIMIT = int(os.getenv("EXPIRY_SWIPE_DELETE_LIMIT", "5000"))
+# breathing room between batches of a large backlog
+EXPIRY_BATCH_PAUSE_SECONDS = float(os.getenv("EXPIRY_BATCH_PAUSE_SECONDS", "0.1"))
+
+# table -> (deck kind of its rows' own decks, detail cache kind, column of the
+# swipe tables that refers to it, deck kind holding its rows as cards, its
+# target_kind in swipe_cleanup_jobs)
+_targets = {
+    "listings": (LISTING_DECK, LISTING_DETAIL, "listing_id", RENTER_DECK, "listing"),
+    "renter_profiles": (RENTER_DECK, RENTER_DETAIL, "renter_profile_id", LISTING_DECK, "renter"),
+}
+
+_SWIPE_TABLES = ("renter_on_listing", "listing_on_renter")
+
+_sweeper: asyncio.Task | None = None
+_stats = {
+    "sweeps": 0,
+    "batches": 0,
+    "listings_expired": 0,
+    "renter_profiles_expired": 0,
+    "swipes_deleted": 0,
+    "decks_purged": 0,
+}
+
+
+def expiry_stats() -> dict:
+    return dict(_stats)
+
+
+async def _delete_swipes(connection, table: str, ids: list[int]):
+    """
+    Delete the swipes on and by the rows `ids` of `table`, each statement
+    (and so its row locks) capped at EXPIRY_SWIPE_DELETE_LIMIT swipes. The
+    swipe tables are hash-partitioned, so rows are picked by key, not ctid.
+    """
+    _, _, column, _, _ = _targets[table]
+    for swipe_table in _SWIPE_TABLES:
+        while True:
+            status = await connection.execute(
+                f"""
+                DELETE FROM {swipe_table} s
+                USING (
+                    SELECT renter_profile_id, listing_id FROM {swipe_table}
+                    WHERE {column} = ANY($1::bigint[])
+                    LIMIT $2
+                ) doomed
+                WHERE s.renter_profile_id = doomed.renter_profile_id
+                  AND s.listing_id = doomed.listing_id
+                """,
+                ids,
+                EXPIRY_SWIPE_DELETE_LIMIT,
+            )
+            deleted = int(status.split()[-1])
+            _stats["swipes_deleted"] += deleted
+            if deleted < EXPIRY_SWIPE_DELETE_LIMIT:
+                break
+
+
+async def _expire_batch(connection, table: str) -> list[int]:
+    """
+    Deactivate up to EXPIRY_BATCH_SIZE active rows of `table` past their
+    end_date, skipping rows a request has locked; their ids.
+    """
+    deck_kind, _, _, card_kind, _ = _targets[table]
+    async with connection.transaction():
+        # the triggers queue the rows for _clean_up_swipes instead
+        await connection.execute(
+            "SELECT set_config('subletswipe.defer_swipe_cleanup', 'on', true)"
+        )
+        rows = await connection.fetch(
+            f"""
+            WITH due AS (
+                SELECT id FROM {table}
+                WHERE is_active AND end_date < current_date
+                ORDER BY end_date, id
+                LIMIT $1
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE {table} t SET is_active = FALSE
+            FROM due
+            WHERE t.id = due.id
+            RETURNING t.id
+            """,
+            EXPIRY_BATCH_SIZE,
+        )
+        expired = [row["id"] for row in rows]
+        if expired:
+            await invalidate_decks(connection, deck_kind, expired)
+            await drop_target_cards(connection, card_kind, expired)
+    return expired
+
+
+async def _clean_up_swipes(connection, table: str):
+    """
+    _delete_swipes() for the rows of `table` queued in swipe_cleanup_jobs,
+    EXPIRY_BATCH_SIZE at a time; each leaves the queue once its swipes are gone.
+    """
+    kind = _targets[table][4]
+    while True:
+        queued = await connection.fetch(
+            """
+            SELECT target_id FROM swipe_cleanup_jobs
+            WHERE target_kind = $1
+            ORDER BY target_id
+            LIMIT $2
+            """,
+            kind,
+            EXPIRY_BATCH_SIZE,
+        )
+        ids = [row["target_id"] for row in queued]
+        if not ids:
+            return
+        # a row reactivated since keeps whatever was swiped in between
+        rows = await connection.fetch(
+            f"SELECT id FROM {table} WHERE id = ANY($1::bigint[]) AND NOT is_active",
+            ids,
+        )
+        if rows:
+            await _delete_swipes(connection, table, [row["id"] for row in rows])
+        await connection.execute(
+            "DELETE FROM swipe_cleanup_jobs WHERE target_kind = $1 AND target_id = ANY($2::bigint[])",
+            kind,
+            ids,
+        )
+        if len(ids) < EXPIRY_BATCH_SIZE:
+            return
+
+
+async def sweep_expired() -> dict:
+    """Expire everything that is due, batch by batch; rows expired per table."""
+    expired = {}
+    pool = await get_pool()
+    for table, (_, detail_kind, _, _, _) in _targets.items():
+        expired[table] = 0
+        while True:
+            # a connection per batch, so requests get the pool between batches
+            async with pool.acquire() as connection:
+                ids = await _expire_batch(connection, table)
+                for row_id in ids:
+                    invalidate_detail(detail_kind, row_id)
+                # this batch's rows, and any a failed sweep left queued
+                await _clean_up_swipes(connection, table)
+            expired[table] += len(ids)
+            _stats["batches"] += bool(ids)
+            _stats[f"{table}_expired"] += len(ids)
+            # a short batch: nothing else is due, or the rest is locked by requests
+            if len(ids) < EXPIRY_BATCH_SIZE:
+                break
+            await asyncio.sleep(EXPIRY_BATCH_PAUSE_SECONDS)
+    while True:
+        async with pool.acquire() as connection:
+            purged = await purge_expired_decks(connection, EXPIRY_BATCH_SIZE)
+        _stats["decks_purged"] += purged
+        if purged < EXPIRY_BATCH_SIZE:
+            break
+        await asyncio.sleep(EXPIRY_BATCH_PAUSE_SECONDS)
+    _stats["sweeps"] += 1
+    return expired
+
+
+async def _run():
+    while True:
+        try:
+            expired = await sweep_expired()
+            if any(expired.values()):
+                print(f"[INFO] Expired {expired['listings']} listings, {expired['renter_profiles']} renter profiles")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[ERROR] Expiry sweep failed: {e}")
+        await asyncio.sleep(EXPIRY_SWEEP_INTERVAL_SECONDS)
+
+
+def start_expiry_sweeper():
+    global _sweeper
+    if _sweeper is None and EXPIRY_SWEEP_INTERVAL_SECONDS > 0:
+        _sweeper = asyncio.create_task(_run())
+
+
+async def stop_expiry_sweeper():
+    global _sweeper
+    if _sweeper is not None:
+        _sweeper.cancel()
+        await asyncio.gather(_sweeper, return_exceptions=True)
+        _sweeper = None
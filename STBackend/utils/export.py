@@ -0,0 +1,83 @@
+import json
+import os
+from datetime import date
+from decimal import Decimal
+
+from utils.matching import LISTING_CANDIDATES_EXPORT_QUERY, RENTER_CANDIDATES_EXPORT_QUERY
+
+# Streaming export of every scored pair, for admin/analytics consumers. Rows
+# are scored in the query, by the same expression the ranked pages use, read
+# through a server-side cursor EXPORT_CHUNK_SIZE at a time and written out as
+# NDJSON, so memory use doesn't grow with the size of the result, and the
+# first lines go out before the query has finished.
+# Lines come in no particular order: ranking (or even sorting by distance)
+# would need the whole result first.
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+_REGION_LISTINGS_QUERY = """
+SELECT l.id
+FROM locations loc
+JOIN listings l ON l.locations_id = loc.id
+WHERE point(loc.longitude::float8, loc.latitude::float8) <@ bbox_around($1, $2, $3)
+  AND haversine_km($1, $2, loc.latitude::float8, loc.longitude::float8) < $3
+  AND l.is_active
+ORDER BY l.id
+"""
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _ndjson(records) -> str:
+    return "".join(json.dumps(record, default=_json_default) + "\n" for record in records)
+
+
+async def _scored_chunks(connection, query, owner_id, radius_km, owner_key, target_key):
+    cursor = await connection.cursor(query, owner_id, radius_km)
+    while True:
+        rows = await cursor.fetch(EXPORT_CHUNK_SIZE)
+        if not rows:
+            return
+        records = []
+        for row in rows:
+            record = {owner_key: owner_id, target_key: row["id"], "score": row["score"]}
+            record.update((name, value) for name, value in row.items() if name not in ("id", "score"))
+            records.append(record)
+        yield _ndjson(records)
+
+
+async def stream_listing_matches(connection, renter_id: int, radius_km: float):
+    """NDJSON chunks of every listing candidate of a renter with its score."""
+    async for chunk in _scored_chunks(
+        connection, LISTING_CANDIDATES_EXPORT_QUERY, renter_id, radius_km, "renter_id", "listing_id"
+    ):
+        yield chunk
+
+
+async def stream_renter_matches(connection, listing_id: int, radius_km: float):
+    """NDJSON chunks of every renter candidate of a listing with its score."""
+    async for chunk in _scored_chunks(
+        connection, RENTER_CANDIDATES_EXPORT_QUERY, listing_id, radius_km, "listing_id", "renter_id"
+    ):
+        yield chunk
+
+
+async def stream_region_matches(connection, lat: float, lng: float, region_km: float, radius_km: float):
+    """
+    NDJSON chunks of the renter candidates of every active listing within
+    region_km of (lat, lng). Listings are walked with their own cursor, so
+    the region's listing ids aren't held in memory either.
+    """
+    listings = await connection.cursor(_REGION_LISTINGS_QUERY, lat, lng, region_km)
+    while True:
+        rows = await listings.fetch(EXPORT_CHUNK_SIZE)
+        if not rows:
+            return
+        for row in rows:
+            async for chunk in stream_renter_matches(connection, row["id"], radius_km):
+                yield chunk
@@ -0,0 +1,228 @@
+import asyncio
+import os
+
+from db import get_pool
+from utils.deck import LISTING_DECK, RENTER_DECK, invalidate_deck
+from utils.detail_cache import LISTING_DETAIL, RENTER_DETAIL, invalidate_detail
+from utils.location_helper import (
+    AddressNotFound,
+    cached_place,
+    insert_location_if_not_exists,
+    resolve_address,
+)
+
+# Background geocoding. Creating a listing or renter profile, or moving a
+# profile, at an address that isn't cached yet saves the row with the raw
+# address in pending_address and queues a geocode_jobs row in the same
+# transaction. GEOCODE_WORKERS tasks per process claim due jobs (FOR UPDATE
+# SKIP LOCKED, so several processes can share the queue), call the geocoder
+# without holding a pool connection, then attach locations_id. Failed calls
+# are retried with exponential backoff; a job whose worker died is claimed
+# again once its lease runs out.
+
+GEOCODE_WORKERS = int(os.getenv("GEOCODE_WORKERS", "4"))
+GEOCODE_MAX_ATTEMPTS = int(os.getenv("GEOCODE_MAX_ATTEMPTS", "5"))
+GEOCODE_RETRY_BASE_SECONDS = float(os.getenv("GEOCODE_RETRY_BASE_SECONDS", "5"))
+GEOCODE_LEASE_SECONDS = float(os.getenv("GEOCODE_LEASE_SECONDS", "60"))
+GEOCODE_POLL_SECONDS = float(os.getenv("GEOCODE_POLL_SECONDS", "5"))
+
+LISTING_LOCATION = "listing"
+RENTER_LOCATION = "renter"
+
+# target kind -> (table, detail cache kind, deck kind of the target's own deck)
+_targets = {
+    LISTING_LOCATION: ("listings", LISTING_DETAIL, LISTING_DECK),
+    RENTER_LOCATION: ("renter_profiles", RENTER_DETAIL, RENTER_DECK),
+}
+
+_workers: list[asyncio.Task] = []
+_wake = asyncio.Event()
+_stats = {"claimed": 0, "resolved": 0, "retried": 0, "failed": 0, "stale": 0}
+
+
+async def address_columns(connection, raw_address: str) -> dict:
+    """
+    locations_id/pending_address values for a row moving to raw_address: the
+    location right away when the address was geocoded before, otherwise the
+    address is left pending for enqueue_geocode(). Never calls the geocoder.
+    """
+    place_data = await cached_place(connection, raw_address)
+    if place_data is None:
+        return {"pending_address": raw_address}
+    location_id = await insert_location_if_not_exists(connection, place_data)
+    return {"locations_id": location_id, "pending_address": None}
+
+
+async def enqueue_geocode(connection, kind: str, target_id: int, raw_address: str):
+    """
+    Queue a geocode for a row just saved with pending_address = raw_address,
+    replacing any job still waiting for that row. Run it in the transaction
+    that saved the row and call wake_geocode_workers() after it commits.
+    """
+    await connection.execute(
+        """
+        WITH replaced AS (
+            DELETE FROM geocode_jobs
+            WHERE target_kind = $1 AND target_id = $2 AND status <> 'running'
+        )
+        INSERT INTO geocode_jobs (target_kind, target_id, raw_address)
+        VALUES ($1, $2, $3)
+        """,
+        kind,
+        target_id,
+        raw_address,
+    )
+
+
+async def cancel_geocode(connection, kind: str, target_id: int):
+    """Drop waiting jobs for a row whose location was just set directly."""
+    await connection.execute(
+        "DELETE FROM geocode_jobs WHERE target_kind = $1 AND target_id = $2 AND status <> 'running'",
+        kind,
+        target_id,
+    )
+
+
+def wake_geocode_workers():
+    _wake.set()
+
+
+def geocode_queue_stats() -> dict:
+    return {"workers": len(_workers), **_stats}
+
+
+async def _claim():
+    """
+    Take the most overdue job, leasing it for GEOCODE_LEASE_SECONDS. A job
+    whose lease ran out on its last attempt is marked failed instead.
+    """
+    pool = await get_pool()
+    async with pool.acquire() as connection:
+        abandoned = await connection.execute(
+            """
+            UPDATE geocode_jobs
+            SET status = 'failed',
+                last_error = COALESCE(last_error, 'lease expired on the last attempt')
+            WHERE status = 'running' AND next_attempt_at <= now() AND attempts >= $1
+            """,
+            GEOCODE_MAX_ATTEMPTS,
+        )
+        _stats["failed"] += int(abandoned.split()[-1])
+        row = await connection.fetchrow(
+            """
+            UPDATE geocode_jobs j
+            SET status = 'running',
+                attempts = j.attempts + 1,
+                next_attempt_at = now() + make_interval(secs => $1)
+            WHERE j.id = (
+                SELECT id FROM geocode_jobs
+                WHERE status <> 'failed' AND next_attempt_at <= now() AND attempts < $2
+                ORDER BY next_attempt_at
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING j.id, j.target_kind, j.target_id, j.raw_address, j.attempts
+            """,
+            GEOCODE_LEASE_SECONDS,
+            GEOCODE_MAX_ATTEMPTS,
+        )
+    return dict(row) if row else None
+
+
+async def _attach(job: dict, place_data: dict):
+    table, detail_kind, deck_kind = _targets[job["target_kind"]]
+    pool = await get_pool()
+    async with pool.acquire() as connection:
+        async with connection.transaction():
+            location_id = await insert_location_if_not_exists(connection, place_data)
+            # a row whose address changed again since the job was queued keeps
+            # waiting for the newer job
+            attached = await connection.fetchval(
+                f"""
+                UPDATE {table} SET locations_id = $1, pending_address = NULL
+                WHERE id = $2 AND pending_address = $3
+                RETURNING id
+                """,
+                location_id,
+                job["target_id"],
+                job["raw_address"],
+            )
+            await connection.execute("DELETE FROM geocode_jobs WHERE id = $1", job["id"])
+            if attached:
+                # built around the old location (or none)
+                await invalidate_deck(connection, deck_kind, job["target_id"])
+
+    if attached:
+        invalidate_detail(detail_kind, job["target_id"])
+        _stats["resolved"] += 1
+    else:
+        _stats["stale"] += 1
+
+
+async def _fail(job: dict, error: Exception, retry: bool):
+    delay = GEOCODE_RETRY_BASE_SECONDS * 2 ** (job["attempts"] - 1)
+    pool = await get_pool()
+    async with pool.acquire() as connection:
+        await connection.execute(
+            """
+            UPDATE geocode_jobs
+            SET status = CASE WHEN $2 THEN 'pending' ELSE 'failed' END,
+                next_attempt_at = now() + make_interval(secs => $3),
+                last_error = $4
+            WHERE id = $1
+            """,
+            job["id"],
+            retry,
+            delay,
+            str(error),
+        )
+    _stats["retried" if retry else "failed"] += 1
+    print(
+        f"[ERROR] Geocoding {job['target_kind']} {job['target_id']} failed "
+        f"(attempt {job['attempts']}{', will retry' if retry else ''}): {error}"
+    )
+
+
+async def _process(job: dict):
+    try:
+        # no connection is held here; resolve_address takes one only for its cache
+        place_data = await resolve_address(job["raw_address"])
+        await _attach(job, place_data)
+    except AddressNotFound as e:
+        await _fail(job, e, retry=False)
+    except Exception as e:
+        await _fail(job, e, retry=job["attempts"] < GEOCODE_MAX_ATTEMPTS)
+
+
+async def _work():
+    while True:
+        # cleared before looking, so a job queued after the look still wakes us
+        _wake.clear()
+        try:
+            job = await _claim()
+            if job is not None:
+                _stats["claimed"] += 1
+                await _process(job)
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # e.g. the database is briefly unreachable; the job's lease runs out
+            print(f"[ERROR] Geocode worker: {e}")
+        try:
+            await asyncio.wait_for(_wake.wait(), GEOCODE_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_geocode_workers():
+    for _ in range(GEOCODE_WORKERS - len(_workers)):
+        _workers.append(asyncio.create_task(_work()))
+
+
+async def stop_geocode_workers():
+    """Jobs cut short here are picked up again when their lease expires."""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
@@ -0,0 +1,40 @@
+import asyncio
+import os
+
+import httpx
+
+# One pooled client for all outbound HTTP (Google APIs etc.), so keep-alive
+# connections and TLS sessions are reused across requests. Owned by the app
+# lifespan in server.py, created lazily if used outside of it (scripts).
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+
+_client = None
+_lock = asyncio.Lock()
+
+
+async def get_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        async with _lock:
+            if _client is None:
+                _client = httpx.AsyncClient(
+                    timeout=HTTP_TIMEOUT_SECONDS,
+                    limits=httpx.Limits(
+                        max_connections=HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                    ),
+                )
+    return _client
+
+
+async def init_http_client():
+    await get_http_client()
+
+
+async def close_http_client():
+    global _client
+    if _client:
+        await _client.aclose()
+        _client = None
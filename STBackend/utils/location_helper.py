@@ -1,26 +1,139 @@
-import httpx
-
 import os
+import re
+
+from db import get_pool
+from utils.http_client import get_http_client
+from utils.lru import LRUCache
+from utils.metrics import time_stage
+
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+# Point at a local stub (benchmarks/stub_google.py) for tests and load runs
+GOOGLE_GEOCODE_URL = os.getenv(
+    "GOOGLE_GEOCODE_URL", "https://maps.googleapis.com/maps/api/geocode/json"
+)
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "10000"))
+
+# normalized address -> place_data; backed by the geocode_cache table
+_geocode_cache = LRUCache(maxsize=GEOCODE_CACHE_SIZE)
+_geocode_counters = {"db_hits": 0, "google_calls": 0}
+
+
+def normalize_address(address: str) -> str:
+    """Case, whitespace and trailing punctuation don't change the geocode."""
+    return re.sub(r"\s+", " ", address).strip().strip(".,;").strip().lower()
+
+
+def geocode_cache_stats() -> dict:
+    return {
+        "memory_hits": _geocode_cache.hits,
+        "memory_misses": _geocode_cache.misses,
+        "memory_size": len(_geocode_cache),
+        **_geocode_counters,
+    }
+
+
+class AddressNotFound(ValueError):
+    """Google has no result for the address; retrying won't help."""
+
 
 async def resolve_address_from_google(address: str):
-    url = f"https://maps.googleapis.com/maps/api/geocode/json?address={address}&key={GOOGLE_API_KEY}"
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(url)
-        data = resp.json()
-        if data["status"] != "OK":
-            raise ValueError("Google API failed: " + data["status"])
-
-        result = data["results"][0]
-        return {
-            "places_api_id": result["place_id"],
-            "address_string": result["formatted_address"],
-            "latitude": result["geometry"]["location"]["lat"],
-            "longitude": result["geometry"]["location"]["lng"]
-        }
+    client = await get_http_client()
+    with time_stage("geocode"):
+        resp = await client.get(
+            GOOGLE_GEOCODE_URL, params={"address": address, "key": GOOGLE_API_KEY}
+        )
+    data = resp.json()
+    if data["status"] in ("ZERO_RESULTS", "INVALID_REQUEST"):
+        raise AddressNotFound("Google API failed: " + data["status"])
+    if data["status"] != "OK":
+        raise ValueError("Google API failed: " + data["status"])
+
+    result = data["results"][0]
+    return {
+        "places_api_id": result["place_id"],
+        "address_string": result["formatted_address"],
+        "latitude": result["geometry"]["location"]["lat"],
+        "longitude": result["geometry"]["location"]["lng"]
+    }
+
+
+async def _lookup_geocode(connection, key: str):
+    row = await connection.fetchrow(
+        """
+        SELECT places_api_id, address_string, latitude, longitude
+        FROM geocode_cache WHERE normalized_address = $1
+        """,
+        key,
+    )
+    return dict(row) if row else None
+
+
+async def _store_geocode(connection, key: str, place_data: dict):
+    # savepoint when the caller is inside a transaction, so a failure here
+    # doesn't abort it
+    async with connection.transaction():
+        await connection.execute(
+            """
+            INSERT INTO geocode_cache (normalized_address, places_api_id, address_string, latitude, longitude)
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (normalized_address) DO NOTHING
+            """,
+            key,
+            place_data["places_api_id"],
+            place_data["address_string"],
+            place_data["latitude"],
+            place_data["longitude"],
+        )
+
+
+async def cached_place(connection, address: str):
+    """
+    place_data for an address that was geocoded before (in-memory LRU, then
+    the geocode_cache table), or None. Never calls Google, so it is safe to
+    use inside a transaction.
+    """
+    key = normalize_address(address)
+    place_data = _geocode_cache.get(key)
+    if place_data is None:
+        place_data = await _lookup_geocode(connection, key)
+        if place_data is None:
+            return None
+        _geocode_counters["db_hits"] += 1
+        _geocode_cache.set(key, place_data)
+    return dict(place_data)
+
+
+async def resolve_address(address: str):
+    """
+    Geocode a raw address, checking the in-memory LRU, then the geocode_cache
+    table, and only then Google. Pool connections are only held for the cache
+    lookup and the cache write, never across the Google call.
+    """
+    key = normalize_address(address)
+    place_data = _geocode_cache.get(key)
+    if place_data is not None:
+        return dict(place_data)
+
+    pool = await get_pool()
+    async with pool.acquire() as connection:
+        place_data = await _lookup_geocode(connection, key)
+    if place_data is not None:
+        _geocode_counters["db_hits"] += 1
+    else:
+        _geocode_counters["google_calls"] += 1
+        place_data = await resolve_address_from_google(address)
+        try:
+            async with pool.acquire() as connection:
+                await _store_geocode(connection, key, place_data)
+        except Exception as e:
+            # the lookup already succeeded; a failed cache write shouldn't fail the request
+            print(f"[ERROR] Failed to cache geocode for {key!r}: {e}")
+    _geocode_cache.set(key, place_data)
+    return dict(place_data)
+
 
 async def insert_location_if_not_exists(connection, place_data: dict) -> int:
-    query_check = "SELECT id FROM locations WHERE places_api_id = CAST($1 AS TEXT)"
+    query_check = "SELECT id FROM locations WHERE places_api_id = $1"
     existing = await connection.fetchrow(query_check, place_data["places_api_id"])
     if existing:
         print(f"[INFO] Existing location found: id={existing['id']}")
@@ -0,0 +1,202 @@
+import os
+
+from db import hot_fetch, register_hot_statement
+from utils.scoring import SCORING, score_sql
+
+# How many of the best candidates are returned per request. Every candidate in
+# the radius is scored and ranked, in the database, before the limit applies.
+MATCH_RESULT_LIMIT = int(os.getenv("MATCH_RESULT_LIMIT", "200"))
+# Search radius when the client doesn't pass one, and the largest it may ask for
+MATCH_RADIUS_KM = float(os.getenv("MATCH_RADIUS_KM", "50"))
+MATCH_MAX_RADIUS_KM = float(os.getenv("MATCH_MAX_RADIUS_KM", "200"))
+
+_LISTING_SCORE_SQL = score_sql(
+    SCORING.listing_cards,
+    distance_km="lc.distance_km",
+    asking_price="lc.asking_price",
+    utilities_incl="lc.utilities_incl",
+    budget="r.budget",
+    bathroom_gap="lc.num_bathrooms - r.num_bathrooms",
+    same_building_type="lc.building_type_id IS NOT DISTINCT FROM r.building_type_id",
+    gender_ok="lc.target_gender IS NULL OR lc.target_gender IS NOT DISTINCT FROM r.gender",
+)
+
+_RENTER_SCORE_SQL = score_sql(
+    SCORING.renter_cards,
+    distance_km="rc.distance_km",
+    asking_price="l.asking_price",
+    utilities_incl="l.utilities_incl",
+    budget="rc.budget",
+    bathroom_gap="rc.num_bathrooms - l.num_bathrooms",
+    same_building_type="rc.building_type_id IS NOT DISTINCT FROM l.building_type_id",
+    gender_ok="rc.gender IS NULL OR rc.gender IS NOT DISTINCT FROM l.target_gender",
+)
+
+# The best $5 candidates within $2 km ranked after the (score, id) keyset
+# ($3, $4), or from the top when $3 is NULL; scored by the same formula as
+# utils/scoring.py, so the order and the keyset cover the whole radius.
+LISTING_CANDIDATES_QUERY = f"""
+SELECT
+    lc.id,
+    lc.user_id,
+    lc.asking_price,
+    lc.num_bedrooms,
+    lc.num_bathrooms,
+    lc.start_date,
+    lc.end_date,
+    lc.utilities_incl,
+    lc.building_type_id,
+    lc.target_gender,
+    lc.address_string,
+    lc.distance_km,
+    lc.score,
+    bt.type AS building_type,
+    lister.first_name AS lister_name
+FROM (
+    SELECT * FROM (
+        SELECT lc.*, {_LISTING_SCORE_SQL} AS score
+        FROM get_listing_candidates($1, $2) lc
+        JOIN renter_profiles r ON r.id = $1
+    ) scored
+    WHERE $3::float8 IS NULL OR score < $3 OR (score = $3 AND id > $4)
+    ORDER BY score DESC, id
+    LIMIT $5
+) lc
+LEFT JOIN building_types bt ON lc.building_type_id = bt.id
+LEFT JOIN users lister ON lister.id = lc.user_id
+ORDER BY lc.score DESC, lc.id
+"""
+
+# first photo of each listing, only fetched for the cards that are returned
+LISTING_COVER_PHOTOS_QUERY = """
+SELECT ids.id, photo.url AS photo_url, photo.label AS photo_label
+FROM unnest($1::bigint[]) AS ids(id)
+LEFT JOIN LATERAL (
+    SELECT url, label
+    FROM photos
+    WHERE photos.listing_id = ids.id
+    LIMIT 1
+) AS photo ON TRUE
+"""
+
+RENTER_CANDIDATES_QUERY = f"""
+SELECT
+    rc.id AS renter_id,
+    rc.budget,
+    rc.num_bedrooms,
+    rc.num_bathrooms,
+    rc.start_date,
+    rc.end_date,
+    rc.has_pet,
+    rc.bio,
+    rc.address_string,
+    rc.building_type_id,
+    rc.gender,
+    bt.type AS building_type,
+    u.first_name AS renter_first_name,
+    u.last_name AS renter_last_name,
+    u.profile_photo AS renter_profile_photo,
+    rc.distance_km,
+    rc.score
+FROM (
+    SELECT * FROM (
+        SELECT rc.*, {_RENTER_SCORE_SQL} AS score
+        FROM get_renter_candidates($1, $2) rc
+        JOIN listings l ON l.id = $1
+    ) scored
+    WHERE $3::float8 IS NULL OR score < $3 OR (score = $3 AND id > $4)
+    ORDER BY score DESC, id
+    LIMIT $5
+) rc
+LEFT JOIN building_types bt ON rc.building_type_id = bt.id
+LEFT JOIN users u ON rc.user_id = u.id
+ORDER BY rc.score DESC, rc.id
+"""
+
+# Every candidate in the radius with its score, unordered, for utils/export.py.
+# The candidate functions are plain SQL and inlined by the planner, so a cursor
+# streams these rows instead of waiting for the whole result.
+LISTING_CANDIDATES_EXPORT_QUERY = f"""
+SELECT lc.*, {_LISTING_SCORE_SQL} AS score
+FROM get_listing_candidates($1, $2) lc
+JOIN renter_profiles r ON r.id = $1
+"""
+RENTER_CANDIDATES_EXPORT_QUERY = f"""
+SELECT rc.*, {_RENTER_SCORE_SQL} AS score
+FROM get_renter_candidates($1, $2) rc
+JOIN listings l ON l.id = $1
+"""
+
+LISTING_CANDIDATES = register_hot_statement("listing_candidates", LISTING_CANDIDATES_QUERY)
+RENTER_CANDIDATES = register_hot_statement("renter_candidates", RENTER_CANDIDATES_QUERY)
+
+LISTING_CARD_FIELDS = [
+    "id", "asking_price", "num_bedrooms", "num_bathrooms", "start_date",
+    "end_date", "address_string", "building_type", "lister_name",
+]
+RENTER_CARD_FIELDS = [
+    "renter_id", "budget", "num_bedrooms", "num_bathrooms", "start_date",
+    "end_date", "has_pet", "bio", "address_string", "building_type",
+    "renter_first_name", "renter_last_name", "renter_profile_photo", "distance_km",
+]
+
+
+async def fetch_listing_matches(
+    connection,
+    renter_id: int,
+    radius_km: float = MATCH_RADIUS_KM,
+    after: tuple[float, int] | None = None,
+    limit: int = MATCH_RESULT_LIMIT,
+) -> tuple[list[dict], bool]:
+    """
+    Scored listing cards for a renter, best first: up to `limit` of them within radius_km,
+    starting after the (score, id) keyset `after` when given. Also returns whether
+    they are the last ones, i.e. no candidate in the radius ranks past them.
+    """
+    after_score, after_id = after if after is not None else (None, None)
+    # one more than asked for, to tell whether these are the last ones
+    rows = await hot_fetch(
+        connection, LISTING_CANDIDATES, renter_id, radius_km, after_score, after_id, limit + 1
+    )
+    last = len(rows) <= limit
+    rows = rows[:limit]
+
+    cards = []
+    for row in rows:
+        card = {field: row[field] for field in LISTING_CARD_FIELDS}
+        card["score"] = row["score"]
+        cards.append(card)
+
+    photos = await connection.fetch(LISTING_COVER_PHOTOS_QUERY, [card["id"] for card in cards])
+    cover = {row["id"]: row for row in photos}
+    for card in cards:
+        card["photo_url"] = cover[card["id"]]["photo_url"]
+        card["photo_label"] = cover[card["id"]]["photo_label"]
+    return cards, last
+
+
+async def fetch_renter_matches(
+    connection,
+    listing_id: int,
+    radius_km: float = MATCH_RADIUS_KM,
+    after: tuple[float, int] | None = None,
+    limit: int = MATCH_RESULT_LIMIT,
+) -> tuple[list[dict], bool]:
+    """
+    Scored renter cards for a listing, best first: up to `limit` of them within radius_km,
+    starting after the (score, id) keyset `after` when given. Also returns whether
+    they are the last ones, i.e. no candidate in the radius ranks past them.
+    """
+    after_score, after_id = after if after is not None else (None, None)
+    rows = await hot_fetch(
+        connection, RENTER_CANDIDATES, listing_id, radius_km, after_score, after_id, limit + 1
+    )
+    last = len(rows) <= limit
+    rows = rows[:limit]
+
+    cards = []
+    for row in rows:
+        card = {field: row[field] for field in RENTER_CARD_FIELDS}
+        card["score"] = row["score"]
+        cards.append(card)
+    return cards, last
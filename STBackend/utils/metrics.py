@@ -0,0 +1,111 @@
+import bisect
+import time
+from contextlib import contextmanager
+
+# Latency histograms in the Prometheus text format, kept in process memory.
+# Every worker process has its own; scrape each worker (or run one) to get
+# the full picture.
+
+# seconds; cumulative "le" buckets as Prometheus expects, +Inf is implied
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...], buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., +Inf count], sum
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            label_text = ",".join(
+                f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels)
+            )
+            prefix = label_text + "," if label_text else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+            suffix = f"{{{label_text}}}" if label_text else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time from request received to response headers sent, by route template",
+    ("method", "route", "status"),
+)
+QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "Time spent in named database queries",
+    ("query",),
+)
+STAGE_LATENCY = Histogram(
+    "stage_duration_seconds",
+    "Time spent in named non-database stages (scoring, upstream API calls)",
+    ("stage",),
+)
+
+
+def time_query(name: str):
+    return QUERY_LATENCY.time(name)
+
+
+def time_stage(name: str):
+    return STAGE_LATENCY.time(name)
+
+
+def render_gauges(prefix: str, stats: dict, label: str | None = None) -> list[str]:
+    """
+    Numeric entries of a stats dict (e.g. pool_stats()) as gauges named
+    prefix_key. With `label`, stats is a dict of such dicts and the outer key
+    becomes that label.
+    """
+    groups = stats.items() if label else [(None, stats)]
+    samples = {}
+    for group, values in groups:
+        label_text = f'{{{label}="{_escape(group)}"}}' if label else ""
+        for key, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            samples.setdefault(f"{prefix}_{key}", []).append(f"{prefix}_{key}{label_text} {value}")
+    lines = []
+    for name, values in samples.items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(values)
+    return lines
+
+
+def render_metrics(extra: list[str] = ()) -> str:
+    lines = []
+    for histogram in (REQUEST_LATENCY, QUERY_LATENCY, STAGE_LATENCY):
+        lines.extend(histogram.render())
+    lines.extend(extra)
+    return "\n".join(lines) + "\n"
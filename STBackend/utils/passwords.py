@@ -0,0 +1,56 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+# bcrypt work factor for new hashes (2**rounds iterations); existing hashes
+# keep the cost they were created with
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# threads doing bcrypt work (it releases the GIL), and how many hash/verify
+# calls may be running or queued before callers wait their turn
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+_executor = None
+_pending = None
+
+
+def _get_executor():
+    global _executor, _pending
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+        _pending = asyncio.Semaphore(PASSWORD_HASH_MAX_PENDING)
+    return _executor
+
+
+async def _run(fn, *args):
+    executor = _get_executor()
+    async with _pending:
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+def _hash(password: str) -> str:
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(BCRYPT_ROUNDS)).decode("utf-8")
+
+
+def _verify(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+
+
+async def hash_password(password: str) -> str:
+    """bcrypt hash of password, computed off the event loop."""
+    return await _run(_hash, password)
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    """Check password against a bcrypt hash, off the event loop."""
+    return await _run(_verify, password, hashed)
+
+
+def shutdown_password_executor():
+    global _executor, _pending
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        _pending = None
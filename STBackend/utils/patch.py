@@ -0,0 +1,78 @@
+from enum import Enum
+
+# Partial updates that only touch what a PATCH body actually changes.
+# Column and table names come from the callers' fixed maps, never from input.
+
+
+def patch_values(update, columns: dict[str, str]) -> dict:
+    """
+    column -> value for the fields of `update` (a pydantic model) that were
+    sent with a non-null value. `columns` maps field names to column names;
+    fields outside it (photos, raw_address...) are the caller's business.
+    """
+    values = {}
+    for field, value in update.model_dump(exclude_unset=True).items():
+        if field in columns and value is not None:
+            values[columns[field]] = value.value if isinstance(value, Enum) else value
+    return values
+
+
+async def apply_patch(connection, table: str, row_id: int, values: dict) -> tuple[bool, bool]:
+    """
+    Write `values` to one row in a single statement, skipping the write when
+    every column already holds its new value. Returns (found, updated); the
+    row stays locked until the caller's transaction ends.
+    """
+    if not values:
+        found = await connection.fetchval(
+            f"SELECT EXISTS (SELECT 1 FROM {table} WHERE id = $1 FOR UPDATE)", row_id
+        )
+        return found, False
+
+    columns = list(values)
+    params = ", ".join(f"${i}" for i in range(2, len(columns) + 2))
+    assignments = ", ".join(f"{column} = ${i}" for i, column in enumerate(columns, start=2))
+    row = await connection.fetchrow(
+        f"""
+        WITH target AS (
+            SELECT id FROM {table} WHERE id = $1 FOR UPDATE
+        ), updated AS (
+            UPDATE {table} t SET {assignments}
+            FROM target
+            WHERE t.id = target.id
+              AND ({", ".join(f"t.{column}" for column in columns)}) IS DISTINCT FROM ({params})
+            RETURNING 1
+        )
+        SELECT EXISTS (SELECT 1 FROM target) AS found, EXISTS (SELECT 1 FROM updated) AS updated
+        """,
+        row_id,
+        *values.values(),
+    )
+    return row["found"], row["updated"]
+
+
+async def sync_links(
+    connection, table: str, owner_column: str, owner_id: int, member_column: str, member_ids: list[int]
+) -> bool:
+    """
+    Make the set of `member_column` values linked to `owner_id` equal to
+    member_ids: rows that are no longer wanted are deleted, missing ones
+    inserted, the rest left alone. One statement; returns whether anything changed.
+    """
+    return await connection.fetchval(
+        f"""
+        WITH removed AS (
+            DELETE FROM {table}
+            WHERE {owner_column} = $1 AND {member_column} <> ALL($2::bigint[])
+            RETURNING 1
+        ), added AS (
+            INSERT INTO {table} ({owner_column}, {member_column})
+            SELECT $1, wanted.id FROM unnest($2::bigint[]) AS wanted(id)
+            ON CONFLICT DO NOTHING
+            RETURNING 1
+        )
+        SELECT EXISTS (SELECT 1 FROM removed) OR EXISTS (SELECT 1 FROM added)
+        """,
+        owner_id,
+        list(dict.fromkeys(member_ids)),
+    )
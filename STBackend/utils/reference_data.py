@@ -0,0 +1,71 @@
+import hashlib
+import json
+
+from fastapi import Request, Response
+
+from db import get_pool
+
+# Amenities, building types and genders almost never change, so they are
+# loaded once (at startup, see server.py) and served as pre-serialized JSON
+# with a strong ETag. Call invalidate_reference_data() after editing them.
+REFERENCE_QUERIES = {
+    "amenities": ("SELECT id, name FROM amenities ORDER BY name", None),
+    "building_types": ("SELECT id, type FROM building_types ORDER BY type", None),
+    # enum values in declaration order, numbered from 1
+    "genders": (
+        "SELECT unnest(enum_range(NULL::gender_enum)) AS gender",
+        lambda rows: [{"id": i + 1, "gender": row["gender"]} for i, row in enumerate(rows)],
+    ),
+}
+
+_cache = {}  # name -> (body bytes, etag)
+
+
+def _serialize(rows) -> tuple[bytes, str]:
+    body = json.dumps(rows, separators=(",", ":")).encode()
+    return body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+async def load_reference_data(connection, names=None):
+    for name in names or REFERENCE_QUERIES:
+        query, shape = REFERENCE_QUERIES[name]
+        rows = await connection.fetch(query)
+        _cache[name] = _serialize(shape(rows) if shape else [dict(row) for row in rows])
+
+
+async def warm_reference_data():
+    pool = await get_pool()
+    async with pool.acquire() as connection:
+        await load_reference_data(connection)
+
+
+def invalidate_reference_data(name: str | None = None):
+    if name is None:
+        _cache.clear()
+    else:
+        _cache.pop(name, None)
+
+
+def reference_etags() -> dict:
+    return {name: etag for name, (_, etag) in _cache.items()}
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # weak comparison, as If-None-Match requires
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+async def reference_response(name: str, request: Request) -> Response:
+    if name not in _cache:
+        pool = await get_pool()
+        async with pool.acquire() as connection:
+            await load_reference_data(connection, [name])
+    body, etag = _cache[name]
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
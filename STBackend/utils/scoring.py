@@ -0,0 +1,69 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class ScoreParams:
+    """
+    Weights of the multiplicative match score
+
+        base_score
+        * distance_factor_base ** distance_km
+        * price_factor_base ** (asking_price + utilities_adjustment_if_excluded - budget)
+        * bathroom_factor_base ** bathroom_gap
+        * building_type_factor if the building types match
+        * gender_factor if the gender preference is satisfied
+    """
+
+    base_score: float = 100.0
+    distance_factor_base: float = 0.99
+    price_factor_base: float = 0.997
+    bathroom_factor_base: float = 1.2
+    utilities_adjustment: float = 100.0
+    building_type_factor: float = 1.0
+    gender_factor: float = 1.0
+
+
+@dataclass(frozen=True)
+class ScoringConfig:
+    listing_cards: ScoreParams  # a renter ranking listings
+    renter_cards: ScoreParams  # a listing ranking renters
+
+
+SCORING = ScoringConfig(
+    listing_cards=ScoreParams(building_type_factor=1.2, gender_factor=1.5),
+    renter_cards=ScoreParams(gender_factor=1.7),
+)
+
+
+def score_sql(
+    params: ScoreParams,
+    distance_km: str,
+    asking_price: str,
+    utilities_incl: str,
+    budget: str,
+    bathroom_gap: str,
+    same_building_type: str,
+    gender_ok: str,
+) -> str:
+    """
+    The match score (see ScoreParams) as a float8 SQL expression, so a query
+    can order and page candidates by score. Every argument after params is an
+    SQL expression; the weights are written in as literals. This is the only
+    implementation of the formula: ranked pages and exports both use it.
+    """
+
+    def weight(value: float) -> str:
+        return f"{float(value)!r}::float8"
+
+    return f"""(
+        {weight(params.base_score)}
+        * power({weight(params.distance_factor_base)}, ({distance_km})::float8)
+        * power({weight(params.price_factor_base)},
+                ({asking_price})::float8
+                + CASE WHEN {utilities_incl} THEN 0 ELSE {weight(params.utilities_adjustment)} END
+                - ({budget})::float8)
+        * power({weight(params.bathroom_factor_base)}, ({bathroom_gap})::float8)
+        * CASE WHEN {same_building_type} THEN {weight(params.building_type_factor)} ELSE 1 END
+        * CASE WHEN {gender_ok} THEN {weight(params.gender_factor)} ELSE 1 END
+    )"""
+